@@ -3,6 +3,24 @@ const { DateTime } = require("luxon"); // Require Luxon for date formatting
 
 module.exports = function(eleventyConfig) {
 
+  // --- Scoped Build ---
+  // ELEVENTY_ONLY="posts/a.md,posts/b.md" renders only those input files (used by post_to_clan.py),
+  // so publishing a post costs the same no matter how many posts the site has.
+  const onlyInputs = (process.env.ELEVENTY_ONLY || "")
+    .split(",")
+    .map(p => p.trim())
+    .filter(Boolean)
+    .map(p => "./" + p.replace(/^\.\//, ""));
+  if (onlyInputs.length > 0) {
+    eleventyConfig.addPreprocessor("scoped-build", "*", (data) => {
+      // Returning false skips the template entirely (no render, no output)
+      if (!onlyInputs.includes(data.page.inputPath)) {
+        return false;
+      }
+    });
+  }
+  // --- End Scoped Build ---
+
   // --- Date Filters ---
   eleventyConfig.addFilter("readableDate", (dateObj, format, zone) => {
     // Formats a date object -> "October 26, 2023"
@@ -31,8 +49,11 @@ module.exports = function(eleventyConfig) {
   // Eleventy automatically handles files in the input directory that match passthrough formats
   // unless they are explicitly processed by a template engine.
   // Using addPassthroughCopy ensures they are copied even if not directly referenced.
-  eleventyConfig.addPassthroughCopy("css");
-  eleventyConfig.addPassthroughCopy("images"); // Copies the entire images directory structure
+  // Skipped for scoped builds (see below); the full build keeps _site's copies up to date.
+  if (onlyInputs.length === 0) {
+    eleventyConfig.addPassthroughCopy("css");
+    eleventyConfig.addPassthroughCopy("images"); // Copies the entire images directory structure
+  }
   // --- End Passthrough ---
 
   // --- Ignored Files/Directories ---
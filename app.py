@@ -1,16 +1,15 @@
 # /Users/nickfiddes/Code/projects/blog_ssg/app.py
 
-from flask import Flask, render_template, jsonify, request, url_for, send_from_directory
+from flask import Flask, render_template, jsonify, request, url_for, send_file, redirect, Response, abort
 import os
 import json
 import shutil
 from pathlib import Path
 import frontmatter
 import logging
-import subprocess
+import sqlite3
 import sys
 from datetime import datetime, timezone
-import re 
 import yaml
 from werkzeug.utils import secure_filename
 
@@ -19,6 +18,16 @@ from scripts.llm import MetadataGenerator
 from scripts.llm.config import load_config, save_config
 from scripts.llm.base import LLMConfig
 from scripts.llm.factory import LLMFactory
+from scripts.post_index import PostIndex
+from scripts.workflow_store import WorkflowStore
+from scripts.workflow_schema import with_stage_defaults
+from scripts.image_library import ImageLibrary
+from scripts.image_probe import ImageProbeCache
+from scripts.thumbnails import ThumbnailCache
+from scripts.static_files import StaticFiles
+from scripts.admin_worker import AdminWorker
+from scripts.job_runner import JobRunner
+from scripts.frontmatter_loader import load_post
 
 # --- Configuration Constants ---
 BASE_DIR = Path(__file__).resolve().parent
@@ -27,19 +36,15 @@ DATA_DIR_NAME = "_data"
 DATA_DIR = BASE_DIR / DATA_DIR_NAME
 WORKFLOW_STATUS_FILE = "workflow_status.json" # Main file for post status tracking
 IMAGE_LIBRARY_FILE = "image_library.json"
+JOBS_DB_FILE = "admin_jobs.db" # Persisted queue of background publish/watermark jobs
+IMAGE_PROBE_DB_FILE = "image_probe_cache.db" # Image dimensions/format, keyed by path + mtime/size
+JOB_WORKERS = 2 # Jobs for different posts run in parallel
 UPLOAD_FOLDER = BASE_DIR / 'tmp'  # Add upload folder configuration
 IMAGES_DIR = BASE_DIR / 'images'  # Define images directory
-
-# Define workflow stages
-WORKFLOW_STAGES = [
-    'conceptualisation',
-    'authoring',
-    'metadata',
-    'images',
-    'validation',
-    'publishing_clancom',
-    'syndication'
-]
+CSS_DIR = BASE_DIR / 'css' # Site stylesheets (blog.css); 'x.css.br' / 'x.css.gz' are used when present
+THUMBNAIL_CACHE_DIR = UPLOAD_FOLDER / 'thumbs' # Generated admin previews (safe to delete)
+ADMIN_THUMBNAIL_SIZE = 320 # Preview size used by the admin list and detail pages
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600 # For versioned (?v=<source mtime>) thumbnail URLs
 
 # Create upload folder if it doesn't exist
 UPLOAD_FOLDER.mkdir(exist_ok=True)
@@ -57,12 +62,96 @@ app.config['POSTS_DIR'] = str(BASE_DIR / POSTS_DIR_NAME)
 app.config['IMAGES_DIR'] = str(IMAGES_DIR)
 app.config['DATA_DIR'] = str(DATA_DIR)  # Add DATA_DIR to app config
 
+# --- Workflow Store (SQLite-backed, exports workflow_status.json for Eleventy) ---
+workflow_store = WorkflowStore(DATA_DIR / WORKFLOW_STATUS_FILE)
+
+# --- Post Index (process-wide front matter cache) ---
+post_index = PostIndex(BASE_DIR / POSTS_DIR_NAME, workflow_store)
+
+# --- Image Library (indexed, re-loaded when the scripts change it) ---
+image_library = ImageLibrary(DATA_DIR / IMAGE_LIBRARY_FILE, base_dir=BASE_DIR)
+
+# --- Image Probe Cache (header-only dimensions/format, re-probed only when a file changes) ---
+image_probe_cache = ImageProbeCache(DATA_DIR / IMAGE_PROBE_DB_FILE, BASE_DIR)
+
+# --- Admin Thumbnails (downscaled WEBP previews, cached on disk by source mtime) ---
+thumbnail_cache = ThumbnailCache(IMAGES_DIR, THUMBNAIL_CACHE_DIR)
+
+# --- Static Files (content-hash ETags, 304s, ranges, immutable content-hash-versioned files) ---
+image_files = StaticFiles(IMAGES_DIR)
+css_files = StaticFiles(CSS_DIR)
+
+# --- Admin Worker (publish/watermark in-process with the warm store, library and API session) ---
+admin_worker = AdminWorker(BASE_DIR, workflow_store, image_library)
+
+# --- Background Jobs (queued admin operations, one job per post at a time) ---
+job_runner = JobRunner(DATA_DIR / JOBS_DB_FILE, workers=JOB_WORKERS)
+job_runner.register('publish', admin_worker.publish_job)
+job_runner.register('watermark', admin_worker.watermark_job)
+logging.getLogger().addHandler(job_runner.log_handler())
+
+@app.before_request
+def start_job_workers():
+    """
+    Starts the job workers in the process that serves requests (not the debug reloader's
+    parent, which must not fail the serving process' running jobs). Idempotent and locked.
+    """
+    job_runner.start()
+
+
+def job_accepted_response(job, slug=None):
+    """202 response for a queued job, with the URLs to poll or stream it."""
+    payload = {
+        "success": True,
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": url_for('job_status_api', job_id=job['id']),
+        "events_url": url_for('job_events_api', job_id=job['id']),
+    }
+    if slug is not None:
+        payload["slug"] = slug
+    return jsonify(payload), 202
+
 # --- Add Static Route for Images (Development Only) ---
 @app.route('/images/<path:filename>')
 def serve_images(filename):
-    """Serve images from the images directory."""
+    """Serve images from the images directory (revalidated by content hash; immutable if versioned by that hash)."""
     logging.debug(f"Serving image: {filename} from {IMAGES_DIR}")
-    return send_from_directory(IMAGES_DIR, filename)
+    return image_files.send(filename)
+
+@app.route('/css/<path:filename>')
+def serve_css(filename):
+    """Serve the site stylesheets (pre-compressed variants when the client accepts them)."""
+    return css_files.send(filename)
+
+@app.route('/thumbs/<int:size>/<path:filename>')
+def serve_thumbnail(size, filename):
+    """
+    Serves a downscaled WEBP preview of images/<filename>, generated on first request.
+    Versioned URLs (from thumb_url(), '?v=<source mtime>') are cacheable for a year;
+    unversioned ones are revalidated with their ETag.
+    """
+    thumbnail = thumbnail_cache.get(size, filename)
+    if thumbnail is None:
+        abort(404)
+    thumb_path, version = thumbnail
+    versioned = request.args.get('v') == version
+    response = send_file(thumb_path, mimetype='image/webp', etag=f"{size}-{version}", conditional=True,
+                         max_age=THUMBNAIL_MAX_AGE if versioned else 0)
+    if versioned:
+        response.cache_control.immutable = True
+    return response
+
+@app.template_global()
+def thumb_url(filename: str, size: int = ADMIN_THUMBNAIL_SIZE):
+    """URL of an images/-relative file's thumbnail, versioned by the source's mtime (None if it does not exist)."""
+    filename = str(filename).lstrip('/')
+    if filename.startswith('images/'):
+        filename = filename[len('images/'):]
+    version = thumbnail_cache.version(filename)
+    if version is None:
+        return None
+    return url_for('serve_thumbnail', size=size, filename=filename, v=version)
 
 # --- Helper Functions ---
 
@@ -103,8 +192,14 @@ def parse_post_markdown(content: str) -> dict:
     """Parse a post's markdown content and return a dictionary of its data."""
     try:
         post = frontmatter.loads(content)
-        metadata = post.metadata
-        
+        return build_post_data(post.metadata)
+    except Exception as e:
+        logging.error(f"Error parsing markdown content: {e}")
+        return {}
+
+def build_post_data(metadata: dict) -> dict:
+    """Fill in defaults and the referenced image list for already-parsed front matter (modified in place)."""
+    try:
         # Ensure required fields exist
         metadata.setdefault('title', '')
         metadata.setdefault('concept', '')
@@ -155,7 +250,7 @@ def parse_post_markdown(content: str) -> dict:
         return metadata
         
     except Exception as e:
-        logging.error(f"Error parsing markdown content: {e}")
+        logging.error(f"Error building post data from metadata: {e}")
         return {}
 
 def get_detailed_image_info(images: list) -> list:
@@ -173,15 +268,24 @@ def get_detailed_image_info(images: list) -> list:
             'notes': img.get('notes', ''),
             'exists': False,
             'dimensions': None,
+            'format': None,
+            'mode': None,
             'size': None
         }
         
-        # Check if image file exists and get its details
+        # Check if image file exists and get its details (cached header probe: O(1) after the first view)
         try:
             img_path = BASE_DIR / img['src'].lstrip('/')
-            if img_path.exists():
+            probe = image_probe_cache.probe(img_path)
+            if probe:
                 image_info['exists'] = True
-                # Could add image dimensions and size here if needed
+                image_info['display_url'] = thumb_url(img['src'])
+                image_info['dimensions'] = {'width': probe['width'], 'height': probe['height']}
+                image_info['format'] = probe['format']
+                image_info['mode'] = probe['mode']
+                image_info['size'] = probe['size']
+            elif img_path.exists():
+                image_info['exists'] = True # Not a readable image
                 image_info['size'] = img_path.stat().st_size
         except Exception as e:
             logging.error(f"Error getting image details for {img['src']}: {e}")
@@ -190,6 +294,37 @@ def get_detailed_image_info(images: list) -> list:
         
     return detailed_images
 
+def apply_status_update(stages: dict, stage_key: str, new_status, slug: str = ''):
+    """
+    Sets a status inside a post's 'stages' dict for a stage or nested sub-stage key
+    like 'images.watermarks.image_id'. Raises ValueError on path collisions.
+    """
+    # Navigate through potentially nested keys (e.g., "images.watermarks.some_image_id")
+    keys = stage_key.split('.')
+    current_level = stages
+    # Iterate through keys up to the second-to-last one to ensure parent dicts exist
+    for i, key in enumerate(keys[:-1]):
+        if isinstance(current_level.get(key), dict):
+             current_level = current_level[key]
+        elif key not in current_level:
+             current_level[key] = {} # Initialize parent dict if missing (e.g. 'watermarks')
+             logging.info(f"Initialized nested dict '{key}' for {slug}/{'/'.join(keys[:i+1])}")
+             current_level = current_level[key]
+        else:
+             # Found a non-dictionary where a dictionary was expected
+             raise ValueError(f"Path collision: '{key}' in '{stage_key}' is not a dictionary.")
+
+    # Now set the status on the final key
+    final_key = keys[-1]
+    # If the final key represents a stage (like 'images' or 'publishing_clancom'),
+    # update its 'status'. If it's a specific item (like an image ID under watermarks),
+    # set the status directly. This assumes simple status strings for now.
+    if final_key in current_level and isinstance(current_level[final_key], dict):
+         current_level[final_key]['status'] = new_status # Update status within a stage object
+    else:
+         current_level[final_key] = new_status # Set status directly (e.g., for watermark ID)
+    logging.info(f"Updating status for '{slug}/{stage_key}' to '{new_status}'.")
+
 # --- Flask Routes ---
 
 @app.route('/')
@@ -197,68 +332,15 @@ def index():
     """Renders the main admin interface page, loading post data."""
     logging.info("Processing index route '/'...")
     posts_list = []
-    posts_dir_path = BASE_DIR / POSTS_DIR_NAME
-    workflow_status_path = DATA_DIR / WORKFLOW_STATUS_FILE
-
-    workflow_data = load_json_data(workflow_status_path)
-    if workflow_data is None:
-        logging.error("Critical error loading workflow data, post status will be unavailable.")
-        workflow_data = {}
-    elif not workflow_data:
-        logging.warning(f"Workflow data file '{WORKFLOW_STATUS_FILE}' not found. Statuses unavailable.")
 
     try:
-        logging.info(f"Scanning directory: {posts_dir_path}")
-        if not posts_dir_path.is_dir():
-             logging.error(f"Posts directory not found: {posts_dir_path}")
-             raise FileNotFoundError
-
-        for filename in sorted(os.listdir(posts_dir_path), reverse=True): # Sort in reverse for newest first
-            if filename.endswith(".md"):
-                file_path = posts_dir_path / filename
-                logging.debug(f"Processing file: {filename}")
-                try:
-                    post_fm = frontmatter.load(file_path)
-                    metadata = post_fm.metadata
-                    slug = Path(filename).stem
-                    title = metadata.get('title', f"Untitled ({slug})")
-                    deleted = metadata.get('deleted', False)
-
-                    # Get clan.com status from workflow data
-                    post_workflow_data = workflow_data.get(slug, {})
-                    clan_com_stage = post_workflow_data.get('stages', {}).get('publishing_clancom', {})
-                    clan_com_post_id = clan_com_stage.get('post_id')
-                    clan_com_status_val = clan_com_stage.get('status', 'pending')
-
-                    # Determine display status
-                    if clan_com_post_id and clan_com_status_val == 'complete':
-                        clan_com_status_display = f"Published (ID: {clan_com_post_id})"
-                    elif clan_com_status_val == 'error':
-                         error_msg = clan_com_stage.get('last_error', 'Unknown Error')
-                         clan_com_status_display = f"Error: {error_msg[:50]}" # Show snippet of error
-                         if len(error_msg) > 50: clan_com_status_display += "..."
-                    else:
-                        clan_com_status_display = "Not Published / Pending"
-
-                    # Add post data to list
-                    posts_list.append({
-                        'slug': slug,
-                        'title': title,
-                        'concept': metadata.get('concept', ''),
-                        'clan_com_status': clan_com_status_display,
-                        'headerImageId': metadata.get('headerImageId', slug),
-                        'deleted': deleted,
-                        'date': metadata.get('date', '')
-                    })
-                except Exception as e:
-                    logging.error(f"Error processing markdown file {filename}: {e}", exc_info=True)
-
-        # Sort by date, newest first
-        posts_list.sort(key=lambda x: x['date'] if x['date'] else '', reverse=True)
+        # Post records and workflow status come from the in-memory index;
+        # only files changed since the last request are re-parsed.
+        posts_list = post_index.posts()
         logging.info(f"Found and processed {len(posts_list)} posts.")
 
     except FileNotFoundError:
-        logging.error(f"Posts directory not found: {posts_dir_path}")
+        logging.error(f"Posts directory not found: {post_index.posts_dir}")
     except Exception as e:
         logging.error(f"Error listing or processing posts directory: {e}", exc_info=True)
 
@@ -339,56 +421,52 @@ conclusion:
         logging.info(f"Created images directory: {images_dir}")
 
         # Update workflow status with proper initialization
-        workflow_status_path = DATA_DIR / WORKFLOW_STATUS_FILE
-        workflow_data = load_json_data(workflow_status_path) or {}
-        if slug not in workflow_data:
-            workflow_data[slug] = {
-                "stages": {
-                    "conceptualisation": {
-                        "status": "complete",
-                        "last_updated": datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z',
-                        "concept": core_idea
-                    },
-                    "authoring": {
-                        "status": "pending",
-                        "text_format_status": "pending"
-                    },
-                    "metadata": {
-                        "status": "pending",
-                        "front_matter_status": "pending",
-                        "tags_status": "pending",
-                        "author_status": "pending"
-                    },
-                    "images": {
-                        "status": "pending",
-                        "prompts_defined_status": "pending",
-                        "generation_status": "pending",
-                        "assets_prepared_status": "pending",
-                        "metadata_integrated_status": "pending",
-                        "watermarking_status": "pending",
-                        "watermarking_used_in_publish": False,
-                        "watermarks": {}
-                    },
-                    "validation": {
-                        "status": "pending",
-                        "last_preview_ok": False
-                    },
-                    "publishing_clancom": {
-                        "status": "pending"
+        workflow_store.create_post(slug, {
+            "stages": {
+                "conceptualisation": {
+                    "status": "complete",
+                    "last_updated": datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z',
+                    "concept": core_idea
+                },
+                "authoring": {
+                    "status": "pending",
+                    "text_format_status": "pending"
+                },
+                "metadata": {
+                    "status": "pending",
+                    "front_matter_status": "pending",
+                    "tags_status": "pending",
+                    "author_status": "pending"
+                },
+                "images": {
+                    "status": "pending",
+                    "prompts_defined_status": "pending",
+                    "generation_status": "pending",
+                    "assets_prepared_status": "pending",
+                    "metadata_integrated_status": "pending",
+                    "watermarking_status": "pending",
+                    "watermarking_used_in_publish": False,
+                    "watermarks": {}
+                },
+                "validation": {
+                    "status": "pending",
+                    "last_preview_ok": False
+                },
+                "publishing_clancom": {
+                    "status": "pending"
+                },
+                "syndication": {
+                    "status": "pending",
+                    "instagram": {
+                        "overall_status": "pending"
                     },
-                    "syndication": {
-                        "status": "pending",
-                        "instagram": {
-                            "overall_status": "pending"
-                        },
-                        "facebook": {
-                            "overall_status": "pending"
-                        }
+                    "facebook": {
+                        "overall_status": "pending"
                     }
-                },
-                "last_updated": datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z'
-            }
-        save_json_data(workflow_status_path, workflow_data)
+                }
+            },
+            "last_updated": datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z'
+        })
 
         return jsonify({
             "success": True,
@@ -404,47 +482,15 @@ conclusion:
 def view_post_detail(slug):
     """View and edit details for a specific post."""
     try:
-        # Load the markdown file
-        md_file_path = os.path.join(app.config['POSTS_DIR'], f"{slug}.md")
-        if not os.path.exists(md_file_path):
-            flash(f"Post file not found: {md_file_path}", "error")
+        # Load the post's front matter from the index (re-parsed only if the file changed)
+        metadata = post_index.metadata(slug)
+        if metadata is None:
+            md_file_path = os.path.join(app.config['POSTS_DIR'], f"{slug}.md")
+            logging.warning(f"Post file not found: {md_file_path}")
             return redirect(url_for('index'))
 
-        with open(md_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Initialize workflow status for this post if needed
-        workflow_status_path = Path(app.config['DATA_DIR']) / 'workflow_status.json'
-        workflow_status = load_json_data(workflow_status_path) or {}
-        if slug not in workflow_status:
-            workflow_status[slug] = {'stages': {}}
-        
-        post_status = workflow_status[slug]
-        
-        # Initialize missing stages with default values
-        for stage in WORKFLOW_STAGES:
-            if stage not in post_status['stages']:
-                post_status['stages'][stage] = {'status': 'pending'}
-                if stage == 'images':
-                    post_status['stages'][stage].update({
-                        'prompts_defined_status': 'pending',
-                        'generation_status': 'pending',
-                        'assets_prepared_status': 'pending',
-                        'metadata_integrated_status': 'pending',
-                        'watermarking_status': 'pending',
-                        'watermarking_used_in_publish': False,
-                        'watermarks': {}
-                    })
-                elif stage == 'validation':
-                    post_status['stages'][stage]['last_preview_ok'] = False
-                elif stage == 'syndication':
-                    post_status['stages'][stage].update({
-                        'instagram': {'overall_status': 'pending'},
-                        'facebook': {'overall_status': 'pending'}
-                    })
-        
-        # Save the updated workflow status
-        save_json_data(workflow_status_path, workflow_status)
+        # Workflow status with defaults for missing stages (read-only: nothing is written here)
+        post_status = with_stage_defaults(workflow_store.get_post(slug))
 
         # Load authors data
         try:
@@ -468,8 +514,8 @@ def view_post_detail(slug):
             app.logger.error(f"Error loading categories: {e}")
             categories = {}
 
-        # Parse the markdown content
-        post_data = parse_post_markdown(content)
+        # Build the post data from the cached front matter
+        post_data = build_post_data(metadata)
         
         # Get image details if available
         images_detailed = get_detailed_image_info(post_data.get('images', []))
@@ -492,161 +538,136 @@ def view_post_detail(slug):
 @app.route('/api/watermark_all/<string:slug>', methods=['POST'])
 def watermark_all_api(slug):
     """
-    Triggers the watermark_images.py script for all referenced images in a post.
+    Queues watermarking of all referenced images in a post (watermark_images.py, run by a background job).
+    Images already watermarked from their current source and settings are skipped unless
+    the JSON body has "force": true.
     """
     logging.info(f"Received request to watermark all images for slug: {slug}")
 
-    # 1. Find referenced image IDs (similar logic to view_post_detail)
+    # 1. Find referenced image IDs from the post index
     md_file_path = BASE_DIR / POSTS_DIR_NAME / f"{slug}.md"
-    referenced_image_ids = []
-    if md_file_path.exists():
-        try:
-            post_fm = frontmatter.load(md_file_path)
-            metadata = post_fm.metadata
-            if 'headerImageId' in metadata: referenced_image_ids.append(metadata['headerImageId'])
-            for section in metadata.get('sections', []):
-                if section.get('imageId'): referenced_image_ids.append(section['imageId'])
-            if metadata.get('conclusion', {}).get('imageId'): referenced_image_ids.append(metadata['conclusion']['imageId'])
-            referenced_image_ids = list(dict.fromkeys(referenced_image_ids)) # Unique IDs
-            logging.info(f"Found {len(referenced_image_ids)} unique image IDs to watermark for '{slug}'.")
-        except Exception as e:
-            error_msg = f"Error loading front matter to get image IDs for '{slug}': {e}"
-            logging.error(error_msg)
-            return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
-    else:
+    try:
+        referenced_image_ids = post_index.image_ids(slug)
+    except Exception as e:
+        error_msg = f"Error loading front matter to get image IDs for '{slug}': {e}"
+        logging.error(error_msg)
+        return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
+    if referenced_image_ids is None:
         error_msg = f"Markdown file not found for slug '{slug}': {md_file_path}"
         logging.error(error_msg)
         return jsonify({"success": False, "output": error_msg, "slug": slug}), 404
+    logging.info(f"Found {len(referenced_image_ids)} unique image IDs to watermark for '{slug}'.")
 
     if not referenced_image_ids:
         return jsonify({"success": True, "output": "No images referenced in post, nothing to watermark.", "slug": slug})
-
-    # 2. Construct command for the script
-    script_path = str(BASE_DIR / 'scripts' / 'watermark_images.py')
-    # Pass slug and image IDs as arguments
-    command = [ sys.executable, script_path, '--slug', slug ]
-    for img_id in referenced_image_ids:
-        command.extend(['--image-id', img_id])
-
-    logging.info(f"Executing command: {' '.join(command)}")
-
-    # 3. Run the script
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=False, cwd=BASE_DIR)
-        output_log = f"--- Watermark Script STDOUT ---\n{result.stdout}\n--- Watermark Script STDERR ---\n{result.stderr}"
-        success = result.returncode == 0
-        if success:
-            logging.info(f"Watermark script for slug '{slug}' completed successfully.")
-        else:
-            logging.error(f"Watermark script for slug '{slug}' failed with return code {result.returncode}.")
-
-        return jsonify({"success": success, "output": output_log, "slug": slug})
+        missing_ids = [img_id for img_id in referenced_image_ids if img_id not in image_library]
+        if missing_ids:
+            logging.warning(f"Image IDs referenced by '{slug}' but missing from the image library: {', '.join(missing_ids)}")
+    except Exception as e:
+        logging.error(f"Error checking image library for '{slug}': {e}")
 
-    except FileNotFoundError:
-        error_msg = f"Error: '{sys.executable}' or script '{script_path}' not found."
-        logging.error(error_msg)
-        return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
+    # 2. Queue the watermark job (runs in the background; follow it via /api/jobs/<id>)
+    try:
+        force = bool((request.get_json(silent=True) or {}).get('force'))
+        job = job_runner.submit('watermark', [slug], {'slug': slug, 'image_ids': referenced_image_ids, 'force': force})
     except Exception as e:
-        error_msg = f"An unexpected error occurred while running the watermark script: {e}"
-        logging.error(error_msg)
+        error_msg = f"Could not queue the watermark job: {e}"
+        logging.error(error_msg, exc_info=True)
         return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
+    return job_accepted_response(job, slug)
 
 
 @app.route('/api/publish_clan/<string:slug>', methods=['POST'])
 def publish_to_clan_api(slug):
     """
-    Triggers the post_to_clan.py script and updates workflow status.
+    Queues a publish/update of a post on clan.com (post_to_clan.py, run by a background job).
     """
     logging.info(f"Received request to publish/update slug: {slug}")
-    script_path = str(BASE_DIR / 'scripts' / 'post_to_clan.py')
     markdown_file_relative_path = f"{POSTS_DIR_NAME}/{slug}.md"
     markdown_file_abs_path = str(BASE_DIR / POSTS_DIR_NAME / f"{slug}.md")
 
-    if not Path(markdown_file_abs_path).is_file():
+    if post_index.get(slug) is None:
         logging.error(f"Markdown file not found for slug '{slug}': {markdown_file_abs_path}")
         return jsonify({"success": False, "output": f"Error: Markdown file not found at {markdown_file_relative_path}", "slug": slug}), 404
 
-    command = [sys.executable, script_path, markdown_file_relative_path]
-    logging.info(f"Executing command: {' '.join(command)}")
+    # Queued; post_to_clan.py records the outcome (status, post_id, last_error) in the workflow store itself
+    try:
+        job = job_runner.submit('publish', [slug], {'md_relative_paths': [markdown_file_relative_path]})
+    except Exception as e:
+        error_msg = f"Could not queue the publish job: {e}"
+        logging.error(error_msg, exc_info=True)
+        return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
+    return job_accepted_response(job, slug)
 
-    output_log = ""
-    script_success = False
-    api_error_msg_for_status = None # For storing error in workflow
 
+@app.route('/api/publish_clan/batch', methods=['POST'])
+def publish_to_clan_batch_api():
+    """
+    Queues one publish job for several posts (one site build, shared API session and image library).
+    Body: {"slugs": ["slug-a", "slug-b"]} or {"all_changed": true}.
+    Each post's workflow status is recorded by post_to_clan.py; the job's result holds the per-slug results.
+    """
+    data = request.get_json(silent=True) or {}
+    slugs = data.get('slugs') or []
+    all_changed = bool(data.get('all_changed'))
+    if not isinstance(slugs, list) or (not slugs and not all_changed):
+        return jsonify({"success": False, "error": "Provide a list of 'slugs' or set 'all_changed'."}), 400
+
+    missing = [slug for slug in slugs if post_index.get(slug) is None]
+    if missing:
+        logging.error(f"Batch publish: markdown file not found for: {', '.join(missing)}")
+        return jsonify({"success": False, "error": f"Markdown file not found for: {', '.join(missing)}"}), 404
+
+    md_relative_paths = [f"{POSTS_DIR_NAME}/{slug}.md" for slug in slugs]
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=False, cwd=BASE_DIR)
-        # Combine stdout and stderr for logging/display, prioritizing stderr for error messages
-        output_log = f"--- STDOUT ---\n{result.stdout}\n--- STDERR ---\n{result.stderr}"
-        script_success = result.returncode == 0
+        if all_changed:
+            publisher = admin_worker.publisher()
+            md_relative_paths += [path for path in publisher.find_changed_posts(workflow_store) if path not in md_relative_paths]
+        job = job_runner.submit('publish', [Path(path).stem for path in md_relative_paths],
+                                {'md_relative_paths': md_relative_paths})
+    except Exception as e:
+        error_msg = f"Could not queue the batch publish job: {e}"
+        logging.error(error_msg, exc_info=True)
+        return jsonify({"success": False, "error": error_msg}), 500
+    return job_accepted_response(job)
 
-        if script_success:
-            logging.info(f"Publish script for slug '{slug}' completed successfully.")
-        else:
-            logging.error(f"Publish script for slug '{slug}' failed with return code {result.returncode}.")
-            # Try to get a concise error from stderr for the status update
-            error_lines = result.stderr.strip().split('\n')
-            last_error_line = error_lines[-1] if error_lines else f"Script failed with exit code {result.returncode}."
-            api_error_msg_for_status = (last_error_line[:250] + '...') if len(last_error_line) > 250 else last_error_line
-
-        # --- BEGIN STATUS UPDATE LOGIC ---
-        workflow_status_path = DATA_DIR / WORKFLOW_STATUS_FILE
-        workflow_data = load_json_data(workflow_status_path)
-
-        if workflow_data is not None: # Only proceed if load was successful
-            if slug not in workflow_data: workflow_data[slug] = {"stages": {}}
-            if 'stages' not in workflow_data[slug]: workflow_data[slug]['stages'] = {}
-            if 'publishing_clancom' not in workflow_data[slug]['stages']: workflow_data[slug]['stages']['publishing_clancom'] = {}
-
-            update_time = datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z'
-            workflow_data[slug]['last_updated'] = update_time
-            workflow_data[slug]['stages']['publishing_clancom']['last_publish_attempt'] = update_time
-
-            if script_success:
-                workflow_data[slug]['stages']['publishing_clancom']['status'] = 'complete'
-                workflow_data[slug]['stages']['publishing_clancom']['last_error'] = None # Clear previous errors
-                logging.info(f"Updating workflow status to 'complete' for {slug}")
-                # --- Try to get Post ID from script output (if script prints it reliably) ---
-                # Example: Assuming script prints "SUCCESS: ... ID: 123"
-                match = re.search(r"SUCCESS:.*?ID:\s*(\d+)", result.stdout, re.IGNORECASE)
-                if match:
-                    extracted_id = int(match.group(1))
-                    workflow_data[slug]['stages']['publishing_clancom']['post_id'] = extracted_id
-                    logging.info(f"Extracted and stored Post ID {extracted_id} for {slug}")
-                # --- End Post ID extraction ---
-            else:
-                workflow_data[slug]['stages']['publishing_clancom']['status'] = 'error'
-                # Use the error captured earlier, or default
-                final_error = api_error_msg_for_status or "Script failed, check logs/output."
-                workflow_data[slug]['stages']['publishing_clancom']['last_error'] = final_error
-                logging.info(f"Updating workflow status to 'error' for {slug}. Error: {final_error}")
-                # Handle specific case where edit failed because post was deleted remotely
-                # (Need post_to_clan.py to reliably indicate this, e.g., via stderr message or specific exit code)
-                # Example: if "PostNotFound" in (api_error_msg_for_status or ""):
-                #    workflow_data[slug]['stages']['publishing_clancom'].pop("post_id", None)
-
-            if not save_json_data(workflow_status_path, workflow_data):
-                logging.error(f"Failed to save updated workflow status for {slug} after script run!")
-                # Optionally add a warning to the output log returned to the user
-                output_log += "\n\nWARNING: Failed to save updated workflow status to JSON file."
-        else:
-            logging.error(f"Could not load workflow status file {workflow_status_path} to update status after script run.")
-            output_log += f"\n\nERROR: Could not load {WORKFLOW_STATUS_FILE} to update status."
-        # --- END STATUS UPDATE LOGIC ---
 
-        # Return script success status and its combined output
-        return jsonify({"success": script_success, "output": output_log, "slug": slug})
+# --- Background Job Status ---
 
-    except FileNotFoundError:
-        error_msg = f"Error: '{sys.executable}' or script '{script_path}' not found."
-        logging.error(error_msg)
-        # Also update status to error here? Risky if workflow file itself is missing.
-        return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
-    except Exception as e:
-        error_msg = f"An unexpected error occurred while preparing/running the script: {e}"
-        logging.error(error_msg, exc_info=True)
-        # Update status to error here?
-        return jsonify({"success": False, "output": error_msg, "slug": slug}), 500
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs_api():
+    """Lists recent background jobs (newest first). Optional ?slug= filter."""
+    return jsonify({"success": True, "jobs": job_runner.list(slug=request.args.get('slug'))})
+
+
+@app.route('/api/jobs/<string:job_id>', methods=['GET'])
+def job_status_api(job_id):
+    """Returns a job's status, result and log output so far."""
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Job not found: {job_id}"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@app.route('/api/jobs/<string:job_id>/events', methods=['GET'])
+def job_events_api(job_id):
+    """
+    Server-Sent Events stream of a job's log lines ('data:' events), ending with an
+    'end' event carrying the finished job's status and result as JSON.
+    """
+    if job_runner.get(job_id) is None:
+        return jsonify({"success": False, "error": f"Job not found: {job_id}"}), 404
 
+    def _stream():
+        for line in job_runner.iter_log(job_id):
+            yield ": keepalive\n\n" if line is None else f"data: {line}\n\n"
+        job = job_runner.get(job_id)
+        job.pop('log', None)
+        yield f"event: end\ndata: {json.dumps(job)}\n\n"
+
+    return Response(_stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/update_status/<string:slug>/<string:stage_key>', methods=['POST'])
 def update_status_api(slug, stage_key):
@@ -663,72 +684,90 @@ def update_status_api(slug, stage_key):
     new_status = data['status']
     # TODO: Add validation for allowed new_status values ('pending', 'partial', 'complete', 'error')?
 
-    workflow_status_path = DATA_DIR / WORKFLOW_STATUS_FILE
-    workflow_data = load_json_data(workflow_status_path)
-
-    if workflow_data is None:
-        return jsonify({"success": False, "message": f"Error loading data file {WORKFLOW_STATUS_FILE}"}), 500
-
     # --- Navigate and Update Nested Structure ---
-    try:
-        # Get or initialize the entry for the slug
-        post_entry = workflow_data.setdefault(slug, {"stages": {}})
-        post_entry.setdefault("stages", {}) # Ensure stages dict exists
+    # Only the top-level stage row (e.g. 'images' for 'images.watermarks.IMG00001') is read and rewritten.
+    keys = stage_key.split('.')
 
-        # Navigate through potentially nested keys (e.g., "images.watermarks.some_image_id")
-        keys = stage_key.split('.')
-        current_level = post_entry["stages"]
-        # Iterate through keys up to the second-to-last one to ensure parent dicts exist
-        for i, key in enumerate(keys[:-1]):
-            # If it's the 'watermarks' level and it doesn't exist, initialize it
-            # (Could be generalized further if more nested dicts are expected)
-            if key == 'watermarks' and key not in current_level:
-                 current_level[key] = {}
-                 logging.info(f"Initialized nested dict '{key}' for {slug}/{'/'.join(keys[:i+1])}")
-            # Otherwise, use setdefault to get or create the next level dictionary
-            elif isinstance(current_level.get(key), dict):
-                 current_level = current_level[key]
-            elif key not in current_level:
-                 current_level[key] = {} # Initialize parent dict if missing
-                 logging.info(f"Initialized nested dict '{key}' for {slug}/{'/'.join(keys[:i+1])}")
-                 current_level = current_level[key]
-            else:
-                 # Found a non-dictionary where a dictionary was expected
-                 raise ValueError(f"Path collision: '{key}' in '{stage_key}' is not a dictionary.")
-
-        # Now set the status on the final key
-        final_key = keys[-1]
-        # Check if the target level is actually a dictionary (it should be after setdefault)
-        if isinstance(current_level, dict):
-            # If the final key represents a stage (like 'images' or 'publishing_clancom'),
-            # update its 'status'. If it's a specific item (like an image ID under watermarks),
-            # set the status directly. This assumes simple status strings for now.
-            if final_key in current_level and isinstance(current_level[final_key], dict):
-                 current_level[final_key]['status'] = new_status # Update status within a stage object
-            else:
-                 current_level[final_key] = new_status # Set status directly (e.g., for watermark ID)
-            logging.info(f"Updating status for '{slug}/{stage_key}' to '{new_status}'.")
-        else:
-             raise ValueError(f"Cannot set status: '{'/'.join(keys[:-1])}' is not a dictionary.")
-
-        post_entry['last_updated'] = datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z'
+    def _apply(current_stage):
+        stages = {} if current_stage is None else {keys[0]: current_stage}
+        apply_status_update(stages, stage_key, new_status, slug)
+        return stages[keys[0]]
 
+    try:
+        workflow_store.mutate_stage(slug, keys[0], _apply,
+                                    last_updated=datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z')
     except (ValueError, KeyError, TypeError) as e:
          logging.error(f"Error navigating/updating status structure for key '{stage_key}': {e}")
          return jsonify({"success": False, "message": f"Invalid stage key or structure: {stage_key}"}), 400
+    except sqlite3.Error as e:
+        logging.error(f"Error saving status for '{slug}/{stage_key}': {e}")
+        return jsonify({"success": False, "message": "Failed to save updated workflow data."}), 500
     # --- End Nested Update ---
 
+    return jsonify({
+        "success": True,
+        "slug": slug,
+        "stage_key": stage_key, # Return the key that was updated
+        "new_status": new_status
+    })
 
-    # Save the updated data
-    if save_json_data(workflow_status_path, workflow_data):
-        return jsonify({
-            "success": True,
-            "slug": slug,
-            "stage_key": stage_key, # Return the key that was updated
-            "new_status": new_status
-        })
-    else:
-        return jsonify({"success": False, "message": "Failed to save updated workflow data."}), 500
+@app.route('/api/update_status/batch', methods=['POST'])
+def update_status_batch_api():
+    """
+    Applies many status updates in one request and one save.
+    Body: {"operations": [{"slug": ..., "stage_key": ..., "status": ...}, ...]} (a bare list is also accepted).
+    Uses the same nested-key logic as update_status_api and reports a result per operation.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        logging.error("Missing or empty 'operations' list in batch status request.")
+        return jsonify({"success": False, "message": "Request body must contain a non-empty 'operations' list"}), 400
+    logging.info(f"Received batch status update with {len(operations)} operation(s).")
+
+    results = [None] * len(operations)
+    mutations = []
+    mutation_indexes = []
+    for i, op in enumerate(operations):
+        if not isinstance(op, dict) or not op.get('slug') or not op.get('stage_key') or 'status' not in op:
+            results[i] = {"index": i, "success": False, "message": "Operation needs 'slug', 'stage_key' and 'status'"}
+            continue
+        slug, stage_key, new_status = op['slug'], op['stage_key'], op['status']
+        keys = stage_key.split('.')
+
+        def _apply(current_stage, keys=keys, stage_key=stage_key, new_status=new_status, slug=slug):
+            stages = {} if current_stage is None else {keys[0]: current_stage}
+            apply_status_update(stages, stage_key, new_status, slug)
+            return stages[keys[0]]
+
+        mutations.append((slug, keys[0], _apply))
+        mutation_indexes.append(i)
+
+    if mutations:
+        try:
+            errors = workflow_store.mutate_stages(mutations,
+                                                  last_updated=datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z')
+        except sqlite3.Error as e:
+            logging.error(f"Error saving batch status update: {e}")
+            return jsonify({"success": False, "message": "Failed to save updated workflow data."}), 500
+
+        for i, error in zip(mutation_indexes, errors):
+            op = operations[i]
+            result = {"index": i, "slug": op['slug'], "stage_key": op['stage_key']}
+            if error is None:
+                result.update({"success": True, "new_status": op['status']})
+            else:
+                logging.error(f"Error navigating/updating status structure for key '{op['stage_key']}': {error}")
+                result.update({"success": False, "message": f"Invalid stage key or structure: {op['stage_key']}"})
+            results[i] = result
+
+    failed = sum(1 for r in results if not r['success'])
+    return jsonify({
+        "success": failed == 0,
+        "applied": len(results) - failed,
+        "failed": failed,
+        "results": results
+    })
 
 @app.route('/api/delete_post/<string:slug>', methods=['POST'])
 def delete_post(slug):
@@ -739,7 +778,7 @@ def delete_post(slug):
             return jsonify({"success": False, "error": f"Post not found: {slug}"}), 404
 
         # Load the current front matter
-        post = frontmatter.load(md_file_path)
+        post = load_post(md_file_path)
         post.metadata['deleted'] = True
 
         # Save the updated front matter
@@ -761,7 +800,7 @@ def restore_post(slug):
             return jsonify({"success": False, "error": f"Post not found: {slug}"}), 404
 
         # Load the current front matter
-        post = frontmatter.load(md_file_path)
+        post = load_post(md_file_path)
         post.metadata['deleted'] = False
 
         # Save the updated front matter
@@ -785,7 +824,7 @@ def update_metadata(slug):
         if not os.path.exists(post_path):
             return jsonify({"success": False, "error": "Post not found"}), 404
             
-        post = frontmatter.load(post_path)
+        post = load_post(post_path)
         
         # Update fields if they exist in the request
         fields_to_update = ['concept', 'title', 'subtitle', 'author', 'categories']
@@ -802,36 +841,27 @@ def update_metadata(slug):
         with open(post_path, 'w', encoding='utf-8') as f:
             f.write(frontmatter.dumps(post))
         
-        # Update workflow status
-        workflow_status = load_json_data(DATA_DIR / WORKFLOW_STATUS_FILE)
-        if slug not in workflow_status:
-            workflow_status[slug] = {'stages': {}}
-        
-        # Update the last_updated timestamp
-        workflow_status[slug]['last_updated'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S+00:00Z')
+        # Update workflow status (only the affected stage rows are written, in one transaction)
+        update_time = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S+00:00Z')
+        stage_updates = {}
         
         # If this is a concept update, update the conceptualisation stage
         if 'concept' in data:
-            if 'conceptualisation' not in workflow_status[slug]['stages']:
-                workflow_status[slug]['stages']['conceptualisation'] = {}
-            
-            workflow_status[slug]['stages']['conceptualisation'].update({
+            stage_updates['conceptualisation'] = {
                 'status': 'complete',
-                'last_updated': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S+00:00Z'),
+                'last_updated': update_time,
                 'concept': data['concept']
-            })
+            }
         
         # Update metadata stage if title, subtitle, or categories are updated
         if any(field in data for field in ['title', 'subtitle', 'categories']):
-            if 'metadata' not in workflow_status[slug]['stages']:
-                workflow_status[slug]['stages']['metadata'] = {}
-            
-            workflow_status[slug]['stages']['metadata'].update({
+            stage_updates['metadata'] = {
                 'status': 'complete',
-                'last_updated': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S+00:00Z')
-            })
+                'last_updated': update_time
+            }
         
-        save_json_data(DATA_DIR / WORKFLOW_STATUS_FILE, workflow_status)
+        # Together with the last_updated timestamp
+        workflow_store.update_post(slug, stage_updates=stage_updates, last_updated=update_time)
         
         return jsonify({"success": True})
     except Exception as e:
@@ -847,8 +877,8 @@ def update_content(slug):
         if not os.path.exists(markdown_file):
             return jsonify({'success': False, 'error': 'Post not found'}), 404
 
-        # Load the current content using frontmatter library
-        post = frontmatter.load(markdown_file)
+        # Load the current content (fast YAML loader, body kept for write-back)
+        post = load_post(markdown_file)
         
         # Update the content from the request
         data = request.get_json()
@@ -870,26 +900,17 @@ def update_content(slug):
             f.write(frontmatter.dumps(post))
 
         # Update workflow status if all required fields are filled
-        workflow_file = '_data/workflow_status.json'
-        if os.path.exists(workflow_file):
-            with open(workflow_file, 'r', encoding='utf-8') as f:
-                workflow_data = json.load(f)
+        if workflow_store.get_post(slug) is not None:
+            # Check if all required fields are filled
+            has_summary = bool(post.metadata.get('summary'))
+            has_sections = bool(post.metadata.get('sections'))
+            has_conclusion = bool(post.metadata.get('conclusion', {}).get('text'))
             
-            if slug in workflow_data:
-                # Check if all required fields are filled
-                has_summary = bool(post.metadata.get('summary'))
-                has_sections = bool(post.metadata.get('sections'))
-                has_conclusion = bool(post.metadata.get('conclusion', {}).get('text'))
-                
-                if has_summary and has_sections and has_conclusion:
-                    workflow_data[slug]['stages']['authoring']['status'] = 'complete'
-                    workflow_data[slug]['stages']['authoring']['text_format_status'] = 'complete'
-                else:
-                    workflow_data[slug]['stages']['authoring']['status'] = 'pending'
-                    workflow_data[slug]['stages']['authoring']['text_format_status'] = 'pending'
-                
-                with open(workflow_file, 'w', encoding='utf-8') as f:
-                    json.dump(workflow_data, f, indent=2)
+            authoring_status = 'complete' if has_summary and has_sections and has_conclusion else 'pending'
+            workflow_store.update_stage(slug, 'authoring', {
+                'status': authoring_status,
+                'text_format_status': authoring_status
+            })
 
         return jsonify({'success': True})
 
@@ -927,7 +948,7 @@ def import_content(slug):
                 return jsonify({'success': False, 'error': 'Post not found'}), 404
             
             # Load the existing post
-            post = frontmatter.load(post_path)
+            post = load_post(post_path)
             
             # Update the metadata with the new content
             if parsed_content.get('summary'):
@@ -941,21 +962,12 @@ def import_content(slug):
             with open(post_path, 'w', encoding='utf-8') as f:
                 f.write(frontmatter.dumps(post))
             
-            # Update workflow status
-            workflow_data = load_json_data(DATA_DIR / WORKFLOW_STATUS_FILE)
-            if workflow_data is None:
-                workflow_data = {}
-            
-            if slug not in workflow_data:
-                workflow_data[slug] = {'stages': {}}
-            
-            workflow_data[slug]['stages']['authoring'] = {
+            # Update workflow status (replaces the authoring stage)
+            workflow_store.mutate_stage(slug, 'authoring', lambda _: {
                 'status': 'complete',
                 'text_format_status': 'complete',
                 'last_updated': datetime.utcnow().isoformat()
-            }
-            
-            save_json_data(DATA_DIR / WORKFLOW_STATUS_FILE, workflow_data)
+            })
             
             # Clean up the temporary file
             os.unlink(temp_path)
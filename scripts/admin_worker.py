@@ -0,0 +1,91 @@
+import sys
+import logging
+import threading
+import importlib
+import importlib.util
+from pathlib import Path
+
+WATERMARK_SCRIPT_NAME = "~watermark_images.py" # Loaded by path: '~' is not valid in a module name
+
+
+class AdminWorker:
+    """
+    In-process worker for the admin app's publish and watermark operations.
+
+    Replaces running post_to_clan.py / watermark_images.py as subprocesses: the
+    scripts are imported once and their functions are called with the app's own
+    WorkflowStore and ImageLibrary, so configuration, the clan.com API session
+    (keep-alive connections) and the data caches stay warm between requests.
+    publish_job() and watermark_job() are the JobRunner handlers; they return
+    (success, result) with the scripts' structured result dicts.
+    """
+
+    def __init__(self, base_dir: Path, workflow_store, image_library):
+        self.base_dir = Path(base_dir)
+        self.workflow_store = workflow_store
+        self.image_library = image_library
+        self._modules = {}
+        self._modules_lock = threading.Lock()
+
+    # --- Script modules (imported on first use) ---
+
+    def publisher(self):
+        """Returns the post_to_clan module; raises RuntimeError if its configuration is invalid."""
+        with self._modules_lock:
+            if 'publisher' not in self._modules:
+                if str(self.base_dir) not in sys.path:
+                    sys.path.insert(0, str(self.base_dir))
+                try:
+                    self._modules['publisher'] = importlib.import_module("scripts.post_to_clan")
+                except SystemExit:
+                    # load_config() exits when CLAN_API_KEY is missing; retry on the next call
+                    sys.modules.pop("scripts.post_to_clan", None)
+                    raise RuntimeError("Publishing is not configured: missing CLAN_API_KEY in environment/.env file.")
+            return self._modules['publisher']
+
+    def _watermarker(self):
+        """Returns the watermark_images module."""
+        with self._modules_lock:
+            if 'watermarker' not in self._modules:
+                script_path = self.base_dir / 'scripts' / WATERMARK_SCRIPT_NAME
+                spec = importlib.util.spec_from_file_location("watermark_images", script_path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self._modules['watermarker'] = module
+            return self._modules['watermarker']
+
+    # --- Operations ---
+
+    def publish(self, md_relative_paths, force_create=False, force_build=False):
+        """Builds and publishes the given posts. Returns one result dict per path."""
+        md_relative_paths = list(md_relative_paths)
+        try:
+            publisher = self.publisher()
+        except RuntimeError as e:
+            logging.error(str(e))
+            return [{'slug': Path(path).stem, 'success': False, 'unchanged': False, 'post_id': None, 'error': str(e)}
+                    for path in md_relative_paths]
+        try:
+            results = publisher.publish_posts(md_relative_paths, self.workflow_store, self.image_library,
+                                              force_create=force_create, force_build=force_build)
+        except publisher.PublishError as e:
+            logging.error(str(e))
+            results = [{'slug': Path(path).stem, 'success': False, 'unchanged': False, 'post_id': None, 'error': str(e)}
+                       for path in md_relative_paths]
+        self.workflow_store.flush()
+        return results
+
+    def watermark(self, slug, image_ids, force=False):
+        """Watermarks a post's images (those already current are skipped unless force). Returns the watermark_images.py result dict."""
+        return self._watermarker().watermark_post_images(slug, list(image_ids), self.workflow_store, self.image_library, force=force)
+
+    # --- JobRunner handlers ---
+
+    def publish_job(self, md_relative_paths, force_create=False, force_build=False):
+        results = self.publish(md_relative_paths, force_create, force_build)
+        succeeded = sum(1 for result in results if result['success'])
+        return succeeded == len(results), {'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded}
+
+    def watermark_job(self, slug, image_ids, force=False):
+        result = self.watermark(slug, image_ids, force)
+        return result['success'], result
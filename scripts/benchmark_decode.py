@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the import decode path for oversized JPEGs: full-resolution decode +
+LANCZOS resize to MAX_WIDTH, against draft-mode decode (libjpeg DCT scaling to
+1/2, 1/4 or 1/8) + LANCZOS resize, at the reducing gaps given with --gaps.
+
+Reports per-image decode and resize time, the peak memory growth of each variant
+(each measured in a fresh process) and the quality of its MAX_WIDTH frame
+against the full-decode frame (PSNR in dB; 'inf' means identical).
+
+The sample photos in images/ are only ~1500px wide, so by default they are
+upscaled (LANCZOS, then saved as quality-92 JPEGs) to --source-width to stand in
+for 3000-6000px camera / AI-generator sources.
+
+Usage:
+    python scripts/benchmark_decode.py                        # *_raw.jpg under images/posts, upscaled to 6000px
+    python scripts/benchmark_decode.py --source-width 3000 --gaps 1 2
+    python scripts/benchmark_decode.py big1.jpg big2.jpg --no-upscale
+"""
+
+import sys
+import math
+import time
+import resource
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from PIL import Image, ImageChops, ImageStat
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+from scripts.image_pipeline import decode_image, resize_to_width
+
+MAX_WIDTH = 1200 # Matches process_imported_image.py
+SOURCE_JPEG_QUALITY = 92
+
+
+def _peak_rss_kb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _make_sources(image_paths, source_width, out_dir):
+    """Upscales the sample images to source_width and saves them as JPEGs in out_dir."""
+    sources = []
+    for path in image_paths:
+        with Image.open(path) as img:
+            img = img.convert('RGB')
+            height = round(source_width * img.height / img.width)
+            target = out_dir / f"{path.stem}-{source_width}w.jpg"
+            img.resize((source_width, height), Image.Resampling.LANCZOS).save(target, "JPEG", quality=SOURCE_JPEG_QUALITY)
+        sources.append(target)
+    return sources
+
+
+def _run_variant(gap, image_paths, repeat, frame_dir):
+    """Runs in a fresh process; gap None is the full-resolution decode."""
+    baseline_kb = _peak_rss_kb()
+    decode_seconds = resize_seconds = 0.0
+    count = 0
+    for n in range(repeat):
+        for i, path in enumerate(image_paths):
+            start = time.perf_counter()
+            frame = decode_image(path, MAX_WIDTH, gap) if gap else decode_image(path)
+            decoded_size = frame.size
+            resize_start = time.perf_counter()
+            frame = resize_to_width(frame, MAX_WIDTH)
+            decode_seconds += resize_start - start
+            resize_seconds += time.perf_counter() - resize_start
+            count += 1
+            if n == 0:
+                frame.save(frame_dir / f"{i}-{gap or 'full'}.png")
+            del frame
+    return {
+        'variant': f"draft gap {gap:g}" if gap else "full decode",
+        'gap': gap,
+        'decoded_size': decoded_size,
+        'decode_ms': decode_seconds * 1000 / count,
+        'resize_ms': resize_seconds * 1000 / count,
+        'peak_growth_mb': (_peak_rss_kb() - baseline_kb) / 1024,
+    }
+
+
+def _psnr(reference_path, frame_path):
+    with Image.open(reference_path) as reference, Image.open(frame_path) as frame:
+        if reference.size != frame.size:
+            return float('nan')
+        stat = ImageStat.Stat(ImageChops.difference(reference.convert('RGB'), frame.convert('RGB')))
+        mse = sum(stat.sum2) / (len(stat.sum2) * reference.width * reference.height)
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs. draft-mode JPEG decoding for the import pipeline.")
+    parser.add_argument('images', nargs='*', help="JPEGs to decode (default: *_raw.jpg images under images/posts).")
+    parser.add_argument('--source-width', type=int, default=6000, help="Upscale the samples to this width first (default: 6000).")
+    parser.add_argument('--no-upscale', action='store_true', help="Decode the given images as they are.")
+    parser.add_argument('--gaps', type=float, nargs='+', default=[1.0, 2.0], help="Draft reducing gaps to compare (default: 1 2).")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the image set (default: 3).")
+    args = parser.parse_args()
+
+    image_paths = [Path(p) for p in args.images] or sorted((BASE_DIR / "images/posts").glob("*/*_raw.jpg"))
+    if not image_paths:
+        parser.error("No images found to benchmark.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        context = multiprocessing.get_context('spawn')
+        if not args.no_upscale:
+            print(f"Preparing {len(image_paths)} source(s) at {args.source_width}px wide...")
+            # In a child process: forked processes inherit the parent's peak RSS, which would skew the measurements
+            with context.Pool(1) as pool:
+                image_paths = pool.apply(_make_sources, (image_paths, args.source_width, tmp_dir))
+        with Image.open(image_paths[0]) as first:
+            print(f"Decoding {len(image_paths)} image(s) (first: {first.width}x{first.height}) to {MAX_WIDTH}px x {args.repeat} pass(es)")
+
+        results = []
+        for gap in [None] + args.gaps:
+            with context.Pool(1) as pool:
+                results.append(pool.apply(_run_variant, (gap, image_paths, args.repeat, tmp_dir)))
+        for r in results:
+            scores = [_psnr(tmp_dir / f"{i}-full.png", tmp_dir / f"{i}-{r['gap'] or 'full'}.png") for i in range(len(image_paths))]
+            r['psnr'] = min(scores)
+
+    print(f"{'variant':<14} {'decoded as':>11} {'decode ms':>10} {'resize ms':>10} {'peak +MB':>9} {'min PSNR dB':>12}")
+    for r in results:
+        size = "x".join(str(v) for v in r['decoded_size'])
+        print(f"{r['variant']:<14} {size:>11} {r['decode_ms']:>10.1f} {r['resize_ms']:>10.1f} {r['peak_growth_mb']:>9.1f} {r['psnr']:>12.1f}")
+    full = results[0]
+    for r in results[1:]:
+        print(f"{r['variant']}: decode + resize {(full['decode_ms'] + full['resize_ms']) / (r['decode_ms'] + r['resize_ms']):.1f}x faster, "
+              f"peak memory {full['peak_growth_mb'] - r['peak_growth_mb']:.0f} MB lower.")
+
+
+if __name__ == "__main__":
+    main()
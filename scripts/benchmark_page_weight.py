@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Estimates the reader-side effect of the responsive <img> markup that
+post_to_clan.py publishes (width/height, loading="lazy", srcset/sizes).
+
+Extracts a post's built HTML (_site/<slug>/index.html) as publishing would, then
+simulates what a browser downloads on a few viewports:
+  - before: every image's full-size 'src', all fetched eagerly, no dimensions
+  - after:  the srcset candidate the browser would pick for 'sizes' x DPR, with
+            lazy images left out of the initial load
+Byte counts come from the local files. 'LCP image' is the first content image,
+the likely LCP element. 'No dims' counts images without width/height (layout shift).
+
+Usage:
+    python scripts/benchmark_page_weight.py kilt-evolution
+"""
+
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+from bs4 import BeautifulSoup
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("CLAN_API_KEY", "unused") # Extraction never calls the API
+from scripts import post_to_clan
+from scripts.image_library import ImageLibrary
+
+VERSIONED_NAME_RE = re.compile(r'\.[0-9a-f]{%d}(\.[^.]+)$' % post_to_clan.IMAGE_VERSION_LENGTH) # photo.<hash>.jpg -> photo.jpg
+VIEWPORTS = [("phone", 375, 3), ("tablet", 768, 2), ("desktop", 1440, 1)] # name, CSS px width, device pixel ratio
+
+
+def slot_width(sizes: str, viewport: int) -> float:
+    """Evaluates a simple 'sizes' value ('(max-width: 800px) 100vw, 800px') for a viewport width."""
+    for entry in (part.strip() for part in sizes.split(',')):
+        match = re.match(r'\(max-width:\s*(\d+)px\)\s*(.+)', entry)
+        if match and viewport > int(match.group(1)):
+            continue
+        length = match.group(2) if match else entry
+        return viewport * float(length[:-2]) / 100 if length.endswith('vw') else float(length.rstrip('px'))
+    return viewport
+
+
+def pick_candidate(img, viewport: int, dpr: int) -> str:
+    """The URL a browser would fetch: the smallest srcset width covering the slot at this DPR."""
+    if not img.get('srcset'):
+        return img['src']
+    candidates = sorted((int(width[:-1]), url) for url, width in (c.strip().rsplit(' ', 1) for c in img['srcset'].split(',')))
+    needed = slot_width(img.get('sizes', '100vw'), viewport) * dpr
+    return next((url for width, url in candidates if width >= needed), candidates[-1][1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate image bytes per viewport before/after responsive image markup.")
+    parser.add_argument('slug', help="Post slug (its built HTML must exist in _site/<slug>/index.html).")
+    args = parser.parse_args()
+
+    image_library = ImageLibrary(post_to_clan.CONFIG["image_library_file"], base_dir=BASE_DIR)
+    html = post_to_clan.extract_html_content(post_to_clan.built_html_path_for(args.slug), image_library=image_library)
+    if html is None:
+        parser.error(f"Could not extract the built HTML of '{args.slug}'.")
+    images = BeautifulSoup(html, 'html.parser').find_all('img')
+    local_sizes = {path.name: path.stat().st_size for path in (BASE_DIR / "images").rglob("*") if path.is_file()}
+
+    def size_of(url):
+        name = os.path.basename(url.split('?')[0])
+        return local_sizes.get(name, local_sizes.get(VERSIONED_NAME_RE.sub(r'\1', name), 0)) # Uploaded names carry the content hash
+
+    print(f"{len(images)} image(s); no dims before: {len(images)}, after: {sum(1 for i in images if not i.get('width'))}; "
+          f"lazy after: {sum(1 for i in images if i.get('loading') == 'lazy')}")
+    print(f"{'viewport':<18} {'initial KB before':>17} {'after':>8} {'LCP img KB before':>17} {'after':>8} {'full scroll KB before':>21} {'after':>8}")
+    for name, width, dpr in VIEWPORTS:
+        before = [size_of(img['src']) for img in images]
+        after = [size_of(pick_candidate(img, width, dpr)) for img in images]
+        initial_after = sum(size for img, size in zip(images, after) if img.get('loading') != 'lazy')
+        print(f"{f'{name} {width}px@{dpr}x':<18} {sum(before) / 1024:>17.0f} {initial_after / 1024:>8.0f} "
+              f"{before[0] / 1024:>17.0f} {after[0] / 1024:>8.0f} {sum(before) / 1024:>21.0f} {sum(after) / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
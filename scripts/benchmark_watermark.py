@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmarks watermarking: the previous full-frame approach (resize the watermark
+and composite a full-size transparent layer for every image) against
+WatermarkEngine (cached tile, corner-region composite).
+
+Reports per-image time (watermark step, and decode + watermark + JPEG encode) and
+the peak memory growth of each approach, each measured in a fresh process.
+
+Usage:
+    python scripts/benchmark_watermark.py                  # *_raw images under images/posts
+    python scripts/benchmark_watermark.py a.jpg b.png --repeat 5
+"""
+
+import io
+import sys
+import time
+import resource
+import argparse
+import multiprocessing
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+from scripts.watermark_engine import WatermarkEngine
+
+WATERMARK_PATH = BASE_DIR / "images/site/clan-watermark.png"
+TARGET_WATERMARK_WIDTH = 200
+OFFSET = 10
+BACKGROUND_FILL = (128, 128, 128, int(255 * 0.5))
+JPEG_QUALITY = 95
+
+
+def legacy_watermark(image):
+    """The pre-WatermarkEngine implementation, kept here for comparison."""
+    base_image = image.convert("RGBA")
+    with Image.open(WATERMARK_PATH) as watermark_file:
+        watermark_image = watermark_file.convert("RGBA")
+    new_wm_height = max(1, int(TARGET_WATERMARK_WIDTH * watermark_image.height / watermark_image.width))
+    watermark_resized = watermark_image.resize((TARGET_WATERMARK_WIDTH, new_wm_height), Image.Resampling.LANCZOS)
+    position = (max(0, base_image.width - TARGET_WATERMARK_WIDTH - OFFSET), max(0, base_image.height - new_wm_height - OFFSET))
+    composite_layer = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(composite_layer)
+    draw.rectangle([position[0], position[1], position[0] + TARGET_WATERMARK_WIDTH, position[1] + new_wm_height], fill=BACKGROUND_FILL)
+    del draw
+    composite_layer.paste(watermark_resized, position, watermark_resized)
+    return Image.alpha_composite(base_image, composite_layer).convert('RGB')
+
+
+def _peak_rss_kb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _run_variant(variant, image_paths, repeat):
+    """Runs in a fresh process so each variant's peak memory is measured on its own."""
+    engine = WatermarkEngine(WATERMARK_PATH, target_width=TARGET_WATERMARK_WIDTH, offset=OFFSET)
+    if variant == 'engine':
+        watermark = lambda image: engine.apply(image.convert('RGB') if image.mode != 'RGB' else image)
+    else:
+        watermark = legacy_watermark
+    baseline_kb = _peak_rss_kb()
+    stamp_seconds = total_seconds = 0.0
+    count = 0
+    for _ in range(repeat):
+        for path in image_paths:
+            start = time.perf_counter()
+            with Image.open(path) as image:
+                image.load()
+                stamp_start = time.perf_counter()
+                result = watermark(image if image.mode in ('RGB', 'RGBA') else image.convert('RGB'))
+                stamp_seconds += time.perf_counter() - stamp_start
+            result.save(io.BytesIO(), "JPEG", quality=JPEG_QUALITY)
+            total_seconds += time.perf_counter() - start
+            count += 1
+    return {
+        'variant': variant,
+        'images': count,
+        'stamp_ms': stamp_seconds * 1000 / count,
+        'total_ms': total_seconds * 1000 / count,
+        'peak_growth_mb': (_peak_rss_kb() - baseline_kb) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-frame vs. region-only watermarking.")
+    parser.add_argument('images', nargs='*', help="Images to watermark (default: *_raw images under images/posts).")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the image set (default: 3).")
+    args = parser.parse_args()
+
+    image_paths = [Path(p) for p in args.images] or sorted((BASE_DIR / "images/posts").glob("*/*_raw.*"))
+    if not image_paths:
+        parser.error("No images found to benchmark.")
+    print(f"Watermarking {len(image_paths)} image(s) x {args.repeat} pass(es)")
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for variant in ('legacy', 'engine'):
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_run_variant, (variant, image_paths, args.repeat)))
+
+    print(f"{'variant':<8} {'stamp ms/img':>13} {'total ms/img':>13} {'peak +MB':>9}")
+    for r in results:
+        print(f"{r['variant']:<8} {r['stamp_ms']:>13.2f} {r['total_ms']:>13.2f} {r['peak_growth_mb']:>9.1f}")
+    legacy, engine = results
+    print(f"Watermark step: {legacy['stamp_ms'] / engine['stamp_ms']:.1f}x faster; "
+          f"end to end: {legacy['total_ms'] / engine['total_ms']:.2f}x faster.")
+
+
+if __name__ == "__main__":
+    main()
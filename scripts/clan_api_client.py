@@ -0,0 +1,153 @@
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# --- Defaults ---
+DEFAULT_MAX_RETRIES = 3 # Retries after the first attempt
+DEFAULT_BACKOFF_BASE = 0.5 # Seconds; delay before retry n is base * 2**(n-1) plus jitter
+DEFAULT_BACKOFF_MAX = 8.0 # Upper bound for a single backoff delay (seconds)
+DEFAULT_POOL_SIZE = 8 # Keep-alive connections kept open to the API host
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# (connect timeout, read timeout) in seconds, per API function
+ENDPOINT_TIMEOUTS = {
+    'uploadImage': (10, 60),
+    'createPost': (10, 120),
+    'editPost': (10, 120),
+}
+DEFAULT_TIMEOUT = (10, 60)
+
+# createPost is not idempotent: a retry after the request reached the server could
+# create a duplicate post, so it is only retried when the connection could not be made.
+CONNECT_ONLY_RETRY = {'createPost'}
+
+
+class ClanApiClient:
+    """
+    HTTP client for the clan.com blog API.
+
+    One requests.Session is shared by all calls, so connections (TCP + TLS) are
+    kept alive and reused between image uploads and createPost/editPost calls.
+    Transient failures (timeouts, connection errors, 429/5xx responses) are retried
+    with exponential backoff and jitter. Every call's latency is logged and kept in
+    'call_log'. Safe to use from several threads.
+    """
+
+    def __init__(self, base_url: str, api_user: str, api_key: str,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeouts: dict = None):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.api_user = api_user
+        self.api_key = api_key
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = dict(ENDPOINT_TIMEOUTS, **(timeouts or {}))
+        self.call_log = [] # One dict per call: api_function, status_code, attempts, elapsed_ms, error
+        self._log_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0) # Retries are handled here
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Builds a client from post_to_clan.py's CONFIG dict."""
+        return cls(config["api_base_url"], config["api_user"], config["api_key"],
+                   max_retries=config.get("api_max_retries", DEFAULT_MAX_RETRIES),
+                   backoff_base=config.get("api_backoff_base", DEFAULT_BACKOFF_BASE),
+                   pool_size=config.get("api_pool_size", DEFAULT_POOL_SIZE))
+
+    def close(self):
+        self.session.close()
+
+    # --- Internal ---
+
+    @staticmethod
+    def _never_connected(error: Exception) -> bool:
+        """True if the request failed before a connection was made (so it never reached the server)."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _backoff_delay(self, retry_number: int) -> float:
+        """Exponential backoff for the given retry (1-based), jittered to between half and the full delay."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (retry_number - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def _record(self, api_function: str, status_code, attempts: int, elapsed: float, error: str = None):
+        entry = {
+            'api_function': api_function,
+            'status_code': status_code,
+            'attempts': attempts,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'error': error,
+        }
+        with self._log_lock:
+            self.call_log.append(entry)
+        logging.info(f"  API {api_function}: status {status_code}, {attempts} attempt(s), {entry['elapsed_ms']:.0f} ms")
+
+    # --- Public API ---
+
+    def post(self, api_function: str, data=None, files=None) -> requests.Response:
+        """
+        POSTs to <base_url><api_function> with the API credentials added to 'data'
+        (or to 'files' for multipart (None, value) payloads when data is None).
+        File contents in 'files' must be bytes so they can be re-sent on retry.
+        Returns the final response (HTTP errors are left to the caller's raise_for_status());
+        raises requests.exceptions.RequestException if every attempt failed at the network level.
+        """
+        url = self.base_url + api_function
+        timeout = self.timeouts.get(api_function, DEFAULT_TIMEOUT)
+        connect_only = api_function in CONNECT_ONLY_RETRY
+        if data is None and files is not None:
+            files = dict(files, api_user=(None, self.api_user), api_key=(None, self.api_key))
+        else:
+            data = dict(data or {}, api_user=self.api_user, api_key=self.api_key)
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.post(url, data=data, files=files, timeout=timeout, verify=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                retryable = not connect_only or self._never_connected(e)
+                if attempt > self.max_retries or not retryable:
+                    self._record(api_function, None, attempt, time.perf_counter() - start, str(e))
+                    raise
+                delay = self._backoff_delay(attempt)
+                logging.warning(f"  API {api_function}: {type(e).__name__} on attempt {attempt}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and not connect_only and attempt <= self.max_retries:
+                delay = self._backoff_delay(attempt)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, min(float(retry_after), self.backoff_max))
+                logging.warning(f"  API {api_function}: HTTP {response.status_code} on attempt {attempt}; retrying in {delay:.1f}s")
+                response.close()
+                time.sleep(delay)
+                continue
+
+            self._record(api_function, response.status_code, attempt, time.perf_counter() - start)
+            return response
+
+    def latency_summary(self) -> dict:
+        """Returns {api_function: {'calls', 'total_ms', 'max_ms'}} for the calls made so far."""
+        summary = {}
+        with self._log_lock:
+            for entry in self.call_log:
+                stats = summary.setdefault(entry['api_function'], {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                stats['calls'] += 1
+                stats['total_ms'] += entry['elapsed_ms']
+                stats['max_ms'] = max(stats['max_ms'], entry['elapsed_ms'])
+        return summary
@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from scripts.image_library import file_content_hash
+
+DERIVATIVE_PIPELINE_VERSION = 2 # Bump to invalidate every recorded derivative
+JSON_INDENT = 2
+MANIFEST_ONLY_FIELDS = ('source_hash', 'mtime_ns', 'sha256') # Kept in the manifest, not in library records
+
+
+def derivative_settings_hash(width: int, format: str, save_options: dict, max_width: int = None) -> str:
+    """Short hash of everything that affects a derivative's bytes apart from the source itself."""
+    settings = {
+        'version': DERIVATIVE_PIPELINE_VERSION,
+        'width': width,
+        'format': format.upper(),
+        'save_options': save_options or {},
+        'max_width': max_width, # Derivatives are scaled from the MAX_WIDTH frame
+        'resample': 'LANCZOS',
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def derivative_filename(image_id: str, width: int, format: str) -> str:
+    return f"{image_id}-{width}w.{format.lower()}"
+
+
+def derivative_widths(frame_width: int, widths) -> list:
+    """The configured widths that do not upscale the frame (the frame width itself if none fit)."""
+    fitting = sorted({width for width in widths if width <= frame_width})
+    return fitting or [frame_width]
+
+
+class DerivativeManifest:
+    """
+    Records which responsive derivatives exist, keyed by the derivative's path
+    (relative to base_dir, so one record per output file and image ID).
+
+    A record holds the source SHA-256 and settings hash the file was encoded from,
+    its format, width, height, size in bytes, mtime and SHA-256. A derivative is
+    current, and re-running the import skips it, only if its path's record matches
+    the source and settings hashes and the file on disk is still the one recorded
+    (same size and mtime, else same content hash). Thread-safe; save() writes
+    atomically and merges with entries another process saved in the meantime.
+    """
+
+    def __init__(self, json_path: Path, base_dir: Path):
+        self.json_path = Path(json_path)
+        self.base_dir = Path(base_dir)
+        self._entries = None
+        self._dirty = {}
+        self._lock = threading.RLock()
+
+    def key(self, path) -> str:
+        """Manifest key of a derivative file: its path relative to base_dir."""
+        path = Path(path)
+        if path.is_absolute():
+            path = Path(os.path.relpath(path, self.base_dir))
+        return path.as_posix()
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"DerivativeManifest: could not read {self.json_path} ({e}); starting empty.")
+            return {}
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            # Entries without 'source_hash' come from the old '<source>:<settings>' keying and are dropped
+            self._entries = {key: record for key, record in self._read_file().items()
+                             if isinstance(record, dict) and record.get('source_hash')}
+        return self._entries
+
+    def current(self, path, source_hash: str, settings_hash: str):
+        """
+        Returns the library record of the derivative at 'path' if it was encoded from this
+        source with these settings and the file is unchanged since, else None.
+        """
+        key = self.key(path)
+        with self._lock:
+            record = self._load().get(key)
+        if not record or record['source_hash'] != source_hash or record.get('settings_hash') != settings_hash:
+            return None
+        file_path = self.base_dir / key
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if st.st_size != record.get('bytes'):
+            return None
+        if st.st_mtime_ns != record.get('mtime_ns') and file_content_hash(file_path) != record.get('sha256'):
+            return None
+        return {field: value for field, value in record.items() if field not in MANIFEST_ONLY_FIELDS}
+
+    def record(self, source_hash: str, derivative: dict):
+        """Records a derivative dict (must include 'settings_hash' and 'path') as encoded from source_hash."""
+        key = self.key(derivative['path'])
+        st = os.stat(self.base_dir / key)
+        with self._lock:
+            previous = self._load().get(key)
+        if previous and previous.get('sha256') and (previous.get('mtime_ns'), previous.get('bytes')) == (st.st_mtime_ns, st.st_size):
+            sha256 = previous['sha256'] # Unchanged file; no need to hash it again
+        else:
+            sha256 = file_content_hash(self.base_dir / key)
+        entry = dict(derivative, source_hash=source_hash, mtime_ns=st.st_mtime_ns, sha256=sha256)
+        with self._lock:
+            self._load()[key] = entry
+            self._dirty[key] = entry
+
+    def save(self) -> bool:
+        """Writes the manifest if anything was recorded. Returns False on failure."""
+        with self._lock:
+            if not self._dirty:
+                return True
+            merged = {key: record for key, record in self._read_file().items()
+                      if isinstance(record, dict) and record.get('source_hash')}
+            merged.update(self._dirty)
+            tmp_path = self.json_path.with_name(f".{self.json_path.name}.{os.getpid()}.tmp")
+            try:
+                self.json_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(merged, f, indent=JSON_INDENT, sort_keys=True)
+                os.replace(tmp_path, self.json_path)
+            except OSError as e:
+                logging.error(f"DerivativeManifest: failed to save {self.json_path}: {e}")
+                return False
+            self._entries = merged
+            self._dirty = {}
+            return True
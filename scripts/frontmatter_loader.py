@@ -0,0 +1,116 @@
+import re
+import logging
+import yaml
+import frontmatter
+
+# Prefer the libyaml-backed loader; it is several times faster than the pure-Python one.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Same boundary rule as python-frontmatter's YAMLHandler ("---" with optional trailing whitespace)
+FM_BOUNDARY = re.compile(r"^-{3,}\s*$")
+# A top-level mapping key: starts in column 0, not a comment, list item or flow collection
+TOP_LEVEL_KEY = re.compile(r"""^(?P<key>"[^"]*"|'[^']*'|[^\s#\-\[\]{}'"][^:]*?)\s*:(?:\s|$)""")
+
+
+# --- Helper Functions ---
+
+def read_front_matter_text(path) -> str:
+    """
+    Reads only the YAML front matter block of a Markdown file, stopping at the
+    closing '---' delimiter so the post body is never read.
+    Returns the YAML text, or None if the file has no front matter.
+    """
+    lines = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        first_line = f.readline()
+        if not FM_BOUNDARY.match(first_line):
+            return None
+        for line in f:
+            if FM_BOUNDARY.match(line):
+                return ''.join(lines)
+            lines.append(line)
+    logging.warning(f"No closing front matter delimiter found in {path}.")
+    return None
+
+
+def _split_top_level_blocks(yaml_text: str) -> dict:
+    """Splits front matter YAML into {top-level key: raw text of its block}."""
+    blocks = {}
+    current_key = None
+    current_lines = []
+    for line in yaml_text.splitlines(keepends=True):
+        match = TOP_LEVEL_KEY.match(line)
+        if match:
+            if current_key is not None:
+                blocks[current_key] = ''.join(current_lines)
+            current_key = match.group('key').strip('\'"')
+            current_lines = [line]
+        elif current_key is not None:
+            current_lines.append(line) # Indented continuation, comment or blank line
+    if current_key is not None:
+        blocks[current_key] = ''.join(current_lines)
+    return blocks
+
+
+def parse_front_matter(yaml_text: str, fields=None) -> dict:
+    """
+    Parses front matter YAML with the fastest available safe loader.
+    If 'fields' is given, only those top-level keys are parsed and returned; the
+    rest of the YAML (e.g. long section texts) is skipped without being parsed.
+    """
+    if not yaml_text:
+        return {}
+    if fields is None:
+        return yaml.load(yaml_text, Loader=SafeLoader) or {}
+
+    wanted = set(fields)
+    blocks = _split_top_level_blocks(yaml_text)
+    selected = ''.join(text for key, text in blocks.items() if key in wanted)
+    try:
+        data = yaml.load(selected, Loader=SafeLoader) if selected else {}
+    except yaml.YAMLError:
+        # e.g. an alias pointing at an anchor in a block we skipped; parse everything instead
+        logging.debug("Partial front matter parse failed, falling back to full parse.")
+        data = yaml.load(yaml_text, Loader=SafeLoader)
+    if not isinstance(data, dict):
+        return {}
+    return {key: value for key, value in data.items() if key in wanted}
+
+
+def load_front_matter(path, fields=None) -> dict:
+    """
+    Loads the front matter of a Markdown file without reading or parsing its body.
+    Pass 'fields' (an iterable of top-level keys) to parse only those keys.
+    Returns {} if the file has no front matter.
+    """
+    yaml_text = read_front_matter_text(path)
+    if yaml_text is None:
+        return {}
+    metadata = parse_front_matter(yaml_text, fields)
+    if not isinstance(metadata, dict):
+        raise ValueError(f"Front matter in {path} is not a mapping.")
+    return metadata
+
+
+def load_post(path) -> frontmatter.Post:
+    """
+    Loads a full post (front matter and body) for read-modify-write paths.
+    Uses the fast loader for the YAML; the result can be written back with frontmatter.dumps().
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    lines = text.splitlines(keepends=True)
+    if lines and FM_BOUNDARY.match(lines[0]):
+        for i in range(1, len(lines)):
+            if FM_BOUNDARY.match(lines[i]):
+                metadata = parse_front_matter(''.join(lines[1:i]))
+                if not isinstance(metadata, dict):
+                    raise ValueError(f"Front matter in {path} is not a mapping.")
+                content = ''.join(lines[i + 1:]).strip()
+                post = frontmatter.Post(content)
+                post.metadata.update(metadata)
+                return post
+    return frontmatter.Post(text.strip())
@@ -0,0 +1,404 @@
+import os
+import copy
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError: # Windows: saves are then only serialised within one process
+    fcntl = None
+
+# image_library.json is written with this indent (matches the existing file)
+JSON_INDENT = 2
+# Block size used when hashing image files
+HASH_CHUNK_SIZE = 1024 * 1024
+# Published images live in images/posts/<slug>/; used to recover the slug for entries without 'post_slug'
+POSTS_IMAGE_DIR_PARTS = ('images', 'posts')
+
+
+def _stat_signature(path: Path):
+    """Returns (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _normalise_rel_path(path) -> str:
+    """Normalises a project-relative path ('/images/x.jpg', 'images//x.jpg') to 'images/x.jpg'."""
+    return Path(str(path).strip().lstrip('/')).as_posix()
+
+
+def entry_local_rel_path(entry: dict):
+    """
+    Returns the project-relative path of an entry's local (published) file, or None.
+    Handles both ID schemes in the library:
+      - IMGxxxxx entries: source_details.local_dir + source_details.filename_local
+      - <slug>_<base> entries (process_imported_image.py): source_details.published_file_path
+    """
+    source_details = (entry or {}).get('source_details') or {}
+    local_dir = source_details.get('local_dir')
+    filename_local = source_details.get('filename_local')
+    if local_dir and filename_local:
+        return _normalise_rel_path(f"{local_dir.strip('/')}/{filename_local}")
+    if source_details.get('published_file_path'):
+        return _normalise_rel_path(source_details['published_file_path'])
+    return None
+
+
+def entry_post_slug(entry: dict):
+    """Returns the post slug an entry belongs to ('post_slug', else derived from its images/posts/<slug>/ path)."""
+    source_details = (entry or {}).get('source_details') or {}
+    if source_details.get('post_slug'):
+        return source_details['post_slug']
+    rel_path = entry_local_rel_path(entry)
+    if rel_path:
+        parts = Path(rel_path).parts
+        if len(parts) > 3 and parts[:2] == POSTS_IMAGE_DIR_PARTS:
+            return parts[2]
+    return None
+
+
+def entry_is_uploaded(entry: dict) -> bool:
+    """True if the image has been uploaded to clan.com (an upload path was recorded)."""
+    return bool(((entry or {}).get('source_details') or {}).get('uploaded_path_relative'))
+
+
+def file_content_hash(path) -> str:
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- Image Library ---
+
+class ImageLibrary:
+    """
+    Shared access to _data/image_library.json.
+
+    The file is loaded once and kept in memory with secondary indexes by post slug,
+    watermark status, upload state and local file path, so lookups do not scan the
+    whole library. The file is re-loaded automatically when another process changes it.
+
+    Changes are tracked per image ID. save() takes an exclusive lock on a sidecar
+    file (.image_library.json.lock), re-reads the JSON, replaces only the modified
+    entries and rewrites the file atomically, so concurrent writers (app, job workers,
+    publish script, watermark script, importer) do not overwrite each other's entries.
+    The whole document is still rewritten on every save; JSON has no partial update.
+    Safe to share between Flask request threads.
+    """
+
+    def __init__(self, json_path: Path, base_dir: Path = None):
+        self.json_path = Path(json_path)
+        self.base_dir = Path(base_dir) if base_dir else self.json_path.resolve().parent.parent
+        self.lock_path = self.json_path.with_name(f".{self.json_path.name}.lock")
+        self._lock = threading.RLock()
+        self._signature = None
+        self._loaded = False
+        self._data = {}
+        self._dirty = set()
+        self._reset_indexes()
+
+    # --- Loading / Indexing ---
+
+    def _reset_indexes(self):
+        self._by_slug = {} # slug -> {image_id: None} (insertion ordered)
+        self._by_watermark_status = {} # status -> {image_id: None}
+        self._not_uploaded = {} # image_id -> None
+        self._by_path = {} # project-relative posix path -> image_id
+        self._index_keys = {} # image_id -> (slug, status, paths) it is indexed under
+
+    def _index(self, image_id: str, entry: dict):
+        slug = entry_post_slug(entry)
+        status = entry.get('watermark_status') or 'pending'
+        source_details = entry.get('source_details') or {}
+        paths = {_normalise_rel_path(path) for path in (entry_local_rel_path(entry), source_details.get('raw_file_path'), source_details.get('watermarked_file_path')) if path}
+        if slug:
+            self._by_slug.setdefault(slug, {})[image_id] = None
+        self._by_watermark_status.setdefault(status, {})[image_id] = None
+        if not entry_is_uploaded(entry):
+            self._not_uploaded[image_id] = None
+        for path in paths:
+            self._by_path[path] = image_id
+        self._index_keys[image_id] = (slug, status, paths)
+
+    def _unindex(self, image_id: str):
+        keys = self._index_keys.pop(image_id, None)
+        if keys is None:
+            return
+        slug, status, paths = keys
+        for index, key in ((self._by_slug, slug), (self._by_watermark_status, status)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.pop(image_id, None)
+                if not ids:
+                    del index[key]
+        self._not_uploaded.pop(image_id, None)
+        for path in paths:
+            if self._by_path.get(path) == image_id:
+                del self._by_path[path]
+
+    def _reindex(self):
+        self._reset_indexes()
+        for image_id, entry in self._data.items():
+            if isinstance(entry, dict):
+                self._index(image_id, entry)
+
+    def _read_file(self) -> dict:
+        """Reads the JSON file. Raises ValueError if it is not a valid library object."""
+        if not self.json_path.is_file():
+            logging.warning(f"Image library file not found: {self.json_path}. Starting with an empty library.")
+            return {}
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"Image library {self.json_path} does not contain a JSON object.")
+        return data
+
+    def _ensure_loaded(self):
+        """(Re)loads the file if it was never loaded or changed on disk. Caller holds the lock."""
+        signature = _stat_signature(self.json_path)
+        if self._loaded and signature == self._signature:
+            return
+        data = self._read_file()
+        # Keep local changes that have not been saved yet
+        for image_id in self._dirty:
+            data[image_id] = self._data[image_id]
+        self._data = data
+        self._signature = signature
+        self._loaded = True
+        self._reindex()
+        logging.info(f"ImageLibrary: loaded {len(self._data)} image(s) from {self.json_path.name}.")
+
+    def load(self):
+        """Loads the library now (it is otherwise loaded on first use). Raises on an unreadable file."""
+        with self._lock:
+            self._ensure_loaded()
+        return self
+
+    # --- Lookups (return copies; use the update methods to change entries) ---
+
+    def __contains__(self, image_id) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return image_id in self._data
+
+    def get(self, image_id: str, default=None):
+        """Returns a copy of an image entry, or default."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._data.get(image_id)
+            return copy.deepcopy(entry) if entry is not None else default
+
+    def ids(self) -> list:
+        """Returns the IDs of all images in the library."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._data)
+
+    def ids_for_slug(self, slug: str) -> list:
+        """Returns the IDs of all images that belong to a post."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._by_slug.get(slug, ()))
+
+    def images_for_slug(self, slug: str) -> dict:
+        """Returns {image_id: entry copy} for all images that belong to a post."""
+        with self._lock:
+            self._ensure_loaded()
+            return {image_id: copy.deepcopy(self._data[image_id]) for image_id in self._by_slug.get(slug, ())}
+
+    def ids_with_watermark_status(self, status: str, slug: str = None) -> list:
+        """Returns the IDs of images with the given watermark_status ('pending' if unset), optionally for one post."""
+        with self._lock:
+            self._ensure_loaded()
+            ids = self._by_watermark_status.get(status, {})
+            if slug is not None:
+                return [image_id for image_id in self._by_slug.get(slug, ()) if image_id in ids]
+            return list(ids)
+
+    def not_uploaded_ids(self, slug: str = None) -> list:
+        """Returns the IDs of images not yet uploaded to clan.com, optionally for one post."""
+        with self._lock:
+            self._ensure_loaded()
+            if slug is not None:
+                return [image_id for image_id in self._by_slug.get(slug, ()) if image_id in self._not_uploaded]
+            return list(self._not_uploaded)
+
+    def find_by_path(self, path):
+        """
+        Returns the ID of the image whose local, raw or watermarked file is 'path'.
+        Accepts absolute file paths under base_dir, project-relative paths and site paths ('/images/...').
+        """
+        path = Path(path)
+        if path.is_absolute():
+            try:
+                path = path.resolve().relative_to(self.base_dir.resolve())
+            except ValueError:
+                pass # Not under base_dir; treat as a site-root path like '/images/posts/...'
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_path.get(_normalise_rel_path(path))
+
+    def local_path(self, image_id: str):
+        """Returns the absolute path of an image's local (published) file, or None if it cannot be determined."""
+        with self._lock:
+            self._ensure_loaded()
+            rel_path = entry_local_rel_path(self._data.get(image_id))
+        return self.base_dir / rel_path if rel_path else None
+
+    # --- Updates ---
+
+    def set_entry(self, image_id: str, entry: dict):
+        """Adds or replaces a whole image entry."""
+        with self._lock:
+            self._ensure_loaded()
+            if image_id in self._data:
+                self._unindex(image_id)
+            self._data[image_id] = copy.deepcopy(entry)
+            self._index(image_id, self._data[image_id])
+            self._dirty.add(image_id)
+
+    def update(self, image_id: str, **fields):
+        """Merges top-level fields (e.g. watermark_status) into an existing entry. Raises KeyError if unknown."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._data[image_id]
+            self._unindex(image_id)
+            entry.update(copy.deepcopy(fields))
+            self._index(image_id, entry)
+            self._dirty.add(image_id)
+
+    def update_source_details(self, image_id: str, **fields):
+        """Merges fields into an entry's source_details (e.g. public_url). Raises KeyError if unknown."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._data[image_id]
+            self._unindex(image_id)
+            entry.setdefault('source_details', {}).update(copy.deepcopy(fields))
+            self._index(image_id, entry)
+            self._dirty.add(image_id)
+
+    def upload_is_current(self, image_id: str) -> bool:
+        """
+        True if the image was uploaded to clan.com and its local file has not changed since.
+        Size and mtime are compared first; the file is only re-hashed when the mtime moved
+        but the size did not (e.g. a touch or a copy that preserved the bytes).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            source_details = (self._data.get(image_id) or {}).get('source_details') or {}
+            rel_path = entry_local_rel_path(self._data.get(image_id))
+        if not (source_details.get('public_url') and source_details.get('uploaded_path_relative')):
+            return False
+        if not source_details.get('content_hash') or rel_path is None:
+            return False # Uploaded before hashes were recorded
+        path = self.base_dir / rel_path
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size != source_details.get('file_size'):
+            return False
+        if st.st_mtime_ns == source_details.get('file_mtime_ns'):
+            return True
+        if file_content_hash(path) != source_details['content_hash']:
+            return False
+        # Same bytes, new mtime: remember it so the next check is stat-only again
+        self.update_source_details(image_id, file_mtime_ns=st.st_mtime_ns)
+        return True
+
+    def record_watermark(self, image_id: str, fingerprint: str, output_path: Path, raw_path: Path = None):
+        """
+        Remembers the inputs fingerprint and the resulting file of a successful watermark,
+        and the unwatermarked backup it was made from (its suffix can differ from the output's).
+        """
+        output_path = Path(output_path)
+        st = os.stat(output_path)
+        fields = {}
+        if raw_path is not None:
+            fields['watermark_raw_path'] = Path(os.path.relpath(raw_path, self.base_dir)).as_posix()
+        self.update_source_details(image_id, watermark_fingerprint=fingerprint,
+                                   watermark_output_hash=file_content_hash(output_path),
+                                   watermark_output_size=st.st_size, watermark_output_mtime_ns=st.st_mtime_ns, **fields)
+
+    def watermark_raw_path(self, image_id: str):
+        """Absolute path of the unwatermarked backup recorded by record_watermark(), or None."""
+        with self._lock:
+            self._ensure_loaded()
+            rel_path = ((self._data.get(image_id) or {}).get('source_details') or {}).get('watermark_raw_path')
+        return self.base_dir / rel_path if rel_path else None
+
+    def watermark_output_is_intact(self, image_id: str, output_path: Path) -> bool:
+        """
+        True if output_path is still the file the last recorded watermark produced
+        (same stat-then-hash check as upload_is_current()).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            source_details = (self._data.get(image_id) or {}).get('source_details') or {}
+        if not source_details.get('watermark_output_hash'):
+            return False
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return False
+        if st.st_size != source_details.get('watermark_output_size'):
+            return False
+        if st.st_mtime_ns == source_details.get('watermark_output_mtime_ns'):
+            return True
+        if file_content_hash(output_path) != source_details['watermark_output_hash']:
+            return False
+        self.update_source_details(image_id, watermark_output_mtime_ns=st.st_mtime_ns)
+        return True
+
+    def has_changes(self) -> bool:
+        with self._lock:
+            return bool(self._dirty)
+
+    @contextmanager
+    def _file_lock(self):
+        """Holds an exclusive inter-process lock for a read-merge-write of the JSON file."""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX) # Released when the file is closed
+            yield
+
+    def save(self) -> bool:
+        """
+        Writes the modified entries to the JSON file. Under the file lock, the file is
+        re-read first so entries saved by other processes are kept. Returns False on failure.
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            try:
+                with self._file_lock():
+                    # Always re-read: another process may have saved since our load within the same mtime tick
+                    data = self._read_file()
+                    for image_id in self._dirty:
+                        data[image_id] = self._data[image_id]
+                    tmp_path = self.json_path.with_name(f".{self.json_path.name}.{os.getpid()}.tmp")
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(data, f, indent=JSON_INDENT)
+                    os.replace(tmp_path, self.json_path)
+                    signature = _stat_signature(self.json_path)
+            except Exception as e:
+                logging.error(f"ImageLibrary: failed to save {self.json_path}: {e}", exc_info=True)
+                return False
+            saved = len(self._dirty)
+            self._dirty.clear()
+            # Pick up entries other processes saved while we were working
+            self._data = data
+            self._reindex()
+            self._signature = signature
+            logging.info(f"ImageLibrary: saved {saved} changed image(s) to {self.json_path.name}.")
+            return True
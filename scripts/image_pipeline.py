@@ -0,0 +1,120 @@
+import math
+import time
+import logging
+from pathlib import Path
+from PIL import Image
+from scripts.job_context import ContextThreadPoolExecutor
+
+# decode_image() draft-decodes JPEGs to at least max_width * DRAFT_REDUCING_GAP before the
+# final LANCZOS resize (1.0: the smallest DCT scale still >= max_width; see benchmark_decode.py)
+DRAFT_REDUCING_GAP = 1.0
+
+
+class ImageOutput:
+    """
+    One output of run_pipeline(): the shared resized frame, optionally passed
+    through 'transform' (which must return a new image, e.g. a watermarked copy),
+    encoded to 'path' in 'format' with 'save_options'. 'tag' is free for the caller
+    (e.g. the settings hash a derivative is recorded under).
+    """
+
+    def __init__(self, name: str, path: Path, format: str, save_options: dict = None, transform=None, tag=None):
+        self.name = name
+        self.path = Path(path)
+        self.format = format.upper()
+        self.save_options = save_options or {}
+        self.transform = transform
+        self.tag = tag
+
+
+def decode_image(input_path: Path, max_width: int = None, reducing_gap: float = DRAFT_REDUCING_GAP) -> Image.Image:
+    """
+    Decodes an image once, as RGB or RGBA (other modes are converted to RGB).
+
+    With max_width, JPEGs at least twice as wide as max_width * reducing_gap are
+    decoded in draft mode: libjpeg scales them down by 1/2, 1/4 or 1/8 while
+    decoding, to the smallest of those sizes that is still that wide, which is
+    much faster and uses a fraction of the memory. Gaps below 1 are treated as 1,
+    so the reduced frame is never narrower than max_width. The full-resolution
+    size is kept in info['source_size']; resize_to_width() uses it to make the
+    final LANCZOS pass to the exact size a full decode would produce.
+    """
+    reducing_gap = max(1.0, reducing_gap)
+    with Image.open(input_path) as img:
+        source_size = img.size
+        if max_width and img.format == 'JPEG' and img.width >= 2 * max_width * reducing_gap:
+            draft_width = math.ceil(max_width * reducing_gap)
+            if img.draft(img.mode, (draft_width, math.ceil(draft_width * img.height / img.width))):
+                logging.info(f"  JPEG draft decode: {source_size[0]}x{source_size[1]} -> {img.width}x{img.height}.")
+        img.load()
+        if img.size != source_size:
+            img.info['source_size'] = source_size
+        logging.info(f"  Image loaded (Format: {img.format}, Mode: {img.mode}, Size: {img.size}).")
+        if img.mode in ('RGB', 'RGBA'):
+            return img # Pixel data stays available after the file is closed
+        logging.info(f"  Converting image mode from {img.mode} to RGB for processing.")
+        return img.convert('RGB')
+
+
+def resize_to_width(img: Image.Image, max_width: int = None) -> Image.Image:
+    """
+    Returns img scaled down to max_width (LANCZOS), or img itself if it is already
+    narrow enough. A draft-decoded frame (info['source_size']) is sized from its
+    full-resolution dimensions and returned as-is only if it already has exactly
+    that size.
+    """
+    if not max_width:
+        return img
+    source_width, source_height = img.info.get('source_size', img.size)
+    target_width = min(max_width, source_width)
+    target_size = (target_width, int(target_width * source_height / source_width))
+    if img.size == target_size:
+        return img
+    logging.info(f"  Resizing image from {img.width}x{img.height} to {target_size[0]}x{target_size[1]}...")
+    return img.resize(target_size, Image.Resampling.LANCZOS)
+
+
+def _encode(frame: Image.Image, output: ImageOutput) -> float:
+    """Builds and saves one output from the shared frame; returns the elapsed seconds."""
+    start = time.perf_counter()
+    image = output.transform(frame) if output.transform else frame
+    if image.mode == 'RGBA' and output.format in ('JPEG', 'JPG'):
+        image = image.convert('RGB')
+    image.save(output.path, format=output.format, **output.save_options)
+    logging.info(f"  Saved {output.name} version to {output.path} (Format: {output.format}).")
+    return time.perf_counter() - start
+
+
+def run_pipeline(input_path: Path, outputs: list, max_width: int = None) -> dict:
+    """
+    Decodes input_path once (draft-mode for large JPEGs), resizes it once, then builds every output from that one
+    frame concurrently (one thread per output; Pillow releases the GIL while
+    encoding). The frame is shared read-only, so no per-output copies are made
+    unless an output's transform needs one.
+
+    Returns per-stage timings in milliseconds: decode, resize, one entry per output
+    name (transform + encode), encode_wall (all outputs) and total.
+    Raises the first error from any stage.
+    """
+    timings = {}
+    start = time.perf_counter()
+    frame = decode_image(input_path, max_width)
+    timings['decode'] = (time.perf_counter() - start) * 1000
+
+    stage_start = time.perf_counter()
+    frame = resize_to_width(frame, max_width)
+    timings['resize'] = (time.perf_counter() - stage_start) * 1000
+
+    stage_start = time.perf_counter()
+    with ContextThreadPoolExecutor(max_workers=max(1, len(outputs))) as executor:
+        futures = [(output.name, executor.submit(_encode, frame, output)) for output in outputs]
+        for name, future in futures:
+            timings[name] = future.result() * 1000
+    timings['encode_wall'] = (time.perf_counter() - stage_start) * 1000
+    timings['total'] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def format_timings(timings: dict) -> str:
+    """Formats run_pipeline() timings for a log line."""
+    return ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in timings.items())
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from PIL import Image, UnidentifiedImageError
+
+# --- Configuration ---
+BUSY_TIMEOUT_MS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,      -- relative to base_dir (absolute if outside it)
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    format TEXT,
+    mode TEXT
+);
+"""
+
+
+class ImageProbeCache:
+    """
+    Persistent cache of image dimensions, format and mode.
+
+    Probes read only the image header (Pillow opens files lazily), and results are
+    stored in SQLite keyed by path together with the file's mtime and size, so a
+    file is probed again only after it changes. Hits are also kept in memory, so a
+    repeat lookup costs one stat(). Safe to share between threads and processes.
+    """
+
+    def __init__(self, db_path: Path, base_dir: Path):
+        self.db_path = Path(db_path)
+        self.base_dir = Path(base_dir)
+        self._local = threading.local()
+        self._memory = {} # key -> ((mtime_ns, size), probe dict)
+        self._lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, path: Path) -> str:
+        try:
+            return path.resolve().relative_to(self.base_dir.resolve()).as_posix()
+        except ValueError:
+            return str(path.resolve())
+
+    def probe(self, path):
+        """
+        Returns {'width', 'height', 'format', 'mode', 'size'} for an image file, or None
+        if it does not exist or is not a readable image. 'size' is the file size in bytes.
+        """
+        path = Path(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        key = self._key(path)
+
+        with self._lock:
+            cached = self._memory.get(key)
+        if cached and cached[0] == signature:
+            return dict(cached[1])
+
+        try:
+            row = self._conn().execute("SELECT width, height, format, mode FROM probes WHERE path = ? AND mtime_ns = ? AND size = ?",
+                                       (key, st.st_mtime_ns, st.st_size)).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"ImageProbeCache: lookup failed for {key}: {e}")
+            row = None
+
+        if row is None:
+            try:
+                with Image.open(path) as img: # Header only; pixel data is never decoded
+                    row = (img.width, img.height, img.format, img.mode)
+            except (OSError, UnidentifiedImageError) as e:
+                logging.warning(f"ImageProbeCache: could not read image header of {path}: {e}")
+                return None
+            try:
+                self._conn().execute("INSERT OR REPLACE INTO probes(path, mtime_ns, size, width, height, format, mode) VALUES(?, ?, ?, ?, ?, ?, ?)",
+                                     (key, st.st_mtime_ns, st.st_size) + tuple(row))
+            except sqlite3.Error as e:
+                logging.warning(f"ImageProbeCache: could not store the probe of {key}: {e}")
+
+        result = {'width': row[0], 'height': row[1], 'format': row[2], 'mode': row[3], 'size': st.st_size}
+        with self._lock:
+            self._memory[key] = (signature, result)
+        return dict(result)
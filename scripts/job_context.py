@@ -0,0 +1,16 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# ID of the background job the current code runs for (set by JobRunner's worker threads)
+current_job_id = contextvars.ContextVar('current_job_id', default=None)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor whose tasks run in a copy of the submitting thread's context,
+    so work a job fans out to threads (uploads, encodes) still counts as that job's,
+    e.g. for JobRunner's log capture. Behaves like ThreadPoolExecutor outside jobs.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,292 @@
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from scripts.job_context import current_job_id
+
+# --- Configuration ---
+DEFAULT_WORKERS = 2 # Jobs on different posts run in parallel; jobs on the same post never do
+BUSY_TIMEOUT_MS = 10000
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+INTERRUPTED_ERROR = "Interrupted: the admin app stopped while the job was running."
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- queue order
+    id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,                     -- handler name, e.g. 'publish'
+    slugs TEXT NOT NULL,                    -- JSON list of the posts the job locks
+    params TEXT NOT NULL,                   -- JSON object passed to the handler
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    result TEXT,                            -- JSON value returned by the handler
+    error TEXT,
+    log TEXT                                -- captured log lines, stored when the job finishes
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds') + 'Z'
+
+
+class _JobLogHandler(logging.Handler):
+    """
+    Routes log records to the job they were emitted for: records from a worker thread,
+    or from threads the job started with ContextThreadPoolExecutor, carry its ID in
+    the current_job_id context variable.
+    """
+
+    def __init__(self, runner):
+        super().__init__(level=logging.INFO)
+        self.runner = runner
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record):
+        job_id = current_job_id.get()
+        if job_id is not None:
+            self.runner._append_log(job_id, self.format(record))
+
+
+class JobRunner:
+    """
+    Background job queue for long admin operations (publishing, watermarking).
+
+    Jobs are persisted in SQLite, so queued work survives a restart (jobs that were
+    running when the app stopped are marked failed when the workers start, so only
+    the process that runs jobs does it). Worker threads take jobs in
+    queue order, skipping any job whose posts are locked by a running job, so two
+    jobs never work on the same post at once. Log lines emitted while a job runs are
+    collected for it and can be followed live with iter_log().
+
+    Handlers are registered per job kind: handler(**params) returns (success, result),
+    where result must be JSON-serialisable.
+    """
+
+    def __init__(self, db_path: Path, workers: int = DEFAULT_WORKERS):
+        self.db_path = Path(db_path)
+        self.workers = max(1, workers)
+        self._handlers = {}
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._locked_slugs = set()
+        self._live_logs = {} # job id -> log lines of running jobs
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self._conn().executescript(SCHEMA)
+
+    # --- Storage ---
+
+    def _conn(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        job.pop('seq', None)
+        job['slugs'] = json.loads(job['slugs'])
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    # --- Lifecycle ---
+
+    def register(self, kind: str, handler):
+        """Registers the function that runs jobs of the given kind."""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """
+        Marks jobs left running by a previous process as failed, then starts the worker
+        threads. Idempotent and thread-safe (e.g. called from concurrent first requests).
+        """
+        with self._start_lock:
+            if self._threads:
+                return
+            interrupted = self._conn().execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+                                               (JOB_FAILED, INTERRUPTED_ERROR, _now(), JOB_RUNNING)).rowcount
+            if interrupted:
+                logging.warning(f"JobRunner: marked {interrupted} interrupted job(s) as failed.")
+            with self._cond:
+                self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, wait: bool = True):
+        """Stops the workers after their current job; queued jobs stay queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        with self._start_lock:
+            if wait:
+                for thread in self._threads:
+                    thread.join()
+            self._threads = []
+
+    # --- Queue ---
+
+    def submit(self, kind: str, slugs, params: dict = None) -> dict:
+        """Queues a job that locks the given post slugs while it runs. Returns the job dict."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        slugs = list(dict.fromkeys(slugs))
+        self._conn().execute("INSERT INTO jobs(id, kind, slugs, params, status, created_at) VALUES(?, ?, ?, ?, ?, ?)",
+                             (job_id, kind, json.dumps(slugs), json.dumps(params or {}), JOB_QUEUED, _now()))
+        logging.info(f"JobRunner: queued {kind} job {job_id} for {', '.join(slugs) or '(no posts)'}.")
+        with self._cond:
+            self._cond.notify_all()
+        return self.get(job_id)
+
+    def _claim_next(self):
+        """Marks the oldest runnable queued job as running and returns it (call with _cond held)."""
+        conn = self._conn()
+        for row in conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY seq", (JOB_QUEUED,)).fetchall():
+            slugs = set(json.loads(row['slugs']))
+            if slugs & self._locked_slugs:
+                continue
+            claimed = conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+                                   (JOB_RUNNING, _now(), row['id'], JOB_QUEUED)).rowcount
+            if claimed:
+                self._locked_slugs |= slugs
+                self._live_logs[row['id']] = []
+                return self._row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone())
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._claim_next()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+            token = current_job_id.set(job['id'])
+            try:
+                self._run(job)
+            finally:
+                current_job_id.reset(token)
+            with self._cond:
+                self._locked_slugs -= set(job['slugs'])
+                self._live_logs.pop(job['id'], None)
+                self._cond.notify_all()
+
+    def _run(self, job: dict):
+        logging.info(f"--- Job {job['id']} ({job['kind']}) started for {', '.join(job['slugs']) or '(no posts)'} ---")
+        success, result, error = False, None, None
+        try:
+            success, result = self._handlers[job['kind']](**job['params'])
+        except Exception as e:
+            logging.error(f"Job {job['id']} failed: {e}", exc_info=True)
+            error = str(e)
+        status = JOB_SUCCEEDED if success else JOB_FAILED
+        logging.info(f"--- Job {job['id']} finished: {status} ---")
+        with self._cond:
+            log_text = "\n".join(self._live_logs.get(job['id'], []))
+        try:
+            self._conn().execute("UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, log = ? WHERE id = ?",
+                                 (status, _now(), json.dumps(result, default=str), error, log_text, job['id']))
+        except sqlite3.Error as e:
+            logging.error(f"JobRunner: failed to store the outcome of job {job['id']}: {e}")
+
+    # --- Logs ---
+
+    def log_handler(self) -> logging.Handler:
+        """Returns a handler to add to the root logger so job log lines are captured."""
+        return _JobLogHandler(self)
+
+    def _append_log(self, job_id: str, line: str):
+        with self._cond:
+            lines = self._live_logs.get(job_id)
+            if lines is not None:
+                lines.extend(line.split("\n")) # One entry per line, as in the stored log
+                self._cond.notify_all()
+
+    def iter_log(self, job_id: str, keepalive_seconds: float = 15.0):
+        """
+        Yields a job's log lines as they are produced, then stops once the job has finished.
+        Yields None when nothing new arrived within keepalive_seconds (for SSE keep-alive comments).
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                lines = self._live_logs.get(job_id)
+                if lines is not None and len(lines) <= sent:
+                    self._cond.wait(timeout=keepalive_seconds)
+                    lines = self._live_logs.get(job_id)
+                pending = None if lines is None else lines[sent:]
+            if pending is None:
+                # Not running: either still queued, or finished with its log stored
+                job = self.get(job_id)
+                if job is None:
+                    return
+                if job['status'] in FINISHED_STATUSES:
+                    stored = job['log'].split("\n") if job['log'] else []
+                    yield from stored[sent:]
+                    return
+                with self._cond:
+                    if job_id not in self._live_logs:
+                        self._cond.wait(timeout=keepalive_seconds)
+                    started = job_id in self._live_logs
+                if not started:
+                    yield None
+                continue
+            if pending:
+                sent += len(pending)
+                yield from pending
+            else:
+                yield None
+
+    # --- Status ---
+
+    def get(self, job_id: str):
+        """Returns a job dict (including its live or stored log), or None if unknown."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        if job['status'] == JOB_RUNNING:
+            with self._cond:
+                job['log'] = "\n".join(self._live_logs.get(job_id, []))
+        return job
+
+    def list(self, slug: str = None, limit: int = 50) -> list:
+        """Returns the most recent jobs (newest first), optionally only those for one post; logs are omitted."""
+        rows = self._conn().execute("SELECT * FROM jobs ORDER BY seq DESC LIMIT ?",
+                                    (limit if slug is None else -1,)).fetchall()
+        jobs = []
+        for row in rows:
+            job = self._row_to_job(row)
+            if slug is not None and slug not in job['slugs']:
+                continue
+            job.pop('log', None)
+            jobs.append(job)
+            if len(jobs) >= limit:
+                break
+        return jobs
@@ -0,0 +1,192 @@
+import os
+import copy
+import logging
+import threading
+from pathlib import Path
+from scripts.frontmatter_loader import load_front_matter
+
+# --- Helper Functions ---
+
+def _stat_key(path):
+    """Returns a (mtime_ns, size) tuple used to detect changes to a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def collect_image_ids(metadata: dict) -> list:
+    """Returns the unique image IDs referenced by a post (header, sections, conclusion) in order."""
+    image_ids = []
+    if metadata.get('headerImageId'):
+        image_ids.append(metadata['headerImageId'])
+    for section in metadata.get('sections') or []:
+        if isinstance(section, dict) and section.get('imageId'):
+            image_ids.append(section['imageId'])
+    conclusion = metadata.get('conclusion') or {}
+    if isinstance(conclusion, dict) and conclusion.get('imageId'):
+        image_ids.append(conclusion['imageId'])
+    return list(dict.fromkeys(image_ids)) # Unique IDs, original order
+
+
+def clan_status_display(post_workflow_data: dict) -> str:
+    """Builds the human readable clan.com status shown on the dashboard."""
+    clan_com_stage = (post_workflow_data or {}).get('stages', {}).get('publishing_clancom', {})
+    clan_com_post_id = clan_com_stage.get('post_id')
+    clan_com_status_val = clan_com_stage.get('status', 'pending')
+
+    if clan_com_post_id and clan_com_status_val == 'complete':
+        return f"Published (ID: {clan_com_post_id})"
+    if clan_com_status_val == 'error':
+        error_msg = clan_com_stage.get('last_error') or 'Unknown Error'
+        display = f"Error: {error_msg[:50]}" # Show snippet of error
+        if len(error_msg) > 50: display += "..."
+        return display
+    return "Not Published / Pending"
+
+
+# --- Post Index ---
+
+class PostIndex:
+    """
+    Process-wide cache of post front matter for the admin interface.
+
+    Each Markdown file in the posts directory is parsed once; it is only re-parsed
+    when its mtime or size changes. Workflow status is cached until the WorkflowStore revision changes.
+    All public methods are safe to call from concurrent Flask request threads.
+    """
+
+    def __init__(self, posts_dir: Path, workflow_store):
+        self.posts_dir = Path(posts_dir)
+        self.workflow_store = workflow_store
+        self._lock = threading.RLock()
+        self._entries = {} # slug -> {'stat': (mtime_ns, size), 'record': dict, 'metadata': dict or None}
+        self._workflow_revision = None
+        self._workflow_data = {}
+
+    # --- Internal ---
+
+    # Top-level keys needed for the dashboard record; everything else is parsed lazily
+    RECORD_FIELDS = ('title', 'concept', 'date', 'deleted', 'headerImageId')
+
+    def _load_entry(self, slug: str, path: Path, stat_key):
+        """Parses the record fields of a single post and stores its compact record. Caller holds the lock."""
+        logging.debug(f"PostIndex: parsing front matter for '{slug}'")
+        fields = load_front_matter(path, fields=self.RECORD_FIELDS)
+        record = {
+            'slug': slug,
+            'title': fields.get('title', f"Untitled ({slug})"),
+            'concept': fields.get('concept', ''),
+            'date': fields.get('date', ''),
+            'deleted': fields.get('deleted', False),
+            'headerImageId': fields.get('headerImageId', slug),
+        }
+        entry = {'stat': stat_key, 'record': record, 'metadata': None, 'image_ids': None}
+        self._entries[slug] = entry
+        return entry
+
+    def _full_entry(self, slug: str):
+        """Like _entry(), but also makes sure the full front matter has been parsed."""
+        entry = self._entry(slug)
+        if entry is None:
+            return None
+        with self._lock:
+            if entry['metadata'] is None:
+                metadata = load_front_matter(self.posts_dir / f"{slug}.md")
+                entry['metadata'] = metadata
+                entry['image_ids'] = collect_image_ids(metadata)
+        return entry
+
+    def _entry(self, slug: str):
+        """Returns the up-to-date entry for a slug, re-parsing only if the file changed."""
+        path = self.posts_dir / f"{slug}.md"
+        stat_key = _stat_key(path)
+        with self._lock:
+            if stat_key is None:
+                self._entries.pop(slug, None)
+                return None
+            entry = self._entries.get(slug)
+            if entry is None or entry['stat'] != stat_key:
+                entry = self._load_entry(slug, path, stat_key)
+            return entry
+
+    def _refresh_all(self):
+        """Brings every entry up to date with the posts directory."""
+        if not self.posts_dir.is_dir():
+            raise FileNotFoundError(f"Posts directory not found: {self.posts_dir}")
+        seen = set()
+        with os.scandir(self.posts_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith('.md') or not dir_entry.is_file():
+                    continue
+                slug = dir_entry.name[:-3]
+                seen.add(slug)
+                st = dir_entry.stat()
+                stat_key = (st.st_mtime_ns, st.st_size)
+                with self._lock:
+                    entry = self._entries.get(slug)
+                    if entry is not None and entry['stat'] == stat_key:
+                        continue
+                    try:
+                        self._load_entry(slug, Path(dir_entry.path), stat_key)
+                    except Exception as e:
+                        logging.error(f"Error processing markdown file {dir_entry.name}: {e}", exc_info=True)
+                        self._entries.pop(slug, None)
+        with self._lock:
+            for slug in list(self._entries):
+                if slug not in seen:
+                    del self._entries[slug]
+
+    # --- Public API ---
+
+    def workflow_data(self) -> dict:
+        """Returns the cached workflow status data, reloading it only when the store changed. Treat as read-only."""
+        revision = self.workflow_store.revision()
+        with self._lock:
+            if revision != self._workflow_revision:
+                self._workflow_data = self.workflow_store.all()
+                self._workflow_revision = revision
+            return self._workflow_data
+
+    def posts(self) -> list:
+        """Returns dashboard records for all posts, newest first, including clan.com status."""
+        self._refresh_all()
+        workflow_data = self.workflow_data()
+        with self._lock:
+            records = [dict(entry['record']) for entry in self._entries.values()]
+        for record in records:
+            record['clan_com_status'] = clan_status_display(workflow_data.get(record['slug'], {}))
+        records.sort(key=lambda x: x['slug'], reverse=True)
+        records.sort(key=lambda x: x['date'] if x['date'] else '', reverse=True)
+        return records
+
+    def get(self, slug: str):
+        """Returns a copy of the compact record for a slug, or None if the post does not exist."""
+        entry = self._entry(slug)
+        if entry is None:
+            return None
+        return dict(entry['record'])
+
+    def metadata(self, slug: str):
+        """Returns a private (deep) copy of the full front matter for a slug, or None if missing."""
+        entry = self._full_entry(slug)
+        if entry is None:
+            return None
+        return copy.deepcopy(entry['metadata'])
+
+    def image_ids(self, slug: str):
+        """Returns the unique image IDs referenced by a post, or None if the post does not exist."""
+        entry = self._full_entry(slug)
+        if entry is None:
+            return None
+        return list(entry['image_ids'])
+
+    def invalidate(self, slug: str = None):
+        """Drops cached entries so they are re-parsed on next access (all posts if slug is None)."""
+        with self._lock:
+            if slug is None:
+                self._entries.clear()
+                self._workflow_revision = None
+            else:
+                self._entries.pop(slug, None)
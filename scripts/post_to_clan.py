@@ -4,11 +4,12 @@ import os
 import sys
 import subprocess
 import json
+import hashlib
 import requests
-import frontmatter
-from bs4 import BeautifulSoup, Comment # Import Comment
+from bs4 import BeautifulSoup, Comment, FeatureNotFound # Import Comment
 import tempfile
 import logging
+import threading
 from pathlib import Path
 import re
 import argparse
@@ -20,6 +21,16 @@ from dotenv import load_dotenv # Import dotenv
 SCRIPT_DIR = Path(__file__).resolve().parent
 BASE_DIR = SCRIPT_DIR.parent
 logging.info(f"Calculated BASE_DIR: {BASE_DIR}")
+# Make the shared 'scripts.*' modules importable when run as a standalone script
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.frontmatter_loader import load_front_matter
+from scripts.workflow_store import WorkflowStore
+from scripts.image_library import ImageLibrary, file_content_hash
+from scripts.image_probe import ImageProbeCache
+from scripts.clan_api_client import ClanApiClient
+from scripts.job_context import ContextThreadPoolExecutor
 
 # --- Configuration Loading ---
 def load_config():
@@ -38,9 +49,18 @@ def load_config():
         "html_content_selector": os.getenv("HTML_CONTENT_SELECTOR", "article.blog-post"), # CSS selector for main content
         "html_back_link_selector": os.getenv("HTML_BACK_LINK_SELECTOR", "nav.post-navigation-top"), # ** CORRECTED SELECTOR **
         "image_public_base_url": os.getenv("IMAGE_PUBLIC_BASE_URL", "https://static.clan.com/media/blog/"), # URL prefix for rewritten img src
+        "image_url_version_param": os.getenv("IMAGE_URL_VERSION_PARAM", "v"), # Query param carrying each image's content hash ('' disables)
+        "image_sizes_attr": os.getenv("IMAGE_SIZES_ATTR", "(max-width: 800px) 100vw, 800px"), # <img sizes> for srcset images (clan.com content column)
+        "eager_image_count": int(os.getenv("EAGER_IMAGE_COUNT", "1")), # Leading content images treated as above the fold (not lazy-loaded)
+        "srcset_format": os.getenv("SRCSET_FORMAT", "WEBP"), # Derivative format offered in srcset (and uploaded with the post's images)
+        "image_probe_db_file": BASE_DIR / os.getenv("IMAGE_PROBE_DB_FILENAME", "_data/image_probe_cache.db"),
         "media_url_prefix_expected": os.getenv("MEDIA_URL_PREFIX_EXPECTED", "/media/blog/"), # Expected path prefix in uploaded image URLs
         "media_url_submit_prefix": os.getenv("MEDIA_URL_SUBMIT_PREFIX", "/blog/"), # Path prefix to use when submitting thumbnail URLs to API
         "default_category_ids": [int(x) for x in os.getenv("DEFAULT_CATEGORY_IDS", "14,15").split(',') if x], # Comma-separated IDs in .env
+        "api_max_retries": int(os.getenv("CLAN_API_MAX_RETRIES", "3")), # Retries for timeouts / 429 / 5xx
+        "api_backoff_base": float(os.getenv("CLAN_API_BACKOFF_SECONDS", "0.5")), # First retry delay, doubled per retry
+        "api_pool_size": int(os.getenv("CLAN_API_POOL_SIZE", "8")), # Keep-alive connections to the API host
+        "upload_workers": int(os.getenv("CLAN_UPLOAD_WORKERS", "4")), # Concurrent image uploads per publish
         "base_dir": BASE_DIR
     }
 
@@ -67,17 +87,139 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - SC
 CONFIG = load_config()
 # --- End Global Config ---
 
+# --- Shared API Client (keep-alive connections reused across all calls) ---
+_api_client = None
+
+def get_api_client():
+    """Returns the process-wide ClanApiClient, creating it on first use."""
+    global _api_client
+    if _api_client is None:
+        _api_client = ClanApiClient.from_config(CONFIG)
+    return _api_client
+
+# --- Shared Image Probe Cache (header-only dimensions, persisted by path + mtime/size) ---
+_image_probe_cache = None
+
+def get_image_probe_cache():
+    """Returns the process-wide ImageProbeCache, creating it on first use."""
+    global _image_probe_cache
+    if _image_probe_cache is None:
+        _image_probe_cache = ImageProbeCache(CONFIG["image_probe_db_file"], CONFIG["base_dir"])
+    return _image_probe_cache
+
 # --- Helper Functions ---
 
-def run_eleventy_build():
-    """Runs 'npm run build' and checks for errors."""
-    logging.info("Running 'npm run build'...")
+# Files (relative to BASE_DIR) that affect a post's built HTML besides its own Markdown.
+# If none of them (nor the post) is newer than _site/<slug>/index.html, the built page is reused.
+# _data/image_library.json is not listed: publishing rewrites it after every build, so the
+# post's own library entries are compared instead (post_library_hash).
+POST_BUILD_DEPENDENCIES = [
+    ".eleventy.js",
+    "_includes/base.njk",
+    "_includes/post.njk",
+    "posts/posts.11tydata.js",
+    "posts/posts.11tydata.json",
+    "_data/authors.json",
+]
+POST_BUILDS_FILE = "_site/.post_builds.json" # {slug: post_library_hash at its last build}
+# The image library fields _includes/post.njk renders (upload and watermark records are not)
+POST_TEMPLATE_LIBRARY_FIELDS = {"source_details": ("local_dir", "filename_local"), "metadata": ("alt", "blog_caption")}
+
+def built_html_path_for(post_slug):
+    """Eleventy output for a post (permalink "/{{ page.fileSlug }}/index.html" in posts.11tydata.js)."""
+    return CONFIG["base_dir"] / "_site" / post_slug / "index.html"
+
+def post_image_ids(metadata):
+    """Unique image IDs a post's front matter references (header, sections, conclusion), in order."""
+    image_ids = [metadata.get('headerImageId')]
+    image_ids += [section.get('imageId') for section in metadata.get('sections') or [] if isinstance(section, dict)]
+    image_ids.append((metadata.get('conclusion') or {}).get('imageId'))
+    return list(dict.fromkeys(image_id for image_id in image_ids if image_id))
+
+def post_library_hash(md_relative_path_from_root, image_library):
+    """
+    SHA-256 of what the post's page renders from the image library: the
+    POST_TEMPLATE_LIBRARY_FIELDS of the images its front matter references and of
+    the images recorded for its slug.
+    """
+    try:
+        metadata = load_front_matter(CONFIG["base_dir"] / md_relative_path_from_root)
+    except Exception:
+        metadata = {}
+    image_ids = set(post_image_ids(metadata)) | set(image_library.ids_for_slug(Path(md_relative_path_from_root).stem))
+    rendered = {}
+    for image_id in sorted(image_ids):
+        entry = image_library.get(image_id) or {}
+        rendered[image_id] = {section: {field: (entry.get(section) or {}).get(field) for field in fields}
+                              for section, fields in POST_TEMPLATE_LIBRARY_FIELDS.items()}
+    return hashlib.sha256(json.dumps(rendered, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _load_post_builds():
+    try:
+        with open(CONFIG["base_dir"] / POST_BUILDS_FILE, 'r', encoding='utf-8') as f:
+            builds = json.load(f)
+        return builds if isinstance(builds, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def record_post_builds(library_hashes):
+    """Stores {md path: post_library_hash taken before the build} for posts just built (read by built_post_is_fresh)."""
+    builds = _load_post_builds()
+    builds.update({Path(path).stem: library_hash for path, library_hash in library_hashes.items()})
+    builds_path = CONFIG["base_dir"] / POST_BUILDS_FILE
+    builds_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = builds_path.with_name(f".{builds_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(builds, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, builds_path)
+
+def built_post_is_fresh(md_relative_path_from_root, image_library):
+    """
+    True if the post's built HTML exists, is newer than the post and every build
+    dependency, and was built from the library entries it renders today.
+    """
+    base_dir = CONFIG["base_dir"]
+    try:
+        built_mtime = built_html_path_for(Path(md_relative_path_from_root).stem).stat().st_mtime_ns
+    except OSError:
+        return False
+    for rel_path in [md_relative_path_from_root] + POST_BUILD_DEPENDENCIES:
+        try:
+            if (base_dir / rel_path).stat().st_mtime_ns > built_mtime:
+                return False
+        except FileNotFoundError:
+            continue # Optional dependency (e.g. only one of posts.11tydata.js/.json)
+    return _load_post_builds().get(Path(md_relative_path_from_root).stem) == post_library_hash(md_relative_path_from_root, image_library)
+
+# Builds write to the same _site directory; when publishing from several threads
+# (admin job workers) they run one at a time.
+_build_lock = threading.Lock()
+
+def run_eleventy_build(input_paths=None):
+    """
+    Runs 'npm run build' and checks for errors.
+    With input_paths (Markdown paths relative to BASE_DIR), only those posts are rendered
+    (ELEVENTY_ONLY, see .eleventy.js) and passthrough copies are skipped.
+    """
+    with _build_lock:
+        return _run_eleventy_build(input_paths)
+
+
+def _run_eleventy_build(input_paths):
+    env = dict(os.environ)
+    if input_paths:
+        env["ELEVENTY_ONLY"] = ",".join(Path(p).as_posix() for p in input_paths)
+        logging.info(f"Running 'npm run build' for {len(input_paths)} post(s) only...")
+    else:
+        env.pop("ELEVENTY_ONLY", None)
+        logging.info("Running 'npm run build'...")
     try:
         result = subprocess.run(
             ['npm', 'run', 'build'],
             capture_output=True, text=True, check=True,
             shell=sys.platform == 'win32',
-            cwd=CONFIG["base_dir"] # Use loaded base_dir
+            cwd=CONFIG["base_dir"], # Use loaded base_dir
+            env=env
         )
         logging.info("Eleventy build completed successfully.")
         # Optionally log stdout/stderr from build if needed for debugging
@@ -97,30 +239,151 @@ def run_eleventy_build():
         return False
 
 # --- Add header_image_filename argument ---
-def extract_html_content(built_html_path, header_image_filename=None):
+IMAGE_VERSION_LENGTH = 16 # Hex digits of the content hash in public image URLs (same as the admin app's ?v=)
+
+
+def image_content_version(src, image_library=None):
+    """
+    Short content hash for a site image path ('/images/...'), or None if the file is missing.
+    Uses the hash the image library recorded at upload while the file is unchanged since;
+    otherwise hashes the local file (the same bytes the upload will send).
+    """
+    image_id = image_library.find_by_path(src) if image_library is not None else None
+    if image_id and image_library.upload_is_current(image_id):
+        return image_library.get(image_id)["source_details"]["content_hash"][:IMAGE_VERSION_LENGTH]
+    local_path = CONFIG["base_dir"] / src.lstrip('/')
+    try:
+        return file_content_hash(local_path)[:IMAGE_VERSION_LENGTH]
+    except OSError:
+        logging.warning(f"  Image file not found for versioning: {local_path}")
+        return None
+
+
+def versioned_upload_name(local_path, content_hash):
+    """Upload file name carrying the content hash ('photo.jpg' -> 'photo.<16 hex>.jpg')."""
+    path = Path(local_path)
+    return f"{path.stem}.{content_hash[:IMAGE_VERSION_LENGTH]}{path.suffix}"
+
+
+def versioned_upload_is_current(image_id, image_library):
+    """
+    True if the image's current bytes are on clan.com under their content-hashed name.
+    Images uploaded before names carried the hash are not, and get uploaded again.
+    """
+    if not image_library.upload_is_current(image_id):
+        return False
+    details = image_library.get(image_id)["source_details"]
+    return details.get("uploaded_name") == versioned_upload_name(image_library.local_path(image_id), details["content_hash"])
+
+
+def public_image_url(src, image_library=None):
+    """
+    clan.com URL for a site image path. Once uploaded (unchanged since) this is the URL
+    recorded at upload, whose file name carries the content hash, so a new version of
+    the image always gets a new URL, even where caches ignore query strings. Before the
+    upload: IMAGE_PUBLIC_BASE_URL + basename, plus its content version.
+    """
+    image_id = image_library.find_by_path(src) if image_library is not None else None
+    if image_id and versioned_upload_is_current(image_id, image_library):
+        return image_library.get(image_id)["source_details"]["public_url"]
+    url = CONFIG["image_public_base_url"].rstrip('/') + '/' + os.path.basename(src)
+    version_param = CONFIG["image_url_version_param"]
+    version = image_content_version(src, image_library) if version_param else None
+    return f"{url}?{version_param}={version}" if version else url # Changes whenever the image bytes do
+
+
+def srcset_derivatives(image_entry):
+    """The image's responsive derivatives (process_imported_image.py) in CONFIG["srcset_format"]."""
+    derivatives = ((image_entry or {}).get("source_details") or {}).get("derivatives") or []
+    return [d for d in derivatives if d.get("format", "").upper() == CONFIG["srcset_format"].upper()]
+
+
+def derivative_upload_is_current(derivative):
+    """
+    True if a derivative's local file is on clan.com: upload_derivatives recorded an upload
+    of its current bytes under their content-hashed name. False if the file is missing.
+    As in ImageLibrary.upload_is_current(), size and mtime are compared first; the file is
+    only hashed when the mtime moved but the size did not.
+    """
+    if not (derivative.get("public_url") and derivative.get("uploaded_hash")):
+        return False
+    path = CONFIG["base_dir"] / derivative["path"]
+    if derivative.get("uploaded_name") != versioned_upload_name(path, derivative["uploaded_hash"]):
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if "uploaded_size" in derivative and st.st_size != derivative["uploaded_size"]:
+        return False
+    if st.st_mtime_ns == derivative.get("uploaded_mtime_ns"):
+        return True
+    try:
+        return file_content_hash(path) == derivative["uploaded_hash"] # Touched or copied, or recorded without stat
+    except OSError:
+        return False
+
+
+def responsive_image_attributes(src, public_src, image_library=None):
+    """
+    Extra <img> attributes for a site image: its intrinsic width/height (from the probe
+    cache, so the browser reserves the space) and, if the image library lists uploaded
+    responsive derivatives for it, srcset (their recorded URLs for derivatives narrower
+    than the image, plus the image itself) and sizes. Derivatives not uploaded with
+    their current bytes are left out. Returns {} if the local file cannot be read.
+    """
+    probe = get_image_probe_cache().probe(CONFIG["base_dir"] / src.lstrip('/'))
+    if probe is None:
+        return {}
+    attributes = {'width': str(probe['width']), 'height': str(probe['height'])}
+    image_id = image_library.find_by_path(src) if image_library is not None else None
+    if image_id is None:
+        return attributes
+    candidates = {}
+    for derivative in srcset_derivatives(image_library.get(image_id)):
+        if derivative["width"] < probe['width'] and derivative_upload_is_current(derivative):
+            candidates[derivative["width"]] = derivative["public_url"]
+    if candidates:
+        candidates[probe['width']] = public_src
+        attributes['srcset'] = ", ".join(f"{url} {width}w" for width, url in sorted(candidates.items()))
+        attributes['sizes'] = CONFIG["image_sizes_attr"]
+    return attributes
+
+
+def extract_html_content(built_html_path, header_image_filename=None, image_library=None):
     """
     Extracts inner HTML content using BeautifulSoup, removes HTML comments,
     removes the specified 'Back' link element, removes the header image figure,
     and rewrites relative image paths. Uses config for selector and image base URL.
 
+    Rewritten image URLs carry the image's content hash: the uploaded file name
+    ('photo.<hash>.jpg', see public_image_url), so a re-processed image gets a new URL
+    and published posts can be cached as immutable.
+    Local images also get width/height and, when derivatives were uploaded, srcset/sizes.
+    Once CONFIG["eager_image_count"] content images (those the image library resolves)
+    have been seen, the remaining images get loading="lazy" decoding="async"; images the
+    library does not manage (external, site chrome) never use up an eager slot.
+
     Args:
         built_html_path (Path): Path to the built HTML file.
         header_image_filename (str, optional): The filename (e.g., "kilt-evolution_header.webp")
                                                 of the header image to find and remove its figure.
                                                 Defaults to None.
+        image_library (ImageLibrary, optional): Supplies recorded content hashes; files are hashed directly without it.
     """
     # Get selectors and config from global CONFIG dictionary
     selector = CONFIG["html_content_selector"] # e.g., "article.blog-post"
     back_link_selector = CONFIG["html_back_link_selector"] # e.g., "nav.post-navigation-top"
-    image_public_base_url = CONFIG["image_public_base_url"]
+    eager_image_count = CONFIG["eager_image_count"]
 
     logging.info(f"Extracting content from {built_html_path} using selector '{selector}'...")
     try:
         with open(built_html_path, 'r', encoding='utf-8') as f:
             try:
                 soup = BeautifulSoup(f, 'lxml')
-            except ImportError:
+            except (ImportError, FeatureNotFound):
                 logging.warning("lxml not found, using html.parser.")
+                f.seek(0)
                 soup = BeautifulSoup(f, 'html.parser')
 
         # --- Find the main content container element first ---
@@ -182,19 +445,31 @@ def extract_html_content(built_html_path, header_image_filename=None):
         logging.info("Rewriting remaining image paths within content to full URLs...")
         images_found = 0
         images_rewritten = 0
+        images_lazy = 0
+        content_images = 0 # Library-resolved images so far; the first eager_image_count stay eager
         for img_tag in content_element.find_all('img'): # Re-find all remaining images
             images_found += 1
             original_src = img_tag.get('src')
+            is_content_image = False
             if original_src and original_src.startswith(('/images/', 'images/')):
-                filename = os.path.basename(original_src)
-                # Construct full URL, avoid double slashes
-                new_src = image_public_base_url.rstrip('/') + '/' + filename
+                is_content_image = image_library is None or image_library.find_by_path(original_src) is not None
+                new_src = public_image_url(original_src, image_library)
                 img_tag['src'] = new_src
+                for name, value in responsive_image_attributes(original_src, new_src, image_library).items():
+                    if not img_tag.has_attr(name): # Attributes set by the template win
+                        img_tag[name] = value
                 images_rewritten += 1
                 logging.debug(f"  Rewrote img src: '{original_src}' -> '{new_src}'")
             elif original_src:
                  logging.debug(f"  Skipping img src (doesn't appear relative or already processed?): '{original_src}'")
-        logging.info(f"Image path rewrite complete. Found remaining: {images_found}, Rewritten: {images_rewritten}.")
+            # Below the fold: let the browser defer fetching and decoding
+            content_images += is_content_image
+            eager = content_images <= eager_image_count if is_content_image else content_images < eager_image_count
+            if not eager and not img_tag.has_attr('loading'):
+                img_tag['loading'] = 'lazy'
+                img_tag['decoding'] = 'async'
+                images_lazy += 1
+        logging.info(f"Image path rewrite complete. Found remaining: {images_found}, Rewritten: {images_rewritten}, Lazy-loaded: {images_lazy}.")
 
         # Extract the final processed inner HTML (without header figure)
         inner_html = ''.join(str(child) for child in content_element.contents)
@@ -207,74 +482,32 @@ def extract_html_content(built_html_path, header_image_filename=None):
         logging.error(f"Error parsing, modifying, or extracting HTML from file {built_html_path}: {e}", exc_info=True)
         return None
 
-def load_json_data(file_path):
-    """Loads JSON data from the given Path object."""
-    logging.info(f"Attempting to load JSON data from: {file_path}")
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logging.info(f"Successfully loaded JSON data from {file_path.name}.")
-            return data
-    except FileNotFoundError:
-        logging.warning(f"Data file not found: {file_path}. Returning empty data.")
-        return {}
-    except json.JSONDecodeError:
-        logging.error(f"Error decoding JSON from {file_path}. Please check its format.")
-        return None # Indicate critical error
-    except Exception as e:
-        logging.error(f"Error loading data from {file_path}: {e}", exc_info=True)
-        return None
-
-def save_json_data(file_path, data):
-    """Saves JSON data to the given Path object."""
-    logging.info(f"Attempting to save JSON data to: {file_path}")
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2) # Use indent=2 for consistency
-        logging.info(f"Data saved successfully to {file_path.name}")
-        return True
-    except Exception as e:
-        logging.error(f"Error saving data to {file_path}: {e}", exc_info=True)
-        return False
-
-def upload_image_to_clan(image_id, image_library_data):
+def upload_file_to_clan(local_path):
     """
-    Uploads a single image identified by its ID using data from image_library.
-    Updates image_library_data IN MEMORY with public URL and relative path.
-    Returns the relative path needed for thumbnail fields (e.g., /blog/image.jpg) or None on failure.
+    Uploads one local file with the uploadImage API, named after its content hash
+    (versioned_upload_name), so new bytes never overwrite the object behind a published URL.
+    Returns (public URL, relative path for thumbnail fields e.g. /blog/image.<hash>.jpg, fingerprint)
+    where fingerprint is the uploaded bytes' content_hash/file_size/file_mtime_ns and the
+    uploaded_name they were sent as, or None on failure.
     """
     api_function = "uploadImage"
-    url = CONFIG["api_base_url"] + api_function
-    api_user = CONFIG["api_user"]
-    api_key = CONFIG["api_key"]
     media_url_prefix_expected = CONFIG["media_url_prefix_expected"]
     media_url_submit_prefix = CONFIG["media_url_submit_prefix"]
-    base_dir = CONFIG["base_dir"]
-
-    logging.info(f"Attempting upload for Image ID: {image_id}...")
-
-    img_entry = image_library_data.get(image_id)
-    if not img_entry: logging.error(f"  Image ID '{image_id}' not found in image_library data."); return None
-    source_details = img_entry.get("source_details", {})
-    local_dir = source_details.get("local_dir")
-    filename_local = source_details.get("filename_local")
-    if not local_dir or not filename_local: logging.error(f"  Missing 'local_dir' or 'filename_local' for Image ID '{image_id}'."); return None
-
-    full_local_path = base_dir / local_dir.strip('/') / filename_local
-    logging.info(f"  Checking local path: {full_local_path}")
-    if not os.path.exists(full_local_path): logging.error(f"  Image file not found at calculated path: {full_local_path}"); return None
-
-    payload = {'api_user': api_user, 'api_key': api_key}
-    thumbnail_submit_path = None # Variable to store the result
+    filename_local = Path(local_path).name
 
     try:
-        with open(full_local_path, 'rb') as f:
-            # Key for file upload likely 'image_file' based on PHP example structure? Confirm needed.
-            files = {'image_file': (filename_local, f)}
-            logging.info(f"  Uploading '{filename_local}'...")
-            # Consider adding timeout (e.g., timeout=60)
-            response = requests.post(url, data=payload, files=files, timeout=60, verify=True) # Keep verify=True unless specific reason otherwise
-            response.raise_for_status()
+        # Fingerprint taken before reading, so a change during the upload is detected next time
+        st = os.stat(local_path)
+        with open(local_path, 'rb') as f:
+            file_bytes = f.read()
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        upload_name = versioned_upload_name(filename_local, content_hash)
+        fingerprint = {'content_hash': content_hash, 'file_size': st.st_size, 'file_mtime_ns': st.st_mtime_ns, 'uploaded_name': upload_name}
+        # Key for file upload likely 'image_file' based on PHP example structure? Confirm needed.
+        files = {'image_file': (upload_name, file_bytes)}
+        logging.info(f"  Uploading '{filename_local}' as '{upload_name}'...")
+        response = get_api_client().post(api_function, data={}, files=files) # Pooled session, retries transient errors
+        response.raise_for_status()
 
         # Process response
         try:
@@ -294,23 +527,107 @@ def upload_image_to_clan(image_id, image_library_data):
                           # Construct the path needed for thumbnail API fields
                           thumbnail_submit_path = media_url_submit_prefix.rstrip('/') + '/' + image_filename_part.lstrip('/')
                           logging.info(f"  SUCCESS: Upload complete. Relative path for API: {thumbnail_submit_path}")
-                          # Update data IN MEMORY
-                          if "source_details" not in image_library_data[image_id]: image_library_data[image_id]["source_details"] = {}
-                          image_library_data[image_id]["source_details"]["public_url"] = full_public_url
-                          image_library_data[image_id]["source_details"]["uploaded_path_relative"] = thumbnail_submit_path
+                          return full_public_url, thumbnail_submit_path, fingerprint
                      else: logging.error(f"  Upload success message URL path '{path_part}' does not start with expected '{media_url_prefix_expected}'")
                  else: logging.error("  Upload successful message received, but could not parse URL from message text.")
              else: logging.error(f"  Upload API response indicates failure or unexpected message format: {response_data}")
         except json.JSONDecodeError: logging.error(f"  Failed to decode JSON response after upload: Status {response.status_code}. Body: {response.text[:500]}...")
 
-    except requests.exceptions.HTTPError as e: logging.error(f"  HTTP error during image upload for '{image_id}': {e.response.status_code} - {e.response.text[:200]}...")
-    except requests.exceptions.RequestException as e: logging.error(f"  Network error during image upload for '{image_id}': {e}")
-    except Exception as e: logging.error(f"  Unexpected error during image upload for '{image_id}': {e}", exc_info=True)
+    except requests.exceptions.HTTPError as e: logging.error(f"  HTTP error during upload of '{filename_local}': {e.response.status_code} - {e.response.text[:200]}...")
+    except requests.exceptions.RequestException as e: logging.error(f"  Network error during upload of '{filename_local}': {e}")
+    except Exception as e: logging.error(f"  Unexpected error during upload of '{filename_local}': {e}", exc_info=True)
+
+    return None
+
+
+def upload_image_to_clan(image_id, image_library):
+    """
+    Uploads a single image identified by its ID using data from the ImageLibrary.
+    Records the public URL, relative path and the uploaded file's content hash/size/mtime
+    in the library (saved later by the caller).
+    Returns the relative path needed for thumbnail fields (e.g., /blog/image.jpg) or None on failure.
+    """
+    logging.info(f"Attempting upload for Image ID: {image_id}...")
+
+    if image_id not in image_library: logging.error(f"  Image ID '{image_id}' not found in image_library data."); return None
+    full_local_path = image_library.local_path(image_id)
+    if full_local_path is None: logging.error(f"  Missing local file details ('local_dir'/'filename_local' or 'published_file_path') for Image ID '{image_id}'."); return None
+    logging.info(f"  Checking local path: {full_local_path}")
+    if not os.path.exists(full_local_path): logging.error(f"  Image file not found at calculated path: {full_local_path}"); return None
+
+    uploaded = upload_file_to_clan(full_local_path)
+    if uploaded is None:
+        return None
+    full_public_url, thumbnail_submit_path, fingerprint = uploaded
+    # Record in the library (persisted by the caller)
+    image_library.update_source_details(image_id, public_url=full_public_url, uploaded_path_relative=thumbnail_submit_path, **fingerprint)
+    return thumbnail_submit_path # Return the path needed for thumbnails
+
+
+def upload_images(image_ids, image_library, max_workers=None):
+    """
+    Uploads the given images concurrently (bounded by CONFIG["upload_workers"]), skipping
+    those unchanged since their last upload. Results are recorded in the (thread-safe)
+    ImageLibrary by upload_image_to_clan. Returns {image_id: relative path or None}, in input order.
+    """
+    max_workers = max(1, max_workers or CONFIG["upload_workers"])
+
+    def _upload(image_id):
+        if versioned_upload_is_current(image_id, image_library):
+            logging.info(f"Image ID {image_id} unchanged since last upload; skipping upload.")
+            return image_library.get(image_id)["source_details"]["uploaded_path_relative"]
+        return upload_image_to_clan(image_id, image_library)
 
-    return thumbnail_submit_path # Return the path needed for thumbnails or None
+    if max_workers == 1 or len(image_ids) <= 1:
+        return {image_id: _upload(image_id) for image_id in image_ids}
+    with ContextThreadPoolExecutor(max_workers=min(max_workers, len(image_ids)), thread_name_prefix="upload") as executor:
+        return dict(zip(image_ids, executor.map(_upload, image_ids)))
 
 
-def _prepare_api_args(post_metadata, image_library_data):
+def upload_derivatives(image_ids, image_library, max_workers=None):
+    """
+    Uploads the srcset derivatives of the given images that are not on clan.com yet or
+    changed since their upload, and records 'uploaded_hash'/'uploaded_name'/'public_url' and the
+    uploaded file's 'uploaded_size'/'uploaded_mtime_ns' on each derivative in the library (saved later by the caller). Returns the number of failures.
+    """
+    max_workers = max(1, max_workers or CONFIG["upload_workers"])
+    pending = [] # (image_id, index in derivatives, absolute path, content hash)
+    for image_id in image_ids:
+        for index, derivative in enumerate((image_library.get(image_id) or {}).get("source_details", {}).get("derivatives") or []):
+            if derivative.get("format", "").upper() != CONFIG["srcset_format"].upper():
+                continue
+            path = CONFIG["base_dir"] / derivative["path"]
+            if derivative_upload_is_current(derivative):
+                continue
+            try:
+                content_hash = file_content_hash(path)
+            except OSError:
+                logging.warning(f"  Derivative of {image_id} missing locally: {path}")
+                continue
+            pending.append((image_id, index, path, content_hash))
+    if not pending:
+        return 0
+
+    logging.info(f"Uploading {len(pending)} responsive derivative(s)...")
+    with ContextThreadPoolExecutor(max_workers=min(max_workers, len(pending)), thread_name_prefix="upload") as executor:
+        outcomes = list(executor.map(lambda item: upload_file_to_clan(item[2]), pending))
+
+    failures = 0
+    updated = {} # image_id -> derivatives list with upload records
+    for (image_id, index, path, content_hash), uploaded in zip(pending, outcomes):
+        if uploaded is None or uploaded[2]['content_hash'] != content_hash:
+            failures += 1 # Failed, or the file changed while uploading (re-uploaded next time)
+            continue
+        derivatives = updated.setdefault(image_id, [dict(d) for d in image_library.get(image_id)["source_details"]["derivatives"]])
+        fingerprint = uploaded[2]
+        derivatives[index].update(uploaded_hash=content_hash, uploaded_name=fingerprint['uploaded_name'], public_url=uploaded[0],
+                                  uploaded_size=fingerprint['file_size'], uploaded_mtime_ns=fingerprint['file_mtime_ns'])
+    for image_id, derivatives in updated.items():
+        image_library.update_source_details(image_id, derivatives=derivatives)
+    return failures
+
+
+def _prepare_api_args(post_metadata, image_library):
     """Helper function to prepare the common args dictionary. Uses image_library for thumbnails."""
     args = {}
     # --- Required fields ---
@@ -333,12 +650,12 @@ def _prepare_api_args(post_metadata, image_library_data):
     args['meta_description'] = post_metadata.get('metaDescription', post_metadata.get('meta_description', post_metadata.get('description', args['short_content'])))
 
     # --- Thumbnail Handling ---
-    # Get paths from image_library_data (updated in memory by upload function)
+    # Get paths from the image library (updated by the upload function)
     list_thumb_path, post_thumb_path = None, None
     header_image_id = post_metadata.get('headerImageId')
 
     if header_image_id:
-        img_entry = image_library_data.get(header_image_id)
+        img_entry = image_library.get(header_image_id)
         if img_entry:
             uploaded_path = img_entry.get("source_details", {}).get("uploaded_path_relative")
             if uploaded_path:
@@ -371,40 +688,43 @@ def _prepare_api_args(post_metadata, image_library_data):
     return args_filtered
 
 
+def compute_publish_digest(html_content, api_args):
+    """
+    Returns a SHA-256 digest of what would be sent to createPost/editPost: the extracted
+    HTML plus the API args. Identical digests mean the remote post is already up to date.
+    """
+    digest = hashlib.sha256()
+    digest.update(html_content.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(json.dumps(api_args, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
 def _call_api(api_function, args, temp_html_file_path=None):
     """Generic function to call createPost or editPost API."""
-    url = CONFIG["api_base_url"] + api_function
-    api_user = CONFIG["api_user"]
-    api_key = CONFIG["api_key"]
-
     payload = {
-        'api_user': (None, api_user),
-        'api_key': (None, api_key),
         'json_args': (None, json.dumps(args))
     }
 
-    files_payload = None
-    file_handle = None
     if temp_html_file_path:
         if not Path(temp_html_file_path).is_file():
             raise FileNotFoundError(f"Temporary HTML file not found: {temp_html_file_path}")
         try:
-            # Open file handle here, pass it to requests, close in finally
-            file_handle = open(temp_html_file_path, 'rb')
-            files_payload = {'html_file': (os.path.basename(temp_html_file_path), file_handle, 'text/html')}
+            # Read into memory so the body can be re-sent if the call is retried
+            with open(temp_html_file_path, 'rb') as f:
+                payload['html_file'] = (os.path.basename(temp_html_file_path), f.read(), 'text/html')
         except Exception as e:
-             logging.error(f"Error opening temporary HTML file {temp_html_file_path}: {e}")
-             if file_handle: file_handle.close() # Ensure close on error
+             logging.error(f"Error reading temporary HTML file {temp_html_file_path}: {e}")
              raise # Re-raise
 
-    logging.info(f"Calling API function '{api_function}' at {url} for post '{args.get('url_key', args.get('post_id'))}'")
+    logging.info(f"Calling API function '{api_function}' at {CONFIG['api_base_url'] + api_function} for post '{args.get('url_key', args.get('post_id'))}'")
     logging.debug(f"API Args (JSON encoded): {payload['json_args']}")
 
     response_data = None
     error_detail = None
     status_code = None
     try:
-        response = requests.post(url, data=payload, files=files_payload, timeout=120, verify=True)
+        response = get_api_client().post(api_function, files=payload) # Credentials added by the client
         status_code = response.status_code
         response.raise_for_status() # Check for HTTP errors
 
@@ -437,14 +757,10 @@ def _call_api(api_function, args, temp_html_file_path=None):
         logging.error(error_detail, exc_info=True)
         return False, None, error_detail
 
-    finally:
-        if file_handle:
-            file_handle.close() # Ensure file handle is closed
-
-def create_blog_post(post_metadata, post_content_html_path, image_library_data):
+def create_blog_post(post_metadata, post_content_html_path, image_library):
     """Calls the createPost API endpoint using the generic helper."""
     try:
-        args = _prepare_api_args(post_metadata, image_library_data)
+        args = _prepare_api_args(post_metadata, image_library)
     except ValueError as e:
          logging.error(f"Failed to prepare API args for createPost: {e}")
          return False, None, str(e)
@@ -464,10 +780,10 @@ def create_blog_post(post_metadata, post_content_html_path, image_library_data):
         return False, None, error_msg
 
 
-def edit_blog_post(post_id, post_metadata, post_content_html_path, image_library_data):
+def edit_blog_post(post_id, post_metadata, post_content_html_path, image_library):
     """Calls the editPost API endpoint using the generic helper."""
     try:
-        args = _prepare_api_args(post_metadata, image_library_data)
+        args = _prepare_api_args(post_metadata, image_library)
         args['post_id'] = post_id # Add post_id required for editing
     except ValueError as e:
          logging.error(f"Failed to prepare API args for editPost: {e}")
@@ -490,208 +806,217 @@ def edit_blog_post(post_id, post_metadata, post_content_html_path, image_library
             return False, error_msg
 
 # --- Main Execution Logic ---
-# ... (Keep all imports, helper functions, config loading etc. from the previous "Old Script Logic" version) ...
 
-# --- Main Execution Logic ---
-def main(md_relative_path_from_root, force_create=False):
-    logging.info(f"--- Starting Blog Post Upload Script ---")
-    logging.info(f"Target Markdown: {md_relative_path_from_root}, Force Create: {force_create}")
+class PublishError(Exception):
+    """A publish step failed before the API was called; the message is reported as 'ERROR: <message>'."""
 
-    base_dir = CONFIG["base_dir"]
-    posts_dir_name = CONFIG["posts_dir_name"] # Needed for input path validation
-    image_library_path = CONFIG["image_library_file"]
-    workflow_status_path = CONFIG["workflow_status_file"]
 
-    md_file_abs_path = base_dir / md_relative_path_from_root
+def load_post_for_publish(md_relative_path_from_root):
+    """Verifies the Markdown file and loads its front matter. Returns (metadata, post_slug)."""
+    md_file_abs_path = CONFIG["base_dir"] / md_relative_path_from_root
 
     # 1. Verify Input MD File
     if not md_file_abs_path.is_file():
         logging.error(f"Markdown file not found: {md_file_abs_path}")
-        print(f"ERROR: Markdown file not found: {md_file_abs_path}", file=sys.stderr)
-        sys.exit(1)
+        raise PublishError(f"Markdown file not found: {md_file_abs_path}")
 
     # 2. Parse Front Matter
     logging.info(f"Parsing front matter from: {md_file_abs_path}")
     try:
-        post_fm = frontmatter.load(md_file_abs_path)
-        metadata = post_fm.metadata
+        metadata = load_front_matter(md_file_abs_path) # Front matter only, body is never read
         metadata['_input_path'] = str(md_file_abs_path)
         post_slug = Path(md_file_abs_path).stem
         logging.info(f"Loaded metadata for title: '{metadata.get('title')}' (Slug: {post_slug})")
     except Exception as e:
         logging.error(f"Error parsing front matter: {e}", exc_info=True)
-        print(f"ERROR: Failed parsing front matter for {md_file_abs_path}: {e}", file=sys.stderr)
-        sys.exit(1)
-
-    # 3. Load Workflow Status Data
-    workflow_data = load_json_data(workflow_status_path)
-    if workflow_data is None:
-        print(f"ERROR: Could not load workflow status file: {workflow_status_path}", file=sys.stderr)
-        sys.exit(1)
-    if post_slug not in workflow_data:
-        workflow_data[post_slug] = {"stages": {}}
-
-    # 4. Load Image Library Data
-    image_library_data = load_json_data(image_library_path)
-    if image_library_data is None:
-        print(f"ERROR: Could not load image library file: {image_library_path}", file=sys.stderr)
-        sys.exit(1)
-
-    # 5. Run Eleventy Build
-    if not run_eleventy_build():
-        print(f"ERROR: Eleventy build failed. See log for details.", file=sys.stderr)
-        sys.exit(1)
-
-    # 6. Define Built HTML Path & Extract Content
-    # --- CORRECTED BUILT HTML PATH CALCULATION ---
-    # Assumes Eleventy config now produces output at _site/<slug>/index.html
-    # based on corrected permalink: "/{{ page.fileSlug }}/index.html" in posts data file.
-    built_html_relative_path = Path("_site") / post_slug / "index.html"
-    # --- END PATH CALCULATION ---
+        raise PublishError(f"Failed parsing front matter for {md_file_abs_path}: {e}")
+    return metadata, post_slug
 
-    built_html_path = base_dir / built_html_relative_path
 
+def require_built_html(post_slug):
+    """Path of a post's Eleventy output (_site/<slug>/index.html); raises PublishError if it was not built."""
+    base_dir = CONFIG["base_dir"]
+    built_html_path = built_html_path_for(post_slug)
 
     if not built_html_path.is_file():
         logging.error(f"Built HTML file not found after build at expected path: {built_html_path}")
-        print(f"ERROR: Expected HTML file not found after build: {built_html_path}", file=sys.stderr)
         site_dir_path = base_dir / '_site'
         if site_dir_path.is_dir():
              logging.error(f"Contents of {site_dir_path}: {list(site_dir_path.iterdir())}") # Log contents to help if it still fails
-        sys.exit(1)
+        raise PublishError(f"Expected HTML file not found after build: {built_html_path}")
+    return built_html_path
 
-    html_content = extract_html_content(built_html_path) # Uses config for selector
+
+def extract_built_post(post_slug, image_library=None):
+    """Extracts the publishable HTML of a post from the Eleventy output (_site/<slug>/index.html)."""
+    built_html_path = require_built_html(post_slug)
+    html_content = extract_html_content(built_html_path, image_library=image_library) # Uses config for selector
     if html_content is None:
-        print(f"ERROR: Failed to extract HTML content from {built_html_path}. See log.", file=sys.stderr)
-        sys.exit(1)
+        raise PublishError(f"Failed to extract HTML content from {built_html_path}. See log.")
+    return html_content
+
+
+def record_publish_failure(workflow_store, post_slug, error_message):
+    """Marks a post's publishing stage as failed before any API call was made."""
+    update_time = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds') + 'Z'
+    try:
+        workflow_store.update_stage(post_slug, 'publishing_clancom',
+                                    {'last_publish_attempt': update_time, 'status': 'error', 'last_error': error_message[:250]},
+                                    last_updated=update_time)
+    except Exception as e:
+        logging.error(f"Failed to record publish error for '{post_slug}': {e}")
+
+
+def publish_post(md_relative_path_from_root, workflow_store, image_library, force_create=False):
+    """
+    Publishes one post whose site build is already done: uploads its images, extracts
+    its HTML (after the uploads, so it links the uploaded file names), creates or edits it on clan.com and records the outcome in the workflow status.
+    Returns a result dict: slug, success, unchanged, post_id, error.
+    """
+    logging.info(f"--- Publishing {md_relative_path_from_root} (Force Create: {force_create}) ---")
+    result = {'slug': Path(md_relative_path_from_root).stem, 'success': False, 'unchanged': False, 'post_id': None, 'error': None}
+    try:
+        metadata, post_slug = load_post_for_publish(md_relative_path_from_root)
+        result['slug'] = post_slug
+        # 3-6. This post's publishing stage; fail before any upload if it was not built
+        publishing_stage = workflow_store.get_stage(post_slug, 'publishing_clancom', {})
+        require_built_html(post_slug)
+    except PublishError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        result['error'] = str(e)
+        record_publish_failure(workflow_store, result['slug'], str(e))
+        return result
 
     temp_html_file = None
     script_success = False
+    unchanged = False
     api_error_msg = None
-    image_library_modified = False
 
     try:
-        # 7. Create Temporary HTML File (Keep existing logic)
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".html", encoding='utf-8') as temp_f:
-                temp_f.write(html_content)
-                temp_html_file = temp_f.name
-            logging.info(f"Saved extracted HTML content to temporary file: {temp_html_file}")
-        except Exception as e:
-             logging.error(f"Failed to create or write temporary HTML file: {e}", exc_info=True)
-             temp_html_file = None
-             raise
-
-           # 8. Gather and Upload Images <-- *** APPLY FIX HERE ***
-        image_ids_to_upload = []
+        # 7. Gather and Upload Images (header, sections and conclusion; unique)
         logging.info("Gathering image IDs from front matter...")
-        # Get header image ID
-        header_id = metadata.get('headerImageId')
-        if header_id:
-            image_ids_to_upload.append(header_id)
-            logging.debug(f"  Found headerImageId: {header_id}")
-
-        # Get image IDs from sections
-        for i, section in enumerate(metadata.get('sections', [])):
-            section_id = section.get('imageId')
-            if section_id:
-                image_ids_to_upload.append(section_id)
-                logging.debug(f"  Found imageId in sections[{i}]: {section_id}")
-
-        # Get image ID from conclusion
-        conclusion_id = metadata.get('conclusion', {}).get('imageId')
-        if conclusion_id:
-            image_ids_to_upload.append(conclusion_id)
-            logging.debug(f"  Found imageId in conclusion: {conclusion_id}")
-
-        # Ensure IDs are unique
-        image_ids_to_upload = list(dict.fromkeys(image_ids_to_upload))
+        image_ids_to_upload = post_image_ids(metadata)
         logging.info(f"Found {len(image_ids_to_upload)} unique image IDs to process: {image_ids_to_upload}")
 
-        # --- The rest of the image upload loop remains the same ---
-        image_library_modified = False
         if image_ids_to_upload:
              logging.info(f"--- Starting Image Uploads for {len(image_ids_to_upload)} image(s) ---")
-             current_image_library_state = image_library_data.copy()
-             any_upload_succeeded = False
-             for image_id in image_ids_to_upload:
-                 relative_path = upload_image_to_clan(image_id, current_image_library_state)
-                 if relative_path:
-                      image_library_modified = True
-                      any_upload_succeeded = True
-                 else:
+             upload_results = upload_images(image_ids_to_upload, image_library)
+             for image_id, relative_path in upload_results.items():
+                 if not relative_path:
                       logging.warning(f"Failed to upload image ID: {image_id}. Post might have missing images/thumbnails.")
-
-             if image_library_modified:
-                  image_library_data = current_image_library_state # Update main dict with changes
+             derivative_failures = upload_derivatives(image_ids_to_upload, image_library)
+             if derivative_failures:
+                  logging.warning(f"Failed to upload {derivative_failures} responsive derivative(s). Some srcset candidates may be missing on clan.com.")
              logging.info("--- Finished Image Uploads ---")
         else:
              logging.info("No image IDs found in front matter to upload.")
 
 
-        # 9. Save updated image library data IF changes were made (Keep existing logic)
-        if image_library_modified:
+        # 8. Save updated image library entries IF changes were made
+        if image_library.has_changes():
              logging.info("Saving updated image library data...")
-             if not save_json_data(image_library_path, image_library_data):
+             if not image_library.save():
                   logging.error("CRITICAL: Failed to save updated image library data after uploads!")
 
-        # 10. Decide: Create or Edit? (Keep existing logic)
+        # Extract the HTML now that the uploaded (content-hashed) image URLs are recorded
+        try:
+            html_content = extract_built_post(post_slug, image_library)
+        except PublishError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            result['error'] = str(e)
+            record_publish_failure(workflow_store, post_slug, str(e))
+            return result
+
+        # Existing remote post (ignored with --force-create)
         existing_post_id = None
         if not force_create:
-             existing_post_id = workflow_data.get(post_slug, {}).get("stages", {}).get("publishing_clancom", {}).get("post_id")
-
-        if existing_post_id:
-            logging.info(f"Found existing Post ID {existing_post_id}. Attempting to edit.")
-            success, error_msg = edit_blog_post(existing_post_id, metadata, temp_html_file, image_library_data)
-            if success: script_success = True
-            else: api_error_msg = error_msg
+             existing_post_id = publishing_stage.get("post_id")
 
+        # 9. Skip the API call if nothing changed since the last successful publish
+        publish_digest = None
+        try:
+            publish_digest = compute_publish_digest(html_content, _prepare_api_args(metadata, image_library))
+        except ValueError:
+            pass # Invalid metadata is reported by the create/edit call below
+        unchanged = bool(existing_post_id and publish_digest
+                         and publishing_stage.get("status") == "complete"
+                         and publishing_stage.get("published_digest") == publish_digest)
+
+        if unchanged:
+            logging.info(f"No changes since the last publish of Post ID {existing_post_id} (digest {publish_digest[:12]}). Skipping editPost.")
+            script_success = True
         else:
-            if force_create: logging.warning(f"Option --force-create used. Attempting creation.")
-            else: logging.info(f"No existing Post ID found for slug '{post_slug}'. Attempting to create.")
-            success, new_post_id, error_msg = create_blog_post(metadata, temp_html_file, image_library_data)
-            if success:
-                script_success = True
-                if new_post_id:
-                     # Ensure structure exists
-                     if 'stages' not in workflow_data[post_slug]: workflow_data[post_slug]['stages'] = {}
-                     if 'publishing_clancom' not in workflow_data[post_slug]['stages']: workflow_data[post_slug]['stages']['publishing_clancom'] = {}
-                     workflow_data[post_slug]['stages']['publishing_clancom']['post_id'] = new_post_id
-                     logging.info(f"Storing new Post ID {new_post_id} for slug '{post_slug}'.")
-                else: logging.warning("Post creation succeeded but no Post ID was returned/extracted.")
+            # 10. Create Temporary HTML File
+            try:
+                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".html", encoding='utf-8') as temp_f:
+                    temp_f.write(html_content)
+                    temp_html_file = temp_f.name
+                logging.info(f"Saved extracted HTML content to temporary file: {temp_html_file}")
+            except Exception as e:
+                 logging.error(f"Failed to create or write temporary HTML file: {e}", exc_info=True)
+                 temp_html_file = None
+                 raise
+
+            # 11. Decide: Create or Edit?
+            if existing_post_id:
+                logging.info(f"Found existing Post ID {existing_post_id}. Attempting to edit.")
+                success, error_msg = edit_blog_post(existing_post_id, metadata, temp_html_file, image_library)
+                if success: script_success = True
+                else: api_error_msg = error_msg
+
             else:
-                 api_error_msg = error_msg
+                if force_create: logging.warning(f"Option --force-create used. Attempting creation.")
+                else: logging.info(f"No existing Post ID found for slug '{post_slug}'. Attempting to create.")
+                success, new_post_id, error_msg = create_blog_post(metadata, temp_html_file, image_library)
+                if success:
+                    script_success = True
+                    if new_post_id:
+                         result['post_id'] = new_post_id
+                         workflow_store.update_stage(post_slug, 'publishing_clancom', {'post_id': new_post_id})
+                         logging.info(f"Storing new Post ID {new_post_id} for slug '{post_slug}'.")
+                    else: logging.warning("Post creation succeeded but no Post ID was returned/extracted.")
+                else:
+                     api_error_msg = error_msg
 
-        # 11. Update Workflow Status File (Keep existing logic)
-        logging.info("Updating workflow status file...")
+        # 12. Update Workflow Status (single stage row upsert)
+        logging.info("Updating workflow status...")
         update_time = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds') + 'Z'
-        # Ensure structure exists
-        if 'stages' not in workflow_data[post_slug]: workflow_data[post_slug]['stages'] = {}
-        if 'publishing_clancom' not in workflow_data[post_slug]['stages']: workflow_data[post_slug]['stages']['publishing_clancom'] = {}
-
-        workflow_data[post_slug]['last_updated'] = update_time
-        workflow_data[post_slug]['stages']['publishing_clancom']['last_publish_attempt'] = update_time
+        clear_stale_post_id = False
 
+        stage_updates = {'last_publish_attempt': update_time}
         if script_success:
-             workflow_data[post_slug]['stages']['publishing_clancom']['status'] = 'complete'
-             workflow_data[post_slug]['stages']['publishing_clancom']['last_error'] = None
+             stage_updates['status'] = 'complete'
+             stage_updates['last_error'] = None
+             if publish_digest:
+                 stage_updates['published_digest'] = publish_digest
              logging.info(f"Workflow status updated to 'complete' for '{post_slug}'.")
         else:
-             workflow_data[post_slug]['stages']['publishing_clancom']['status'] = 'error'
+             stage_updates['status'] = 'error'
              final_error_message = api_error_msg or "Unknown error during publish step (check logs)."
-             workflow_data[post_slug]['stages']['publishing_clancom']['last_error'] = final_error_message
+             stage_updates['last_error'] = final_error_message
              logging.info(f"Workflow status updated to 'error' for '{post_slug}'. Error: {final_error_message}")
              if api_error_msg == "PostNotFound" and existing_post_id:
                  logging.error(f"Edit failed: Post ID {existing_post_id} not found on server.")
                  logging.warning(f"Clearing stale post ID for '{post_slug}' in workflow status.")
-                 workflow_data[post_slug]['stages']['publishing_clancom'].pop("post_id", None)
+                 clear_stale_post_id = True
 
-        if not save_json_data(workflow_status_path, workflow_data):
-             logging.error("CRITICAL: Failed to save updated workflow status data!")
-             print(f"ERROR: Failed to save updated workflow status data to {workflow_status_path}", file=sys.stderr)
+        def _apply_publish_status(stage):
+            stage = stage if isinstance(stage, dict) else {}
+            stage.update(stage_updates)
+            if not script_success:
+                stage.pop("published_digest", None) # Remote state unknown; send everything next time
+            if clear_stale_post_id:
+                stage.pop("post_id", None)
+            return stage
+
+        try:
+            workflow_store.mutate_stage(post_slug, 'publishing_clancom', _apply_publish_status, last_updated=update_time)
+        except Exception as e:
+             logging.error(f"CRITICAL: Failed to save updated workflow status data! {e}")
+             print(f"ERROR: Failed to save updated workflow status data to {workflow_store.db_path}", file=sys.stderr)
 
     finally:
-        # 12. Clean up temporary file
+        # 13. Clean up temporary file
         if temp_html_file and os.path.exists(temp_html_file):
             try:
                 logging.info(f"Deleting temporary HTML file: {temp_html_file}")
@@ -699,36 +1024,182 @@ def main(md_relative_path_from_root, force_create=False):
             except OSError as e:
                  logging.error(f"Error deleting temporary file {temp_html_file}: {e}")
 
+
+    result['success'] = script_success
+    result['unchanged'] = unchanged
     if script_success:
+        result['post_id'] = result['post_id'] or existing_post_id
+    else:
+        result['error'] = api_error_msg or "Unknown error during publish step (check logs)."
+    return result
+
+
+def find_changed_posts(workflow_store):
+    """
+    Returns the Markdown paths (relative to the project root) of already published posts
+    whose file changed since their last publish attempt, or whose last publish failed.
+    Never-published and deleted posts are not included.
+    """
+    posts_dir = CONFIG["base_dir"] / CONFIG["posts_dir_name"]
+    changed = []
+    for md_path in sorted(posts_dir.glob('*.md')):
+        slug = md_path.stem
+        stage = workflow_store.get_stage(slug, 'publishing_clancom', {}) or {}
+        if not stage.get('post_id'):
+            continue
+        try:
+            if load_front_matter(md_path, fields=('deleted',)).get('deleted'):
+                continue
+        except Exception as e:
+            logging.warning(f"Skipping {md_path.name}: could not read front matter ({e})")
+            continue
+        last_attempt = stage.get('last_publish_attempt')
+        try:
+            # Stored as ISO time with a trailing 'Z' (sometimes after an explicit offset)
+            last_attempt_ts = datetime.datetime.fromisoformat(last_attempt.rstrip('Z')).timestamp() if last_attempt else None
+        except ValueError:
+            last_attempt_ts = None
+        if stage.get('status') != 'complete' or last_attempt_ts is None or md_path.stat().st_mtime > last_attempt_ts:
+            changed.append(f"{CONFIG['posts_dir_name']}/{md_path.name}")
+    return changed
+
+
+def publish_posts(md_relative_paths, workflow_store, image_library, force_create=False, force_build=False, catch_errors=True):
+    """
+    Renders the given posts (one scoped Eleventy build for those whose output is stale),
+    then publishes each of them with the given WorkflowStore and ImageLibrary.
+    Returns one publish_post() result dict per path. Raises PublishError if the build fails.
+    With catch_errors, an unexpected exception fails only the post it came from.
+    """
+    results = []
+    if not md_relative_paths:
+        return results
+    # One Eleventy build, scoped to the posts whose built HTML is out of date
+    stale_paths = [path for path in md_relative_paths if force_build or not built_post_is_fresh(path, image_library)]
+    if len(stale_paths) < len(md_relative_paths):
+        logging.info(f"Reusing up-to-date built HTML for {len(md_relative_paths) - len(stale_paths)} post(s).")
+    if stale_paths:
+        library_hashes_before_build = {path: post_library_hash(path, image_library) for path in stale_paths}
+        if not run_eleventy_build(stale_paths):
+            for md_relative_path in stale_paths:
+                record_publish_failure(workflow_store, Path(md_relative_path).stem, "Eleventy build failed.")
+            raise PublishError("Eleventy build failed. See log for details.")
+        record_post_builds(library_hashes_before_build)
+    for md_relative_path in md_relative_paths:
+        try:
+            results.append(publish_post(md_relative_path, workflow_store, image_library, force_create))
+        except Exception as e:
+            if not catch_errors:
+                raise
+            logging.error(f"Unexpected error publishing {md_relative_path}: {e}", exc_info=True)
+            results.append({'slug': Path(md_relative_path).stem, 'success': False, 'unchanged': False, 'post_id': None, 'error': str(e)})
+    return results
+
+
+def main(md_relative_paths, force_create=False, json_report=False, force_build=False):
+    """
+    Renders the given posts (one scoped Eleventy build for those whose output is stale),
+    then publishes each of them. Exits non-zero if any post failed.
+    """
+    if isinstance(md_relative_paths, (str, Path)):
+        md_relative_paths = [md_relative_paths]
+    batch = len(md_relative_paths) != 1
+    logging.info(f"--- Starting Blog Post Upload Script ---")
+    logging.info(f"Target Markdown: {', '.join(map(str, md_relative_paths)) or '(none)'}, Force Create: {force_create}")
+
+    workflow_status_path = CONFIG["workflow_status_file"]
+    workflow_store = WorkflowStore(workflow_status_path)
+
+    # Image library is loaded once and shared by all posts in this run
+    image_library_path = CONFIG["image_library_file"]
+    image_library = ImageLibrary(image_library_path, base_dir=CONFIG["base_dir"])
+    try:
+        image_library.load()
+    except Exception as e:
+        logging.error(f"Error loading image library: {e}")
+        print(f"ERROR: Could not load image library file: {image_library_path}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        results = publish_posts(md_relative_paths, workflow_store, image_library, force_create, force_build,
+                                catch_errors=batch)
+    except PublishError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not workflow_store.flush():
+         print(f"ERROR: Failed to export workflow status data to {workflow_status_path}", file=sys.stderr)
+
+    # Per-endpoint API latency for this run
+    if _api_client is not None:
+        for api_function, stats in _api_client.latency_summary().items():
+            logging.info(f"API latency {api_function}: {stats['calls']} call(s), {stats['total_ms']:.0f} ms total, {stats['max_ms']:.0f} ms max")
+
+    for result in results:
+        if not result['success']:
+            if batch: print(f"FAILED: Post '{result['slug']}': {result['error']}")
+        elif result['unchanged']:
+            print(f"SUCCESS: Post '{result['slug']}' has no changes since the last publish; nothing submitted.")
+        else:
+            print(f"SUCCESS: Post '{result['slug']}' processed and submitted successfully.")
+    if batch:
+        failed = sum(1 for result in results if not result['success'])
+        print(f"Batch finished: {len(results) - failed} succeeded, {failed} failed.")
+    if json_report:
+        print("REPORT: " + json.dumps(results))
+
+    if all(result['success'] for result in results):
          logging.info("--- Script finished successfully! ---")
-         print(f"SUCCESS: Post '{post_slug}' processed and submitted successfully.")
     else:
          logging.error("--- Script finished with errors. ---")
          sys.exit(1)
 
 # --- Argument Parser and Main Call ---
-# (Keep the __main__ block with argparse setup and validation as before)
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Build, process, and upload Eleventy blog post to clan.com API.")
+    parser = argparse.ArgumentParser(description="Build, process, and upload Eleventy blog posts to clan.com API.")
     parser.add_argument(
-        "markdown_file",
-        help="Relative path (from project root) to the post's Markdown file (e.g., posts/kilt-evolution.md)."
+        "markdown_files",
+        nargs="*",
+        help="Relative path(s) (from project root) to the posts' Markdown files (e.g., posts/kilt-evolution.md). The site is built once for all of them."
+    )
+    parser.add_argument(
+        "--all-changed",
+        action="store_true",
+        help="Republish every published post whose Markdown changed since its last publish (or whose last publish failed)."
     )
     parser.add_argument(
         "--force-create",
         action="store_true",
         help="Force creation attempt even if an existing post ID is found locally."
     )
+    parser.add_argument(
+        "--force-build",
+        action="store_true",
+        help="Re-render the posts even if their built HTML in _site is newer than all of their sources."
+    )
+    parser.add_argument(
+        "--json-report",
+        action="store_true",
+        help="Print a final 'REPORT: <json>' line with the per-post results."
+    )
     args = parser.parse_args()
 
     # Use CONFIG directly now as it's loaded globally
     posts_dir_name_config = CONFIG["posts_dir_name"]
-    # Basic validation of input path format
-    if not Path(args.markdown_file).parts or '..' in Path(args.markdown_file).parts:
-         print(f"ERROR: Invalid markdown file path specified: {args.markdown_file}", file=sys.stderr)
-         sys.exit(1)
-    if not args.markdown_file.startswith(posts_dir_name_config + os.sep):
-         print(f"ERROR: Markdown file path must be relative from project root and start with '{posts_dir_name_config}/'. Provided: {args.markdown_file}", file=sys.stderr)
-         sys.exit(1)
-
-    main(args.markdown_file, args.force_create)
\ No newline at end of file
+    markdown_files = list(args.markdown_files)
+    if args.all_changed:
+        markdown_files += [path for path in find_changed_posts(WorkflowStore(CONFIG["workflow_status_file"])) if path not in markdown_files]
+        logging.info(f"--all-changed selected {len(markdown_files)} post(s).")
+    elif not markdown_files:
+        parser.error("Specify at least one Markdown file or --all-changed.")
+
+    for markdown_file in markdown_files:
+        # Basic validation of input path format
+        if not Path(markdown_file).parts or '..' in Path(markdown_file).parts:
+             print(f"ERROR: Invalid markdown file path specified: {markdown_file}", file=sys.stderr)
+             sys.exit(1)
+        if not markdown_file.startswith(posts_dir_name_config + '/') and not markdown_file.startswith(posts_dir_name_config + os.sep):
+             print(f"ERROR: Markdown file path must be relative from project root and start with '{posts_dir_name_config}/'. Provided: {markdown_file}", file=sys.stderr)
+             sys.exit(1)
+
+    main(markdown_files, args.force_create, args.json_report, args.force_build)
@@ -1,19 +1,32 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
-import argparse
+import csv
 import json
+import argparse
 import logging
 from pathlib import Path
 import shutil
-from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError # Added UnidentifiedImageError, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, UnidentifiedImageError
 
 # --- Define Base Directory ---
 SCRIPT_DIR = Path(__file__).resolve().parent
 BASE_DIR = SCRIPT_DIR.parent
+# Make the shared 'scripts.*' modules importable when run as a standalone script
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
 # --- End Base Directory Definition ---
 
+from PIL import features
+from scripts.image_library import ImageLibrary, file_content_hash
+from scripts.watermark_engine import WatermarkEngine
+from scripts.image_pipeline import ImageOutput, run_pipeline, resize_to_width, format_timings
+from scripts.derivatives import DerivativeManifest, derivative_settings_hash, derivative_filename, derivative_widths
+from scripts.thumbnails import ThumbnailCache
+
 # --- Configuration ---
 # Input/Output Structure
 IMPORT_DIR = BASE_DIR / "_SOURCE_MEDIA/_IMPORT_IMAGES"
@@ -26,6 +39,19 @@ IMAGE_LIBRARY_FILE = BASE_DIR / "_data/image_library.json"
 PUBLISHED_FORMAT = "WEBP" # Target format (WEBP, JPEG, PNG)
 PUBLISHED_QUALITY = 85 # Quality setting for WEBP/JPEG (0-100)
 MAX_WIDTH = 1200 # Resize images wider than this (pixels), None to disable
+SUPPORTED_IMPORT_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.tiff') # Picked up by --scan
+
+# Responsive derivatives (recorded in source_details.derivatives, written next to the published file)
+DERIVATIVE_WIDTHS = [480, 800, 1200] # Widths above the resized source width are skipped
+DERIVATIVE_FORMATS = { # Format -> save options; formats this Pillow build cannot write are skipped
+    "WEBP": {"quality": 80},
+    "AVIF": {"quality": 55},
+}
+DERIVATIVE_MANIFEST_FILE = BASE_DIR / "_data/derivatives_manifest.json" # derivative path -> source/settings hashes it was encoded from
+
+# Admin previews, pre-generated so the admin pages never shrink a fresh import on request
+THUMBNAIL_CACHE_DIR = BASE_DIR / "tmp/thumbs" # Must match app.py's THUMBNAIL_CACHE_DIR
+ADMIN_THUMBNAIL_SIZES = (320,) # app.py's ADMIN_THUMBNAIL_SIZE
 
 # <<< --- Watermark Settings from OLD Script --- >>>
 WATERMARK_PATH_REL = "images/site/clan-watermark.png" # Relative to BASE_DIR
@@ -45,47 +71,16 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - SC
 # --- End Logging Setup ---
 
 
-# --- Helper Functions --- (Keep load_json_data, save_json_data as before)
-def load_json_data(file_path: Path):
-    # ... (same as previous version) ...
-    logging.info(f"Attempting to load JSON data from: {file_path}")
-    if not file_path.is_file():
-        logging.warning(f"JSON data file not found: {file_path}. Returning empty data.")
-        return {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        logging.info(f"Successfully loaded JSON data from {file_path.name}.")
-        return data
-    except json.JSONDecodeError:
-        logging.error(f"Error decoding JSON from {file_path}.")
-        return None
-    except Exception as e:
-        logging.error(f"Unexpected error loading JSON data from {file_path}: {e}", exc_info=True)
-        return None
-
-def save_json_data(file_path: Path, data: dict):
-    # ... (same as previous version) ...
-    logging.info(f"Attempting to save JSON data to: {file_path}")
-    try:
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
-        logging.info(f"Data saved successfully to {file_path.name}")
-        return True
-    except IOError as e:
-        logging.error(f"IOError saving JSON data to {file_path}: {e}")
-        return False
-    except Exception as e:
-        logging.error(f"Unexpected error saving JSON data to {file_path}: {e}", exc_info=True)
-        return False
+# Shared engine: the resized watermark + background tile is built once and reused for every image
+WATERMARK_ENGINE = WatermarkEngine(WATERMARK_PATH, target_width=TARGET_WATERMARK_WIDTH, offset=OFFSET,
+                                   add_background=ADD_BACKGROUND, background_color=BACKGROUND_COLOR,
+                                   background_opacity=BACKGROUND_OPACITY)
 
-# --- UPDATED Watermark Function (Using Old Script's Image Logic) ---
 def apply_watermark(image: Image.Image):
     """
     Applies an IMAGE watermark (with optional background) to the given Pillow image object.
     Uses global constants for watermark image, width, offset, background settings.
-    Returns the watermarked image object.
+    Returns the watermarked image object (RGB stays RGB), or the original image on error.
     """
     logging.info(f"Applying image watermark from: {WATERMARK_PATH}...")
     if not WATERMARK_PATH.is_file():
@@ -93,70 +88,9 @@ def apply_watermark(image: Image.Image):
         return image # Return original if watermark file missing
 
     try:
-        # Ensure base image is RGBA for compositing
-        base_image_rgba = image.convert("RGBA")
-
-        # Use 'with' for watermark image loading
-        with Image.open(WATERMARK_PATH).convert("RGBA") as watermark_image:
-
-            # --- Resize Watermark ---
-            wm_width, wm_height = watermark_image.size
-            if wm_width == 0 or wm_height == 0:
-                logging.error(f"Watermark dimensions invalid for {WATERMARK_PATH}. Skipping watermark.")
-                return image # Return original
-
-            aspect_ratio = wm_height / wm_width
-            new_wm_height = int(TARGET_WATERMARK_WIDTH * aspect_ratio)
-            if new_wm_height == 0: new_wm_height = 1 # Ensure minimum height
-
-            try: # Use modern resampling if available
-                watermark_resized = watermark_image.resize((TARGET_WATERMARK_WIDTH, new_wm_height), Image.Resampling.LANCZOS)
-            except AttributeError: # Fallback for older Pillow
-                 logging.warning("Using fallback Image.LANCZOS resizing for watermark.")
-                 watermark_resized = watermark_image.resize((TARGET_WATERMARK_WIDTH, new_wm_height), Image.LANCZOS)
-
-            wm_resized_width, wm_resized_height = watermark_resized.size
-
-            # --- Calculate Position ---
-            base_width, base_height = base_image_rgba.size
-            pos_x = max(0, base_width - wm_resized_width - OFFSET)
-            pos_y = max(0, base_height - wm_resized_height - OFFSET)
-            position = (pos_x, pos_y)
-
-            # --- Create Composite Layer ---
-            composite_layer = Image.new('RGBA', base_image_rgba.size, (0, 0, 0, 0)) # Transparent layer
-
-            # --- Draw Background (Optional) ---
-            if ADD_BACKGROUND:
-                draw = ImageDraw.Draw(composite_layer)
-                bg_rect_coords = [ position[0], position[1], position[0] + wm_resized_width, position[1] + wm_resized_height ]
-                # Calculate RGBA color with opacity
-                bg_fill_color = BACKGROUND_COLOR + (int(255 * BACKGROUND_OPACITY),)
-                draw.rectangle(bg_rect_coords, fill=bg_fill_color)
-                del draw # Release draw object
-                logging.debug("Added watermark background.")
-
-            # --- Paste Watermark onto Composite Layer ---
-            # Paste using the watermark itself as the mask for transparency
-            composite_layer.paste(watermark_resized, position, watermark_resized)
-            logging.debug("Pasted watermark image onto composite layer.")
-
-            # --- Composite onto Base Image ---
-            watermarked_image = Image.alpha_composite(base_image_rgba, composite_layer)
-            logging.info("Watermark applied successfully.")
-
-            # --- Convert back to original mode if appropriate ---
-            # If the original was RGB, convert back to avoid saving RGBA unnecessarily
-            if image.mode == 'RGB':
-                logging.debug("Converting final watermarked image back to RGB mode.")
-                return watermarked_image.convert('RGB')
-            else:
-                # Keep as RGBA if original had transparency or if saving format supports it (like WEBP/PNG)
-                return watermarked_image
-
-    except FileNotFoundError:
-        logging.error(f"Error: Watermark file not found during processing: {WATERMARK_PATH}")
-        return image # Return original
+        watermarked_image = WATERMARK_ENGINE.apply(image)
+        logging.info("Watermark applied successfully.")
+        return watermarked_image
     except UnidentifiedImageError:
         logging.error(f"Error: Cannot identify watermark image file: {WATERMARK_PATH}")
         return image # Return original
@@ -165,19 +99,99 @@ def apply_watermark(image: Image.Image):
         return image # Return original on error
 
 
+# --- Responsive Derivatives ---
+DERIVATIVE_MANIFEST = DerivativeManifest(DERIVATIVE_MANIFEST_FILE, BASE_DIR)
+
+# --- Admin Thumbnails ---
+THUMBNAIL_CACHE = ThumbnailCache(BASE_DIR / "images", THUMBNAIL_CACHE_DIR)
+
+
+def warm_thumbnails(image_entries):
+    """Pre-generates the admin previews of newly recorded images' published files (errors are only logged)."""
+    filenames = []
+    for entry in image_entries:
+        published = entry["source_details"].get("published_file_path", "")
+        if published.startswith("images/"):
+            filenames.append(published[len("images/"):])
+    if filenames:
+        available = THUMBNAIL_CACHE.warm(filenames, ADMIN_THUMBNAIL_SIZES)
+        logging.info(f"  Admin thumbnails ready: {available} of {len(filenames) * len(ADMIN_THUMBNAIL_SIZES)}.")
+
+
+def _derivative_formats() -> dict:
+    usable = {}
+    for fmt, options in DERIVATIVE_FORMATS.items():
+        if fmt.upper() == "AVIF" and not features.check('avif'):
+            logging.warning("  AVIF derivatives skipped: this Pillow build has no AVIF support.")
+            continue
+        usable[fmt.upper()] = options
+    return usable
+
+
+def plan_derivatives(image_id: str, source_path: Path, source_hash: str, output_dir: Path):
+    """
+    Works out the derivatives of one image. Returns (current, outputs): the manifest
+    records of derivatives that are already up to date, and ImageOutputs (for
+    run_pipeline) for the ones that have to be encoded, tagged with their settings hash.
+    """
+    with Image.open(source_path) as probe: # Header only
+        frame_width = min(probe.width, MAX_WIDTH) if MAX_WIDTH else probe.width
+    current, outputs = [], []
+    for fmt, options in _derivative_formats().items():
+        for width in derivative_widths(frame_width, DERIVATIVE_WIDTHS):
+            settings_hash = derivative_settings_hash(width, fmt, options, MAX_WIDTH)
+            path = output_dir / derivative_filename(image_id, width, fmt)
+            record = DERIVATIVE_MANIFEST.current(path, source_hash, settings_hash)
+            if record:
+                current.append(record)
+                continue
+            outputs.append(ImageOutput(f"{fmt.lower()}-{width}w", path, fmt, options,
+                                       transform=lambda frame, width=width: resize_to_width(frame, width), tag=settings_hash))
+    return current, outputs
+
+
+def derivative_record(output: ImageOutput) -> dict:
+    """Manifest/library record for a derivative that run_pipeline() just wrote."""
+    with Image.open(output.path) as written: # Header only
+        width, height = written.size
+    return {
+        "path": Path(os.path.relpath(output.path, BASE_DIR)).as_posix(),
+        "format": output.format.lower(),
+        "width": width,
+        "height": height,
+        "bytes": output.path.stat().st_size,
+        "settings_hash": output.tag,
+    }
+
+
+def sorted_derivatives(records: list) -> list:
+    return sorted(records, key=lambda record: (record["format"], record["width"]))
+
+
+def record_derivatives(source_hash: str, derivatives: list):
+    """Adds an image's derivatives to the manifest (saved with DERIVATIVE_MANIFEST.save())."""
+    for record in derivatives:
+        DERIVATIVE_MANIFEST.record(source_hash, record)
+
+
 # --- Main Processing Function ---
-def process_image(input_path_str: str, slug: str, filename_base: str, description: str, alt_text: str, blog_caption: str, prompt: str = ""):
-    """Processes the image: copies raw, optimizes, watermarks, updates library."""
+def render_image_files(input_path_str: str, slug: str, filename_base: str, description: str, alt_text: str, blog_caption: str, prompt: str = ""):
+    """
+    Copies raw, optimizes and watermarks one image (steps 1-6), without touching the
+    image library or the input file, so it can run in a worker process.
+    Returns (image_id, image_entry, timings); image_entry is None if processing failed,
+    timings are run_pipeline()'s per-stage milliseconds.
+    """
     input_path = Path(input_path_str)
     logging.info(f"--- Processing image for slug: '{slug}', base: '{filename_base}' ---")
     logging.info(f"Input file: {input_path}")
 
+    # 1. Derive ID and Output Paths
+    image_id = f"{slug}_{filename_base}"
     if not input_path.is_file():
         logging.error(f"Input file not found: {input_path}")
-        return False
+        return image_id, None, {}
 
-    # 1. Derive ID and Output Paths
-    image_id = f"{slug}_{filename_base}"
     logging.info(f"Generated Image ID: {image_id}")
 
     raw_output_dir = BASE_DIR / RAW_OUTPUT_DIR_TEMPLATE.format(slug=slug)
@@ -200,10 +214,10 @@ def process_image(input_path_str: str, slug: str, filename_base: str, descriptio
         WATERMARKED_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     except OSError as e:
         logging.error(f"Error creating output directories: {e}")
-        return False
+        return image_id, None, {}
 
-    img = None
-    success_flag = True
+    image_entry = None
+    timings = {}
 
     try:
         # 3. Save Raw Copy
@@ -211,112 +225,95 @@ def process_image(input_path_str: str, slug: str, filename_base: str, descriptio
         shutil.copy2(input_path, raw_output_path_abs)
         logging.info("  Raw copy saved.")
 
-        # 4. Load Image with Pillow
-        logging.info("Loading image with Pillow...")
-        img = Image.open(input_path)
-        if img.mode not in ['RGB', 'RGBA']:
-            logging.info(f"  Converting image mode from {img.mode} to RGB for processing.")
-            img = img.convert('RGB')
-        original_format = img.format
-        logging.info(f"  Image loaded (Format: {original_format}, Mode: {img.mode}, Size: {img.size}).")
-
-        # 5. Optimize & Save Published Version
-        img_processed = img.copy()
-
-        # Resize
-        if MAX_WIDTH and img_processed.width > MAX_WIDTH:
-            logging.info(f"  Resizing image width from {img_processed.width} to {MAX_WIDTH}...")
-            aspect_ratio = img_processed.height / img_processed.width
-            new_height = int(MAX_WIDTH * aspect_ratio)
-            try: # Use modern resampling
-                img_processed = img_processed.resize((MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
-            except AttributeError: # Fallback
-                 img_processed = img_processed.resize((MAX_WIDTH, new_height), Image.LANCZOS)
-            logging.info(f"  Resized image size: {img_processed.size}")
-
-        # Prepare save options
+        # 4-6. Decode once, resize once, then encode the published, watermarked and
+        # responsive versions concurrently (derivatives already in the manifest are reused)
+        source_hash = file_content_hash(input_path)
+        current_derivatives, derivative_outputs = plan_derivatives(image_id, input_path, source_hash, published_output_dir)
+        if current_derivatives:
+            logging.info(f"  {len(current_derivatives)} derivative(s) already current; skipping them.")
         save_options = {}
         if PUBLISHED_FORMAT.upper() in ["JPEG", "JPG", "WEBP"]:
             save_options['quality'] = PUBLISHED_QUALITY
         if PUBLISHED_FORMAT.upper() == "WEBP":
             save_options['lossless'] = False # Use lossy for webp usually
+        outputs = [
+            ImageOutput("published", published_output_path_abs, PUBLISHED_FORMAT, save_options), # Optimized, UNwatermarked
+            ImageOutput("watermarked", watermarked_output_path_abs, PUBLISHED_FORMAT, save_options, transform=apply_watermark),
+        ] + derivative_outputs
+        logging.info(f"Decoding {input_path.name} and encoding {len(outputs)} version(s)...")
+        timings = run_pipeline(input_path, outputs, max_width=MAX_WIDTH)
+        logging.info(f"  Timings: {format_timings(timings)}")
+
+        raw_relative = Path(os.path.relpath(raw_output_path_abs, BASE_DIR)).as_posix()
+        published_relative = Path(os.path.relpath(published_output_path_abs, BASE_DIR)).as_posix()
+        watermarked_relative = Path(os.path.relpath(watermarked_output_path_abs, BASE_DIR)).as_posix()
+
+        image_entry = {
+            "id": image_id,
+            "description": description,
+            "prompt": prompt or "",
+            "metadata": { "alt": alt_text, "blog_caption": blog_caption },
+            "source_details": {
+                "post_slug": slug,
+                "original_import_path": str(input_path),
+                "raw_file_path": raw_relative,
+                "published_file_path": published_relative, # Path to optimized, UNwatermarked
+                "published_format": PUBLISHED_FORMAT.lower(),
+                "watermarked_file_path": watermarked_relative, # Path to watermarked version
+                "source_hash": source_hash,
+                "derivatives": sorted_derivatives(current_derivatives + [derivative_record(output) for output in derivative_outputs])
+            }
+        }
+
+    except FileNotFoundError as e:
+        logging.error(f"File not found during processing: {e}")
+    except UnidentifiedImageError as e:
+         logging.error(f"Cannot identify image file (corrupted or unsupported format?): {input_path} - {e}")
+    except Exception as e:
+        logging.error(f"An error occurred during image processing: {e}", exc_info=True)
 
-        # Save (Convert to RGB if saving as JPEG from RGBA)
-        img_to_save = img_processed
-        if img_processed.mode == 'RGBA' and PUBLISHED_FORMAT.upper() in ['JPEG', 'JPG']:
-             logging.info("  Converting RGBA to RGB before saving published as JPEG.")
-             img_to_save = img_processed.convert('RGB')
+    return image_id, image_entry, timings
 
-        logging.info(f"Saving optimized/published version to {published_output_path_abs} (Format: {PUBLISHED_FORMAT})...")
-        img_to_save.save(published_output_path_abs, format=PUBLISHED_FORMAT, **save_options)
-        logging.info("  Published version saved.")
 
-        # 6. Apply **IMAGE** Watermark & Save Watermarked Version
-        # Apply watermark to the potentially resized/converted image (img_processed)
-        img_watermarked = apply_watermark(img_processed.copy()) # Use updated function
+def delete_input_file(input_path: Path):
+    """Deletes an imported input file once it has been processed and recorded."""
+    try:
+        logging.info(f"Processing successful. Deleting original input file: {input_path}")
+        os.remove(input_path)
+        logging.info("  Input file deleted.")
+    except OSError as e:
+        logging.error(f"Error deleting input file {input_path}: {e}")
 
-        # Save watermarked version (use same format and options as published)
-        # Convert back to RGB if necessary (apply_watermark tries to do this already if original was RGB)
-        img_wm_to_save = img_watermarked
-        if img_watermarked.mode == 'RGBA' and PUBLISHED_FORMAT.upper() in ['JPEG', 'JPG']:
-            logging.info("  Converting watermarked RGBA to RGB before saving as JPEG.")
-            img_wm_to_save = img_watermarked.convert('RGB')
 
-        logging.info(f"Saving watermarked version to {watermarked_output_path_abs} (Format: {PUBLISHED_FORMAT})...")
-        img_wm_to_save.save(watermarked_output_path_abs, format=PUBLISHED_FORMAT, **save_options)
-        logging.info("  Watermarked version saved.")
+def process_image(input_path_str: str, slug: str, filename_base: str, description: str, alt_text: str, blog_caption: str, prompt: str = ""):
+    """Processes the image: copies raw, optimizes, watermarks, updates library."""
+    input_path = Path(input_path_str)
+    image_id, image_entry, _ = render_image_files(input_path_str, slug, filename_base, description, alt_text, blog_caption, prompt)
+    success_flag = image_entry is not None
 
-        # 7. Update Image Library JSON
+    # 7. Update Image Library JSON
+    if success_flag:
         logging.info("Updating image library JSON file...")
-        image_library_data = load_json_data(IMAGE_LIBRARY_FILE)
-        if image_library_data is None:
-            logging.error("Failed to load image library data for update. Aborting JSON update.")
+        image_library = ImageLibrary(IMAGE_LIBRARY_FILE, base_dir=BASE_DIR)
+        try:
+            image_library.load()
+        except Exception as e:
+            logging.error(f"Failed to load image library data for update ({e}). Aborting JSON update.")
             success_flag = False
         else:
-            raw_relative = Path(os.path.relpath(raw_output_path_abs, BASE_DIR)).as_posix()
-            published_relative = Path(os.path.relpath(published_output_path_abs, BASE_DIR)).as_posix()
-            watermarked_relative = Path(os.path.relpath(watermarked_output_path_abs, BASE_DIR)).as_posix()
-
-            image_entry = {
-                "id": image_id,
-                "description": description,
-                "prompt": prompt or "",
-                "metadata": { "alt": alt_text, "blog_caption": blog_caption },
-                "source_details": {
-                    "original_import_path": str(input_path),
-                    "raw_file_path": raw_relative,
-                    "published_file_path": published_relative, # Path to optimized, UNwatermarked
-                    "published_format": PUBLISHED_FORMAT.lower(),
-                    "watermarked_file_path": watermarked_relative # Path to watermarked version
-                }
-            }
-            image_library_data[image_id] = image_entry
-            if save_json_data(IMAGE_LIBRARY_FILE, image_library_data):
+            image_library.set_entry(image_id, image_entry)
+            if image_library.save():
                 logging.info("  Image library JSON updated successfully.")
+                record_derivatives(image_entry["source_details"]["source_hash"], image_entry["source_details"]["derivatives"])
+                DERIVATIVE_MANIFEST.save()
+                warm_thumbnails([image_entry])
             else:
                 logging.error("  Failed to save updated image library JSON!")
                 success_flag = False
 
-    except FileNotFoundError as e:
-        logging.error(f"File not found during processing: {e}")
-        success_flag = False
-    except UnidentifiedImageError as e:
-         logging.error(f"Cannot identify image file (corrupted or unsupported format?): {input_path} - {e}")
-         success_flag = False
-    except Exception as e:
-        logging.error(f"An error occurred during image processing: {e}", exc_info=True)
-        success_flag = False
-    finally:
-        if img: img.close() # Ensure image file handle is closed
-
     # 8. Cleanup Input File ONLY if successful
     if success_flag:
-        try:
-            logging.info(f"Processing successful. Deleting original input file: {input_path}")
-            os.remove(input_path)
-            logging.info("  Input file deleted.")
-        except OSError as e:
-            logging.error(f"Error deleting input file {input_path}: {e}")
+        delete_input_file(input_path)
     else:
         logging.warning(f"Processing finished with errors. Original input file NOT deleted: {input_path}")
 
@@ -324,19 +321,239 @@ def process_image(input_path_str: str, slug: str, filename_base: str, descriptio
     return success_flag
 
 
+# --- Bulk Import ---
+MANIFEST_FIELDS = ('file', 'slug', 'base_name', 'description', 'alt', 'caption', 'prompt')
+
+
+def _base_name_from_filename(stem: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', stem.lower()).strip('-')
+
+
+def _resolve_import_file(file_value: str, manifest_dir: Path) -> Path:
+    """Manifest file paths may be absolute, relative to IMPORT_DIR, or relative to the manifest."""
+    path = Path(file_value)
+    if path.is_absolute():
+        return path
+    if (IMPORT_DIR / path).is_file():
+        return IMPORT_DIR / path
+    return manifest_dir / path
+
+
+def read_manifest(manifest_path: Path) -> list:
+    """
+    Reads a bulk import manifest: a CSV with a header row, or a JSON list of objects,
+    with the columns file, slug, base_name, description, alt, caption, prompt
+    ('desc' is accepted for description). Returns a list of item dicts.
+    """
+    manifest_path = Path(manifest_path)
+    if manifest_path.suffix.lower() == '.json':
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(manifest_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    items = []
+    for row in rows:
+        row = {str(k).strip(): (v or "").strip() if isinstance(v, str) else v for k, v in row.items()}
+        if 'description' not in row and 'desc' in row:
+            row['description'] = row['desc']
+        item = {field: row.get(field) or "" for field in MANIFEST_FIELDS}
+        item['file'] = str(_resolve_import_file(item['file'], manifest_path.parent))
+        if not item['base_name']:
+            item['base_name'] = _base_name_from_filename(Path(item['file']).stem)
+        items.append(item)
+    return items
+
+
+def scan_import_dir(default_slug: str = None) -> list:
+    """
+    Lists the images waiting in IMPORT_DIR as import items. Files named
+    '<slug>__<base-name>.<ext>' carry their own slug; others need default_slug.
+    Description, alt text and caption are left empty for editing in the admin UI.
+    """
+    items = []
+    for path in sorted(IMPORT_DIR.iterdir()) if IMPORT_DIR.is_dir() else []:
+        if not path.is_file() or path.suffix.lower() not in SUPPORTED_IMPORT_EXTENSIONS:
+            continue
+        slug, _, base = path.stem.partition('__')
+        if not base:
+            slug, base = default_slug, path.stem
+        if not slug:
+            logging.warning(f"Skipping {path.name}: no slug (name it '<slug>__<base-name>{path.suffix}' or pass --slug).")
+            continue
+        items.append({'file': str(path), 'slug': slug, 'base_name': _base_name_from_filename(base),
+                      'description': "", 'alt': "", 'caption': "", 'prompt': ""})
+    return items
+
+
+def _render_import_item(item: dict):
+    """Worker-process entry point for one bulk import item."""
+    return render_image_files(item['file'], item['slug'], item['base_name'], item['description'],
+                              item['alt'], item['caption'], item['prompt'])
+
+
+def process_images_bulk(items: list, max_workers: int = None) -> dict:
+    """
+    Processes many import items across a process pool (raw copy, optimize, watermark
+    per image), then applies every image library update in ONE save and deletes the
+    inputs of the images that were recorded. Returns {image_id: success}.
+    """
+    results = {}
+    seen_ids = set()
+    runnable = []
+    for item in items:
+        image_id = f"{item['slug']}_{item['base_name']}"
+        if image_id in seen_ids:
+            logging.error(f"Duplicate image ID '{image_id}' in import list ({item['file']}). Skipping.")
+            results[image_id] = False
+            continue
+        seen_ids.add(image_id)
+        runnable.append(item)
+    if not runnable:
+        return results
+
+    logging.info(f"--- Bulk import of {len(runnable)} image(s) using {max_workers or os.cpu_count()} worker process(es) ---")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        rendered = list(executor.map(_render_import_item, runnable))
+
+    stage_totals = {}
+    for _, _, timings in rendered:
+        for stage, ms in timings.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    if stage_totals:
+        logging.info(f"  Summed per-stage timings: {format_timings(stage_totals)}")
+
+    image_library = ImageLibrary(IMAGE_LIBRARY_FILE, base_dir=BASE_DIR)
+    try:
+        image_library.load()
+    except Exception as e:
+        logging.error(f"Failed to load image library data for update ({e}). No images were recorded; input files kept.")
+        return dict(results, **{image_id: False for image_id, _, _ in rendered})
+
+    for image_id, image_entry, _ in rendered:
+        if image_entry is not None:
+            image_library.set_entry(image_id, image_entry)
+    saved = image_library.save() if image_library.has_changes() else True
+    if saved:
+        logging.info(f"  Image library JSON updated with {sum(1 for _, entry, _ in rendered if entry)} image(s).")
+        for _, image_entry, _ in rendered:
+            if image_entry is not None:
+                record_derivatives(image_entry["source_details"]["source_hash"], image_entry["source_details"]["derivatives"])
+        DERIVATIVE_MANIFEST.save()
+        warm_thumbnails([entry for _, entry, _ in rendered if entry is not None])
+    else:
+        logging.error("  Failed to save updated image library JSON! Input files kept.")
+
+    for item, (image_id, image_entry, _) in zip(runnable, rendered):
+        results[image_id] = saved and image_entry is not None
+        if results[image_id]:
+            delete_input_file(Path(item['file']))
+        else:
+            logging.warning(f"Processing finished with errors. Original input file NOT deleted: {item['file']}")
+    return results
+
+
+def refresh_image_derivatives(image_id: str, source_path_str: str, output_dir_str: str):
+    """
+    Worker-process entry point: brings one library image's derivatives up to date from
+    its source file. Returns (image_id, source_hash, derivatives, timings); derivatives
+    is None on failure.
+    """
+    source_path = Path(source_path_str)
+    try:
+        source_hash = file_content_hash(source_path)
+        current, outputs = plan_derivatives(image_id, source_path, source_hash, Path(output_dir_str))
+        timings = {}
+        if outputs:
+            logging.info(f"'{image_id}': encoding {len(outputs)} derivative(s), {len(current)} already current.")
+            timings = run_pipeline(source_path, outputs, max_width=MAX_WIDTH)
+            logging.info(f"  Timings: {format_timings(timings)}")
+        return image_id, source_hash, sorted_derivatives(current + [derivative_record(output) for output in outputs]), timings
+    except Exception as e:
+        logging.error(f"Failed to build derivatives for '{image_id}' from {source_path}: {e}")
+        return image_id, None, None, {}
+
+
+def refresh_derivatives(slug: str = None, max_workers: int = None) -> dict:
+    """
+    Re-runs derivative generation for the library's images (optionally one post's) from
+    their raw copies. Only derivatives missing from the manifest are encoded; the
+    library and manifest are saved once at the end. Returns {image_id: success}.
+    """
+    image_library = ImageLibrary(IMAGE_LIBRARY_FILE, base_dir=BASE_DIR)
+    image_library.load()
+    jobs = []
+    for image_id in (image_library.ids_for_slug(slug) if slug else image_library.ids()):
+        source_details = image_library.get(image_id).get("source_details", {})
+        raw_path = source_details.get("raw_file_path")
+        source_path = BASE_DIR / raw_path if raw_path and (BASE_DIR / raw_path).is_file() else image_library.local_path(image_id)
+        if source_path is None or not source_path.is_file():
+            logging.warning(f"Skipping '{image_id}': no source file found.")
+            continue
+        output_dir = BASE_DIR / PUBLISHED_OUTPUT_DIR_TEMPLATE.format(slug=source_details.get("post_slug") or slug or source_path.parent.name)
+        jobs.append((image_id, str(source_path), str(output_dir)))
+
+    logging.info(f"--- Refreshing derivatives for {len(jobs)} image(s) ---")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        refreshed = list(executor.map(refresh_image_derivatives, *zip(*jobs))) if jobs else []
+
+    results = {}
+    for image_id, source_hash, derivatives, _ in refreshed:
+        results[image_id] = derivatives is not None
+        if derivatives is None:
+            continue
+        source_details = image_library.get(image_id).get("source_details", {})
+        if source_details.get("source_hash") != source_hash or source_details.get("derivatives") != derivatives:
+            image_library.update_source_details(image_id, source_hash=source_hash, derivatives=derivatives)
+        record_derivatives(source_hash, derivatives)
+    if image_library.has_changes() and not image_library.save():
+        logging.error("Failed to save updated image library JSON!")
+        return {image_id: False for image_id in results}
+    DERIVATIVE_MANIFEST.save()
+    return results
+
+
 # --- Main Execution --- (Keep argparse and call to process_image as before)
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process an imported image: copy raw, optimize, watermark, and update image library.")
-    parser.add_argument("input_image_path", help="Path to the raw input image file (e.g., _SOURCE_MEDIA/_IMPORT_IMAGES/my_raw_image.png).")
-    parser.add_argument("--slug", required=True, help="Blog post slug this image belongs to (e.g., 'kilt-evolution').")
-    parser.add_argument("--base-name", required=True, help="Descriptive base name for the output files (e.g., 'header-collage', 'early-origins').")
-    parser.add_argument("--desc", required=True, help="Image description for the library.")
-    parser.add_argument("--alt", required=True, help="Alt text for accessibility.")
-    parser.add_argument("--caption", required=True, help="Caption to potentially use in the blog.")
+    parser.add_argument("input_image_path", nargs="?", help="Path to the raw input image file (e.g., _SOURCE_MEDIA/_IMPORT_IMAGES/my_raw_image.png).")
+    parser.add_argument("--slug", help="Blog post slug this image belongs to (e.g., 'kilt-evolution'). With --scan: slug for files without one in their name.")
+    parser.add_argument("--base-name", help="Descriptive base name for the output files (e.g., 'header-collage', 'early-origins').")
+    parser.add_argument("--desc", help="Image description for the library.")
+    parser.add_argument("--alt", help="Alt text for accessibility.")
+    parser.add_argument("--caption", help="Caption to potentially use in the blog.")
     parser.add_argument("--prompt", default="", help="Optional: Prompt used for AI image generation.")
+    parser.add_argument("--manifest", help="Bulk mode: CSV or JSON manifest with file, slug, base_name, description, alt, caption, prompt.")
+    parser.add_argument("--scan", action="store_true", help=f"Bulk mode: import every image in {IMPORT_DIR.relative_to(BASE_DIR)} ('<slug>__<base-name>.<ext>' or --slug).")
+    parser.add_argument("--derivatives", action="store_true", help="Refresh the responsive derivatives of library images (all, or --slug's) from their raw copies; current ones are skipped.")
+    parser.add_argument("--workers", type=int, default=None, help="Bulk mode: number of worker processes (default: all cores).")
 
     args = parser.parse_args()
 
+    if args.derivatives:
+        results = refresh_derivatives(args.slug, args.workers)
+        failed = [image_id for image_id, ok in results.items() if not ok]
+        print(f"Derivatives refreshed: {len(results) - len(failed)} image(s) up to date, {len(failed)} failed.")
+        sys.exit(1 if failed else 0)
+
+    if args.manifest or args.scan:
+        items = read_manifest(Path(args.manifest)) if args.manifest else scan_import_dir(args.slug)
+        if not items:
+            print("ERROR: Nothing to import.", file=sys.stderr)
+            sys.exit(1)
+        results = process_images_bulk(items, args.workers)
+        failed = [image_id for image_id, ok in results.items() if not ok]
+        print(f"Bulk import finished: {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+        if failed:
+            print(f"ERROR: Failed image(s): {', '.join(failed)}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    missing = [flag for flag, value in (("input_image_path", args.input_image_path), ("--slug", args.slug), ("--base-name", args.base_name),
+                                        ("--desc", args.desc), ("--alt", args.alt), ("--caption", args.caption)) if value is None]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)} (or use --manifest / --scan)")
+
     if not Path(args.input_image_path).is_file():
         print(f"ERROR: Input image file not found: {args.input_image_path}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,116 @@
+import os
+import re
+import hashlib
+import mimetypes
+import threading
+from pathlib import Path
+from flask import request, send_file, abort
+from werkzeug.security import safe_join
+
+# --- Configuration ---
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+# 'name.3f2a9c1d.webp' / 'name-3f2a9c1d.css': a hash-like segment before the extension. It only counts
+# as a fingerprint if it is a prefix of the file's SHA-256 ('header-20250418.jpg' has the shape but is not one).
+FINGERPRINT_RE = re.compile(r'[.-](?P<hash>[0-9a-f]{8,64})\.[A-Za-z0-9]+$')
+# Pre-compressed siblings, in order of preference: 'blog.css.br', 'blog.css.gz'
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+PRECOMPRESSED_TYPES = ('text/css', 'text/javascript', 'application/javascript', 'image/svg+xml', 'application/json')
+
+
+class StaticFiles:
+    """
+    Serves files from one directory with content-based caching.
+
+    - ETags are the SHA-256 of the file contents (cached per path by mtime/size),
+      so If-None-Match gets a 304 until the bytes actually change.
+    - Range requests get 206 partial responses (handled by send_file).
+    - Fingerprinted names ('name.<hex>.ext' where <hex> is a prefix of the content
+      hash) and URLs whose '?v=' matches the content hash are sent as immutable for
+      a year; everything else, including date-stamped names that merely look
+      fingerprinted, must be revalidated ('no-cache'), which costs a 304 instead
+      of a full download.
+    - For CSS/JS/SVG/JSON, a pre-compressed 'file.br' / 'file.gz' next to the file
+      is sent instead when the client accepts that encoding and it is up to date.
+    """
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = Path(root_dir)
+        self._hashes = {} # path -> ((mtime_ns, size), sha256 hex)
+        self._lock = threading.Lock()
+
+    def content_hash(self, path: Path) -> str:
+        """SHA-256 of a file, re-computed only when its mtime or size changes."""
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        key = str(path)
+        with self._lock:
+            cached = self._hashes.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        with self._lock:
+            self._hashes[key] = (signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    def resolve(self, filename: str):
+        """Returns the absolute path of a file under root_dir, or None if unsafe or missing."""
+        joined = safe_join(str(self.root_dir), filename)
+        if joined is None or not os.path.isfile(joined):
+            return None
+        return Path(joined)
+
+    def version(self, filename: str):
+        """Short content hash for '?v=' cache-busting URLs, or None if the file does not exist."""
+        path = self.resolve(filename)
+        return self.content_hash(path)[:16] if path else None
+
+    @staticmethod
+    def is_fingerprinted(name: str, content_hash: str) -> bool:
+        """True if the name carries a hash segment that matches the file's SHA-256 (so it changes with the content)."""
+        match = FINGERPRINT_RE.search(name)
+        return bool(match) and content_hash.startswith(match.group('hash'))
+
+    def _precompressed(self, path: Path, mimetype: str):
+        """Returns (encoding, path) of an up-to-date pre-compressed sibling the client accepts, or None."""
+        if mimetype not in PRECOMPRESSED_TYPES:
+            return None
+        source_mtime = os.stat(path).st_mtime_ns
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if not request.accept_encodings[encoding]:
+                continue
+            candidate = path.with_name(path.name + suffix)
+            try:
+                if os.stat(candidate).st_mtime_ns >= source_mtime:
+                    return encoding, candidate
+            except OSError:
+                continue
+        return None
+
+    def send(self, filename: str):
+        """Flask response for root_dir/filename (404 if it does not exist)."""
+        path = self.resolve(filename)
+        if path is None:
+            abort(404)
+        content_hash = self.content_hash(path)
+        mimetype = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        immutable = request.args.get('v') == content_hash[:16] or self.is_fingerprinted(path.name, content_hash)
+
+        body_path, etag = path, content_hash[:32]
+        precompressed = self._precompressed(path, mimetype)
+        if precompressed:
+            encoding, body_path = precompressed
+            etag = f"{etag}-{encoding}"
+
+        response = send_file(body_path, mimetype=mimetype, etag=etag, conditional=True,
+                             max_age=IMMUTABLE_MAX_AGE if immutable else 0)
+        if immutable:
+            response.cache_control.immutable = True
+        if mimetype in PRECOMPRESSED_TYPES:
+            response.vary.add('Accept-Encoding')
+        if precompressed:
+            response.headers['Content-Encoding'] = precompressed[0]
+        return response
@@ -0,0 +1,102 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from PIL import Image, ImageOps
+from werkzeug.security import safe_join
+
+# --- Configuration ---
+THUMBNAIL_SIZES = (160, 320, 640) # Bounding-box sizes (px) that may be requested; others are refused
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 75
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.tiff')
+
+
+class ThumbnailCache:
+    """
+    Downscaled WEBP previews of the images/ tree for the admin pages, cached on disk.
+
+    A thumbnail is generated on first request and stored as
+    <cache_dir>/<size>/<image path>.<source mtime_ns>.webp, so it is regenerated
+    when the source changes (older versions are removed) and otherwise served from
+    disk. JPEG sources are draft-decoded by Image.thumbnail(), so even large
+    originals are cheap to shrink. Thread-safe; usable from the app and scripts.
+    """
+
+    def __init__(self, images_dir: Path, cache_dir: Path, sizes=THUMBNAIL_SIZES):
+        self.images_dir = Path(images_dir)
+        self.cache_dir = Path(cache_dir)
+        self.sizes = tuple(sizes)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock_for(self, key) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def source_path(self, filename: str):
+        """Returns the absolute source path for an images/-relative filename, or None if unsafe or not an image."""
+        joined = safe_join(str(self.images_dir), filename)
+        if joined is None or Path(joined).suffix.lower() not in THUMBNAIL_EXTENSIONS:
+            return None
+        return Path(joined)
+
+    def version(self, filename: str):
+        """The source's mtime_ns as a string (for cache-busting URLs), or None if it does not exist."""
+        source = self.source_path(filename)
+        try:
+            return str(os.stat(source).st_mtime_ns) if source else None
+        except OSError:
+            return None
+
+    def get(self, size: int, filename: str):
+        """
+        Returns (thumbnail path, source version) for an images/-relative filename,
+        generating the thumbnail if needed. Returns None for unsupported sizes,
+        unsafe or missing paths and unreadable images.
+        """
+        if size not in self.sizes:
+            return None
+        source = self.source_path(filename)
+        if source is None:
+            return None
+        try:
+            mtime_ns = os.stat(source).st_mtime_ns
+        except OSError:
+            return None
+        rel_path = source.relative_to(self.images_dir)
+        target_dir = self.cache_dir / str(size) / rel_path.parent
+        target = target_dir / f"{rel_path.name}.{mtime_ns}.webp"
+        if target.is_file():
+            return target, str(mtime_ns)
+
+        with self._lock_for((size, str(rel_path))):
+            if target.is_file(): # Generated by another thread meanwhile
+                return target, str(mtime_ns)
+            try:
+                with Image.open(source) as img:
+                    img.thumbnail((size, size), Image.Resampling.LANCZOS) # In place; draft-decodes JPEGs
+                    img = ImageOps.exif_transpose(img) # Square box, so rotating after shrinking is safe
+                    if img.mode not in ('RGB', 'RGBA'):
+                        img = img.convert('RGBA' if img.mode in ('P', 'LA', 'PA') else 'RGB')
+                    target_dir.mkdir(parents=True, exist_ok=True)
+                    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                    img.save(tmp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, target)
+            except Exception as e:
+                logging.warning(f"ThumbnailCache: could not create the {size}px thumbnail of {rel_path}: {e}")
+                return None
+            for stale in target_dir.glob(f"{rel_path.name}.*.webp"):
+                if stale != target:
+                    stale.unlink(missing_ok=True)
+        logging.debug(f"ThumbnailCache: created {target}")
+        return target, str(mtime_ns)
+
+    def warm(self, filenames, sizes=None) -> int:
+        """Pre-generates thumbnails (e.g. right after an import). Returns how many are available."""
+        available = 0
+        for filename in filenames:
+            for size in sizes or self.sizes:
+                if self.get(size, str(filename)) is not None:
+                    available += 1
+        return available
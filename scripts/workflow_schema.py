@@ -0,0 +1,57 @@
+import copy
+
+# Define workflow stages
+WORKFLOW_STAGES = [
+    'conceptualisation',
+    'authoring',
+    'metadata',
+    'images',
+    'validation',
+    'publishing_clancom',
+    'syndication'
+]
+
+# Default value of each stage for posts whose workflow entry does not have it yet.
+# These are supplied at read time and only written once the stage actually changes.
+STAGE_DEFAULTS = {
+    'conceptualisation': {'status': 'pending'},
+    'authoring': {'status': 'pending'},
+    'metadata': {'status': 'pending'},
+    'images': {
+        'status': 'pending',
+        'prompts_defined_status': 'pending',
+        'generation_status': 'pending',
+        'assets_prepared_status': 'pending',
+        'metadata_integrated_status': 'pending',
+        'watermarking_status': 'pending',
+        'watermarking_used_in_publish': False,
+        'watermarks': {}
+    },
+    'validation': {'status': 'pending', 'last_preview_ok': False},
+    'publishing_clancom': {'status': 'pending'},
+    'syndication': {
+        'status': 'pending',
+        'instagram': {'overall_status': 'pending'},
+        'facebook': {'overall_status': 'pending'}
+    }
+}
+
+
+def default_stage(stage: str):
+    """Returns a fresh copy of the default value for a stage, or None for unknown stages."""
+    default = STAGE_DEFAULTS.get(stage)
+    return copy.deepcopy(default) if default is not None else None
+
+
+def with_stage_defaults(entry: dict) -> dict:
+    """
+    Returns a copy of a post's workflow entry with every missing stage filled in
+    from STAGE_DEFAULTS. Nothing is persisted; use this for read-only views.
+    """
+    entry = dict(entry or {})
+    stages = dict(entry.get('stages') or {})
+    for stage in WORKFLOW_STAGES:
+        if stage not in stages:
+            stages[stage] = default_stage(stage)
+    entry['stages'] = stages
+    return entry
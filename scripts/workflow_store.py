@@ -0,0 +1,371 @@
+import os
+import copy
+import json
+import atexit
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from scripts.workflow_schema import default_stage
+
+# --- Configuration ---
+DEFAULT_DEBOUNCE_SECONDS = 1.0 # Delay before the JSON export for Eleventy is regenerated
+BUSY_TIMEOUT_MS = 10000 # How long a writer waits for another process' transaction
+UNSTAMPED = -1 # Row revision while its write transaction is open; replaced by the new revision on commit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    slug TEXT PRIMARY KEY,
+    data TEXT NOT NULL,            -- JSON object of the post's top-level fields except 'stages'
+    revision INTEGER NOT NULL DEFAULT 0 -- store revision that last wrote the row
+);
+CREATE TABLE IF NOT EXISTS stages (
+    slug TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT NOT NULL,            -- JSON value of stages[stage]
+    revision INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (slug, stage)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _stat_signature(path: Path):
+    """Returns 'mtime_ns:size' for a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+class WorkflowStore:
+    """
+    Workflow status storage backed by SQLite (WAL mode).
+
+    Each post and each of its stages is a separate row, so a status change is a
+    single-row upsert instead of a rewrite of the whole workflow_status.json.
+    The JSON file is still produced for Eleventy, but it is regenerated in the
+    background (debounced) and on process exit. If the JSON file is changed by
+    something else (hand edit, git pull), it is re-imported when a store opens;
+    rows written after the last export (by any process) are kept over the file's.
+
+    Safe to share between Flask request threads and across processes (app + scripts).
+    """
+
+    def __init__(self, json_path: Path, db_path: Path = None, debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS):
+        self.json_path = Path(json_path)
+        self.db_path = Path(db_path) if db_path else self.json_path.with_suffix('.db')
+        self.debounce_seconds = debounce_seconds
+        self._local = threading.local()
+        self._export_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        self._import_json_if_changed()
+        atexit.register(self.flush)
+
+    # --- Connection / Transaction Helpers ---
+
+    def _conn(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        """Adds the per-row revision columns to databases created before they existed."""
+        for table in ('posts', 'stages'):
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if 'revision' not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    @staticmethod
+    def _meta_int(conn, key: str, default: int = 0) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row and row[0] is not None else default
+
+    @staticmethod
+    def _set_meta(conn, key: str, value):
+        conn.execute("INSERT INTO meta(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _write(self, fn, schedule_export: bool = True):
+        """Runs fn(conn) inside an IMMEDIATE transaction, bumps the revision and schedules a JSON export."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("INSERT INTO meta(key, value) VALUES('revision', '1') "
+                         "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+            revision = self._meta_int(conn, 'revision')
+            for table in ('posts', 'stages'):
+                conn.execute(f"UPDATE {table} SET revision = ? WHERE revision = {UNSTAMPED}", (revision,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if schedule_export:
+            self._schedule_export()
+        return result
+
+    @staticmethod
+    def _ensure_post_row(conn, slug: str):
+        conn.execute("INSERT INTO posts(slug, data) VALUES(?, '{}') ON CONFLICT(slug) DO NOTHING", (slug,))
+
+    @staticmethod
+    def _set_post_fields(conn, slug: str, fields: dict):
+        row = conn.execute("SELECT data FROM posts WHERE slug = ?", (slug,)).fetchone()
+        data = json.loads(row[0]) if row else {}
+        data.update(fields)
+        conn.execute(f"INSERT INTO posts(slug, data, revision) VALUES(?, ?, {UNSTAMPED}) "
+                     "ON CONFLICT(slug) DO UPDATE SET data = excluded.data, revision = excluded.revision",
+                     (slug, json.dumps(data)))
+
+    @staticmethod
+    def _upsert_stage(conn, slug: str, stage: str, value):
+        conn.execute(f"INSERT INTO stages(slug, stage, data, revision) VALUES(?, ?, ?, {UNSTAMPED}) "
+                     "ON CONFLICT(slug, stage) DO UPDATE SET data = excluded.data, revision = excluded.revision",
+                     (slug, stage, json.dumps(value)))
+
+    @staticmethod
+    def _current_stage(conn, slug: str, stage: str):
+        """The stored value of stages[stage], or its schema default if it has not been stored yet."""
+        row = conn.execute("SELECT data FROM stages WHERE slug = ? AND stage = ?", (slug, stage)).fetchone()
+        return json.loads(row[0]) if row else default_stage(stage)
+
+    @staticmethod
+    def _merge_stage(current, updates: dict) -> dict:
+        merged = current if isinstance(current, dict) else {}
+        merged.update(updates)
+        return merged
+
+    # --- Reads ---
+
+    def revision(self) -> int:
+        """Returns a counter that changes whenever any process writes to the store."""
+        return self._meta_int(self._conn(), 'revision')
+
+    def _read(self, fn):
+        """Runs fn(conn) inside a read transaction so multi-statement reads see one snapshot."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            return fn(conn)
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _all(conn) -> dict:
+        data = {}
+        for slug, post_json in conn.execute("SELECT slug, data FROM posts ORDER BY rowid"):
+            entry = json.loads(post_json)
+            entry['stages'] = {}
+            data[slug] = entry
+        for slug, stage, stage_json in conn.execute("SELECT slug, stage, data FROM stages ORDER BY rowid"):
+            data.setdefault(slug, {'stages': {}})['stages'][stage] = json.loads(stage_json)
+        return data
+
+    def all(self) -> dict:
+        """Returns the full workflow status structure (same shape as workflow_status.json)."""
+        return self._read(self._all)
+
+    def get_post(self, slug: str):
+        """Returns one post's workflow entry ({'stages': {...}, ...}), or None if unknown."""
+        def _get(conn):
+            row = conn.execute("SELECT data FROM posts WHERE slug = ?", (slug,)).fetchone()
+            if row is None:
+                return None
+            entry = json.loads(row[0])
+            entry['stages'] = {stage: json.loads(stage_json) for stage, stage_json in
+                               conn.execute("SELECT stage, data FROM stages WHERE slug = ? ORDER BY rowid", (slug,))}
+            return entry
+        return self._read(_get)
+
+    def get_stage(self, slug: str, stage: str, default=None):
+        """Returns the value of stages[stage] for a post, or default."""
+        row = self._conn().execute("SELECT data FROM stages WHERE slug = ? AND stage = ?", (slug, stage)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # --- Writes ---
+
+    def create_post(self, slug: str, entry: dict) -> bool:
+        """Inserts a complete workflow entry if the slug is not tracked yet. Returns True if created."""
+        def _create(conn):
+            if conn.execute("SELECT 1 FROM posts WHERE slug = ?", (slug,)).fetchone():
+                return False
+            self._set_post_fields(conn, slug, {k: v for k, v in entry.items() if k != 'stages'})
+            for stage, value in (entry.get('stages') or {}).items():
+                self._upsert_stage(conn, slug, stage, value)
+            return True
+        return self._write(_create)
+
+    def update_post(self, slug: str, stage_updates: dict = None, **fields):
+        """
+        Sets top-level fields of a post entry (e.g. last_updated) and, in the same
+        transaction, merges stage_updates ({stage: {...}}) into those stages (created
+        from their defaults if needed).
+        """
+        def _update(conn):
+            self._ensure_post_row(conn, slug)
+            for stage, updates in (stage_updates or {}).items():
+                self._upsert_stage(conn, slug, stage, self._merge_stage(self._current_stage(conn, slug, stage), updates))
+            if fields:
+                self._set_post_fields(conn, slug, fields)
+        self._write(_update)
+
+    def mutate_stage(self, slug: str, stage: str, fn, last_updated: str = None):
+        """
+        Atomically replaces stages[stage] with fn(current_value). If the stage has not been
+        stored yet, current_value is its schema default (None for unknown stages), so the
+        defaults are only materialised when a stage actually changes. Optionally sets the post's last_updated in the same transaction. Returns the new value.
+        """
+        def _mutate(conn):
+            self._ensure_post_row(conn, slug)
+            new_value = fn(self._current_stage(conn, slug, stage))
+            self._upsert_stage(conn, slug, stage, new_value)
+            if last_updated is not None:
+                self._set_post_fields(conn, slug, {'last_updated': last_updated})
+            return new_value
+        return self._write(_mutate)
+
+    def mutate_stages(self, mutations, last_updated: str = None) -> list:
+        """
+        Applies many stage mutations in ONE transaction. 'mutations' is a list of
+        (slug, stage, fn) tuples; each fn receives the current value (after earlier
+        mutations in the batch, or the schema default) and returns the new value. A mutation that raises is
+        skipped without affecting the others. Each touched row is written once.
+        Returns a list with None (applied) or the exception for each mutation, in order.
+        """
+        def _mutate_all(conn):
+            snapshot = {} # (slug, stage) -> current value
+            changed = set()
+            results = []
+            for slug, stage, fn in mutations:
+                key = (slug, stage)
+                if key not in snapshot:
+                    snapshot[key] = self._current_stage(conn, slug, stage)
+                try:
+                    # Work on a copy so a failing mutation leaves no partial changes behind
+                    snapshot[key] = fn(copy.deepcopy(snapshot[key]))
+                    changed.add(key)
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+            for slug, stage in changed:
+                self._ensure_post_row(conn, slug)
+                self._upsert_stage(conn, slug, stage, snapshot[(slug, stage)])
+            if last_updated is not None:
+                for slug in {slug for slug, _ in changed}:
+                    self._set_post_fields(conn, slug, {'last_updated': last_updated})
+            return results
+        return self._write(_mutate_all)
+
+    def update_stage(self, slug: str, stage: str, updates: dict, last_updated: str = None) -> dict:
+        """Merges 'updates' into stages[stage] (created from its default if needed) and returns the new stage dict."""
+        return self.mutate_stage(slug, stage, lambda current: self._merge_stage(current, updates), last_updated=last_updated)
+
+    # --- JSON Export / Import ---
+
+    def _schedule_export(self):
+        """(Re)starts the debounce timer for regenerating the JSON file."""
+        with self._export_lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            if self.debounce_seconds <= 0:
+                self._timer = None
+            else:
+                self._timer = threading.Timer(self.debounce_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.debounce_seconds <= 0:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Writes workflow_status.json now if there are unexported changes. Returns False on failure."""
+        with self._export_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return True
+            try:
+                self.export_json()
+                self._dirty = False
+                return True
+            except Exception as e:
+                logging.error(f"WorkflowStore: failed to export {self.json_path}: {e}", exc_info=True)
+                return False
+
+    def export_json(self):
+        """Regenerates the JSON file (atomically) from the database."""
+        data, revision = self._read(lambda conn: (self._all(conn), self._meta_int(conn, 'revision')))
+        tmp_path = self.json_path.with_name(f".{self.json_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.json_path)
+        signature = _stat_signature(self.json_path)
+        conn = self._conn()
+        self._set_meta(conn, 'json_signature', signature)
+        self._set_meta(conn, 'exported_revision', revision) # Rows written after this are not in the file yet
+        logging.info(f"WorkflowStore: exported {len(data)} post(s) to {self.json_path.name}.")
+
+    def _import_json_if_changed(self):
+        """
+        Imports the JSON file if it changed since the last export (or the database is new).
+
+        Rows that were exported are replaced by the file's contents (so posts and stages
+        removed from the file are removed), but rows written after the last export, whose
+        debounced export may still be pending in another process, are kept.
+        """
+        signature = _stat_signature(self.json_path)
+        if signature is None:
+            return
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'json_signature'").fetchone()
+        if row and row[0] == signature:
+            return
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"WorkflowStore: could not import {self.json_path}: {e}")
+            return
+
+        def _import(conn):
+            # Without an export on record (new or pre-revision database) every row counts as exported
+            exported = self._meta_int(conn, 'exported_revision', default=self._meta_int(conn, 'revision'))
+            unexported = conn.execute("SELECT (SELECT COUNT(*) FROM posts WHERE revision > ?) + "
+                                      "(SELECT COUNT(*) FROM stages WHERE revision > ?)", (exported, exported)).fetchone()[0]
+            conn.execute("DELETE FROM stages WHERE revision <= ?", (exported,))
+            conn.execute("DELETE FROM posts WHERE revision <= ?", (exported,))
+            for slug, entry in data.items():
+                entry = entry if isinstance(entry, dict) else {}
+                fields = {k: v for k, v in entry.items() if k != 'stages'}
+                conn.execute(f"INSERT INTO posts(slug, data, revision) VALUES(?, ?, {UNSTAMPED}) ON CONFLICT(slug) DO NOTHING",
+                             (slug, json.dumps(fields)))
+                for stage, value in (entry.get('stages') or {}).items():
+                    conn.execute(f"INSERT INTO stages(slug, stage, data, revision) VALUES(?, ?, ?, {UNSTAMPED}) "
+                                 "ON CONFLICT(slug, stage) DO NOTHING", (slug, stage, json.dumps(value)))
+            self._set_meta(conn, 'json_signature', signature)
+            if not unexported:
+                self._set_meta(conn, 'exported_revision', self._meta_int(conn, 'revision') + 1) # The revision _write is about to commit
+            return unexported
+
+        logging.info(f"WorkflowStore: importing {self.json_path.name} into {self.db_path.name}.")
+        unexported = self._write(_import, schedule_export=False)
+        if unexported:
+            logging.info(f"WorkflowStore: kept {unexported} row(s) changed since the last export; re-exporting.")
+            self._schedule_export() # The file does not contain them yet
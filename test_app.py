@@ -0,0 +1,110 @@
+import io
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import app as admin_app
+from scripts.job_runner import JobRunner
+from scripts.thumbnails import ThumbnailCache
+from scripts.workflow_store import WorkflowStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client whose workflow store, job queue and posts/ live in tmp_path."""
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json", debounce_seconds=0)
+    runner = JobRunner(tmp_path / "_data/admin_jobs.db")
+    monkeypatch.setattr(admin_app, 'workflow_store', store)
+    monkeypatch.setattr(admin_app, 'job_runner', runner)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "posts").mkdir()
+    yield admin_app.app.test_client(), store
+    runner.stop()
+
+def test_update_content_sets_authoring_without_a_stored_stage(client):
+    test_client, store = client
+    Path("posts/kilt.md").write_text("---\ntitle: Kilts\n---\nBody\n", encoding='utf-8')
+    store.create_post('kilt', {'stages': {}})
+    assert store.get_post('kilt')['stages'] == {} # Authoring only has its lazy default
+
+    response = test_client.post('/api/update_content/kilt', json={
+        'summary': 'About kilts', 'sections': [{'heading': 'History', 'text': '...'}],
+        'conclusion': {'heading': 'End', 'text': 'Done'}})
+    assert response.get_json() == {'success': True}
+    authoring = store.get_stage('kilt', 'authoring')
+    assert authoring['status'] == 'complete' and authoring['text_format_status'] == 'complete'
+
+def test_update_status_batch(client, monkeypatch):
+    test_client, store = client
+    store.update_stage('quaich', 'images', {'watermarks': 'legacy'}) # Not a dict: nested keys below it collide
+    revision = store.revision()
+    exports = []
+    export_json = store.export_json
+    monkeypatch.setattr(store, 'export_json', lambda: exports.append(1) or export_json())
+
+    response = test_client.post('/api/update_status/batch', json={'operations': [
+        {'slug': 'kilt', 'stage_key': 'authoring', 'status': 'complete'},
+        {'slug': 'kilt', 'stage_key': 'images.watermarks.kilt_tartan', 'status': 'complete'},
+        {'slug': 'quaich', 'stage_key': 'images.watermarks.quaich_cup', 'status': 'complete'},
+        {'slug': 'kilt', 'stage_key': 'publishing_clancom'}, # No status
+    ]})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['success'], body['applied'], body['failed']) == (False, 2, 2)
+    assert [r['success'] for r in body['results']] == [True, True, False, False]
+    assert body['results'][0] == {'index': 0, 'slug': 'kilt', 'stage_key': 'authoring', 'success': True, 'new_status': 'complete'}
+    assert 'images.watermarks.quaich_cup' in body['results'][2]['message']
+    assert body['results'][3]['index'] == 3 and 'status' in body['results'][3]['message']
+
+    assert store.get_stage('kilt', 'authoring')['status'] == 'complete'
+    assert store.get_stage('kilt', 'images')['watermarks'] == {'kilt_tartan': 'complete'}
+    assert store.get_stage('quaich', 'images')['watermarks'] == 'legacy' # The failed operation changed nothing
+    assert store.revision() == revision + 1 and len(exports) == 1 # One transaction, one JSON export
+
+def test_update_status_batch_rejects_empty_body(client):
+    test_client, _ = client
+    assert test_client.post('/api/update_status/batch', json={'operations': []}).status_code == 400
+    assert test_client.post('/api/update_status/batch', json={'slug': 'kilt'}).status_code == 400
+
+@pytest.fixture
+def thumbnails(tmp_path, monkeypatch):
+    images_dir = tmp_path / "images/posts/kilt"
+    images_dir.mkdir(parents=True)
+    Image.new('RGB', (800, 600), 'red').save(images_dir / "header.jpg")
+    cache = ThumbnailCache(tmp_path / "images", tmp_path / "tmp/thumbs")
+    monkeypatch.setattr(admin_app, 'thumbnail_cache', cache)
+    return images_dir / "header.jpg"
+
+def test_thumbnail_route(client, thumbnails):
+    test_client, _ = client
+    with admin_app.app.test_request_context():
+        url = admin_app.thumb_url('/images/posts/kilt/header.jpg')
+    assert url.startswith('/thumbs/320/posts/kilt/header.jpg?v=')
+    versioned = test_client.get(url)
+    assert versioned.status_code == 200 and versioned.mimetype == 'image/webp'
+    assert versioned.cache_control.immutable and versioned.cache_control.max_age == admin_app.THUMBNAIL_MAX_AGE
+
+    unversioned = test_client.get('/thumbs/320/posts/kilt/header.jpg')
+    assert not unversioned.cache_control.immutable and unversioned.cache_control.max_age == 0
+    assert test_client.get('/thumbs/320/posts/kilt/header.jpg', headers={'If-None-Match': unversioned.headers['ETag']}).status_code == 304
+
+    assert test_client.get('/thumbs/333/posts/kilt/header.jpg').status_code == 404 # Unsupported size
+    assert test_client.get('/thumbs/320/../../app.py').status_code == 404
+    assert test_client.get('/thumbs/320/%2E%2E/secret.jpg').status_code == 404
+
+def test_thumbnail_url_changes_with_the_source(client, thumbnails):
+    test_client, _ = client
+    with admin_app.app.test_request_context():
+        first_url = admin_app.thumb_url('posts/kilt/header.jpg')
+        Image.new('RGB', (400, 800), 'blue').save(thumbnails)
+        st = os.stat(thumbnails)
+        os.utime(thumbnails, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        second_url = admin_app.thumb_url('posts/kilt/header.jpg')
+    assert second_url != first_url
+    response = test_client.get(second_url)
+    assert response.cache_control.immutable
+    with Image.open(io.BytesIO(response.data)) as thumb:
+        assert thumb.size == (160, 320)
+    assert not test_client.get(first_url).cache_control.immutable # An old version is only revalidated
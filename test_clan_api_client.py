@@ -0,0 +1,110 @@
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from scripts import clan_api_client
+from scripts.clan_api_client import ClanApiClient
+
+BASE_URL = "https://api.clan.test/blog/"
+
+
+class ScriptedAdapter(HTTPAdapter):
+    """Answers each send() with the next scripted outcome: a status code, (status, headers), or an exception."""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.requests = [] # (prepared request, timeout) per attempt
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.requests.append((request, timeout))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = b'{"status": "success"}'
+        response.url = request.url
+        response.request = request
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(clan_api_client.time, 'sleep', delays.append)
+    return delays
+
+def _client(outcomes, **kwargs):
+    client = ClanApiClient(BASE_URL, "blog-user", "secret", **kwargs)
+    adapter = ScriptedAdapter(outcomes)
+    client.session.mount('https://', adapter)
+    return client, adapter
+
+def _connection_refused():
+    return requests.exceptions.ConnectionError(MaxRetryError(None, BASE_URL, NewConnectionError(None, "Connection refused")))
+
+def _connection_reset():
+    return requests.exceptions.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+
+def test_transient_errors_are_retried_with_exponential_backoff(sleeps):
+    client, adapter = _client([500, 502, requests.exceptions.ReadTimeout("slow"), 200], backoff_base=1.0)
+    response = client.post('uploadImage', files={'image_file': ("a.jpg", b"bytes")})
+    assert response.status_code == 200 and len(adapter.requests) == 4
+    for delay, (low, high) in zip(sleeps, [(0.5, 1.0), (1.0, 2.0), (2.0, 4.0)]):
+        assert low <= delay <= high # Jittered between half and the full delay
+    assert len(sleeps) == 3
+    request, timeout = adapter.requests[0]
+    assert request.url == BASE_URL + "uploadImage" and timeout == (10, 60)
+    assert b'name="api_key"' in request.body and b"secret" in request.body
+    assert client.call_log[-1]['attempts'] == 4 and client.call_log[-1]['status_code'] == 200
+
+def test_backoff_is_capped(sleeps):
+    client, _ = _client([503] * 3 + [200], backoff_base=4.0, backoff_max=5.0)
+    assert client.post('editPost', data={}).status_code == 200
+    assert all(delay <= 5.0 for delay in sleeps) and len(sleeps) == 3
+
+def test_retry_after_header_is_honoured(sleeps):
+    client, _ = _client([(429, {'Retry-After': '3'}), (503, {'Retry-After': '60'}), 200], backoff_base=0.1)
+    assert client.post('editPost', data={}).status_code == 200
+    assert sleeps[0] == 3.0
+    assert sleeps[1] == client.backoff_max # Never longer than backoff_max
+
+def test_gives_up_after_max_retries(sleeps):
+    client, adapter = _client([503] * 3, max_retries=2)
+    assert client.post('editPost', data={}).status_code == 503 # Left to the caller's raise_for_status()
+    assert len(adapter.requests) == 3 and len(sleeps) == 2
+
+    client, adapter = _client([_connection_reset()] * 3, max_retries=2)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post('uploadImage', data={})
+    assert len(adapter.requests) == 3
+    assert client.call_log[-1]['status_code'] is None and client.call_log[-1]['error']
+
+@pytest.mark.parametrize('outcome', [503, requests.exceptions.ReadTimeout("no answer"), _connection_reset()])
+def test_create_post_is_not_retried_once_the_request_may_have_arrived(sleeps, outcome):
+    client, adapter = _client([outcome, 200])
+    if isinstance(outcome, Exception):
+        with pytest.raises(type(outcome)):
+            client.post('createPost', files={'json_args': (None, "{}")})
+    else:
+        assert client.post('createPost', files={'json_args': (None, "{}")}).status_code == 503
+    assert len(adapter.requests) == 1 and sleeps == [] # A retry could create a duplicate post
+
+@pytest.mark.parametrize('outcome', [requests.exceptions.ConnectTimeout("no connection"), _connection_refused()])
+def test_create_post_is_retried_when_no_connection_was_made(sleeps, outcome):
+    client, adapter = _client([outcome, 200])
+    assert client.post('createPost', files={'json_args': (None, "{}")}).status_code == 200
+    assert len(adapter.requests) == 2 and len(sleeps) == 1
+    assert adapter.requests[0][1] == (10, 120)
+
+def test_latency_summary(sleeps):
+    client, _ = _client([200, 200, 500, 200])
+    for api_function in ('uploadImage', 'uploadImage', 'editPost'):
+        client.post(api_function, data={})
+    summary = client.latency_summary()
+    assert summary['uploadImage']['calls'] == 2 and summary['editPost']['calls'] == 1
+    assert summary['editPost']['max_ms'] >= 0
@@ -0,0 +1,60 @@
+import pytest
+from PIL import Image
+
+from scripts import process_imported_image as importer
+from scripts.derivatives import DerivativeManifest
+from scripts.image_library import file_content_hash
+from scripts.image_pipeline import run_pipeline
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    manifest = DerivativeManifest(tmp_path / "_data/derivatives_manifest.json", tmp_path)
+    monkeypatch.setattr(importer, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(importer, 'DERIVATIVE_MANIFEST', manifest)
+    monkeypatch.setattr(importer, 'DERIVATIVE_FORMATS', {"WEBP": {"quality": 80}})
+    return manifest
+
+def _source(path, color):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGB', (600, 400), color).save(path, "JPEG")
+    return path
+
+def _refresh(image_id, source_path, output_dir):
+    """Plans, encodes and records one image's derivatives; returns (recorded, encoded) counts."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    source_hash = file_content_hash(source_path)
+    current, outputs = importer.plan_derivatives(image_id, source_path, source_hash, output_dir)
+    if outputs:
+        run_pipeline(source_path, outputs, max_width=importer.MAX_WIDTH)
+    importer.record_derivatives(source_hash, current + [importer.derivative_record(output) for output in outputs])
+    return len(current), len(outputs)
+
+def test_identical_sources_under_different_ids(tmp_path, manifest):
+    source = _source(tmp_path / "src/shared.jpg", 'red')
+    post_a, post_b = tmp_path / "images/posts/a", tmp_path / "images/posts/b"
+    assert _refresh('a_photo', source, post_a) == (0, 1)
+    # Same bytes, different image: its own file must be written, not the other post's reused
+    assert _refresh('b_photo', source, post_b) == (0, 1)
+    assert (post_b / "b_photo-480w.webp").is_file()
+    assert _refresh('a_photo', source, post_a) == (1, 0)
+    assert _refresh('b_photo', source, post_b) == (1, 0)
+    manifest.save()
+    reloaded = DerivativeManifest(manifest.json_path, tmp_path)
+    settings_hash = importer.derivative_settings_hash(480, "WEBP", {"quality": 80}, importer.MAX_WIDTH)
+    assert reloaded.current(post_b / "b_photo-480w.webp", file_content_hash(source), settings_hash)['path'] == "images/posts/b/b_photo-480w.webp"
+
+def test_overwritten_source_and_modified_output(tmp_path, manifest):
+    source = _source(tmp_path / "src/photo.jpg", 'red')
+    output_dir = tmp_path / "images/posts/a"
+    assert _refresh('a_photo', source, output_dir) == (0, 1)
+    _source(source, 'blue') # Replaced under the same name
+    assert _refresh('a_photo', source, output_dir) == (0, 1)
+    _source(source, 'red') # Back to the first bytes: the file now holds the blue encode
+    assert _refresh('a_photo', source, output_dir) == (0, 1)
+    with Image.open(output_dir / "a_photo-480w.webp") as written:
+        assert written.convert('RGB').getpixel((10, 10))[0] > 200
+
+    (output_dir / "a_photo-480w.webp").write_bytes(b"x" * 10) # Output clobbered by something else
+    assert _refresh('a_photo', source, output_dir) == (0, 1)
+    assert _refresh('a_photo', source, output_dir) == (1, 0)
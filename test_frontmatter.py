@@ -1,6 +1,17 @@
 import frontmatter
 import yaml
 import re
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from scripts.frontmatter_loader import load_front_matter, load_post
+
+# Fields the admin dashboard needs for its post list
+INDEX_FIELDS = ('title', 'concept', 'date', 'deleted', 'headerImageId')
 
 def test_frontmatter_lib():
     print("Testing with frontmatter library:")
@@ -28,6 +39,110 @@ def test_regex_yaml():
     except Exception as e:
         print("Error with regex+yaml:", str(e))
 
+def test_fast_loader():
+    print("\nTesting fast loader against frontmatter library:")
+    for md_path in sorted(glob.glob('posts/*.md')):
+        expected = frontmatter.load(md_path)
+        assert load_front_matter(md_path) == expected.metadata, md_path
+        assert load_front_matter(md_path, fields=INDEX_FIELDS) == {k: v for k, v in expected.metadata.items() if k in INDEX_FIELDS}, md_path
+        fast_post = load_post(md_path)
+        assert fast_post.metadata == expected.metadata and fast_post.content == expected.content, md_path
+        print(f"  OK: {md_path}")
+
+TRICKY_FRONT_MATTER = """---
+title: "Kilts --- a short history"
+summary: >
+  Folded text that
+  spans lines
+  ---
+  and contains a dashes line.
+sections:
+  - heading: One
+    text: |
+      Literal block
+      title: not a key
+categories:
+- history
+- dress
+subtitle: plain scalar
+  continued on the next line
+# a comment between keys
+"quoted key": value
+date: 2025-04-18
+---
+Body text.
+---
+More body after a dashes line.
+"""
+
+def _write_post(tmp_path, text):
+    path = tmp_path / "post.md"
+    path.write_text(text, encoding='utf-8')
+    return path
+
+def test_fields_mode_block_scalars(tmp_path):
+    path = _write_post(tmp_path, TRICKY_FRONT_MATTER)
+    expected = frontmatter.load(path)
+    assert load_front_matter(path) == expected.metadata
+    for fields in (['title'], ['summary', 'date'], ['categories', 'subtitle'], ['quoted key'], ['sections', 'missing']):
+        assert load_front_matter(path, fields=fields) == {k: v for k, v in expected.metadata.items() if k in fields}, fields
+    assert load_front_matter(path, fields=['summary'])['summary'] == "Folded text that spans lines --- and contains a dashes line.\n"
+    fast_post = load_post(path)
+    assert fast_post.metadata == expected.metadata and fast_post.content == expected.content
+
+def test_fields_mode_falls_back_to_full_parse(tmp_path):
+    # The alias refers to an anchor in a block that fields mode would skip
+    path = _write_post(tmp_path, "---\nbase: &author Jenny\ntitle: Post\nauthor: *author\n---\nBody\n")
+    assert load_front_matter(path, fields=['author']) == {'author': 'Jenny'}
+    # A double-quoted scalar continued at column 0 looks like a new key to the splitter
+    path = _write_post(tmp_path, '---\ntitle: "first line\nsecond: line"\ndate: 2025-04-18\n---\nBody\n')
+    assert load_front_matter(path, fields=['title']) == {'title': 'first line second: line'}
+
+def test_no_front_matter(tmp_path):
+    assert load_front_matter(_write_post(tmp_path, "Just a body\n---\n")) == {}
+    assert load_front_matter(_write_post(tmp_path, "---\ntitle: never closed\n")) == {}
+    assert load_front_matter(_write_post(tmp_path, "---\n---\nBody\n"), fields=['title']) == {}
+
+# --- Benchmark ---
+
+def build_corpus(target_dir: Path, num_posts: int):
+    """Writes num_posts synthetic posts, cycling through the real posts in posts/ as templates."""
+    templates = [Path(p).read_text(encoding='utf-8') for p in sorted(glob.glob('posts/*.md'))]
+    body = "\n".join(f"Paragraph {i} of the post body with some *Markdown* text." for i in range(200))
+    for i in range(num_posts):
+        (target_dir / f"post-{i:05d}.md").write_text(templates[i % len(templates)] + "\n" + body + "\n", encoding='utf-8')
+
+def time_loader(label, loader, paths):
+    start = time.perf_counter()
+    for path in paths:
+        loader(path)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed:8.3f}s total  {elapsed / len(paths) * 1e6:8.1f}us/post")
+    return elapsed
+
+def run_benchmark(num_posts: int):
+    print(f"Building synthetic corpus of {num_posts} posts...")
+    corpus_dir = Path(tempfile.mkdtemp(prefix='fm_bench_'))
+    try:
+        build_corpus(corpus_dir, num_posts)
+        paths = sorted(corpus_dir.glob('*.md'))
+        print(f"libyaml available: {yaml.__with_libyaml__}")
+        baseline = time_loader("frontmatter.load (full file)", lambda p: frontmatter.load(p).metadata, paths)
+        full = time_loader("load_front_matter (front matter only)", load_front_matter, paths)
+        fields = time_loader("load_front_matter (index fields only)", lambda p: load_front_matter(p, fields=INDEX_FIELDS), paths)
+        print(f"Speedup vs frontmatter.load: {baseline / full:.1f}x (full front matter), {baseline / fields:.1f}x (index fields)")
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare front matter loaders and benchmark them on a synthetic corpus.")
+    parser.add_argument("--posts", type=int, default=10000, help="Number of synthetic posts to benchmark (default: 10000).")
+    parser.add_argument("--no-benchmark", action="store_true", help="Only run the correctness checks.")
+    args = parser.parse_args()
+
     test_frontmatter_lib()
-    test_regex_yaml() 
\ No newline at end of file
+    test_regex_yaml()
+    test_fast_loader()
+    if not args.no_benchmark:
+        print()
+        run_benchmark(args.posts)
@@ -0,0 +1,90 @@
+import json
+import multiprocessing
+
+from scripts.image_library import ImageLibrary
+
+SAVES_PER_PROCESS = 25
+
+
+def _library(tmp_path, entries=None):
+    json_path = tmp_path / "_data" / "image_library.json"
+    json_path.parent.mkdir(exist_ok=True)
+    if entries is not None:
+        json_path.write_text(json.dumps(entries), encoding='utf-8')
+    return ImageLibrary(json_path, base_dir=tmp_path)
+
+def _entries():
+    return {
+        'IMG00001': {'watermark_status': 'complete',
+                     'source_details': {'local_dir': '/images/posts/kilt-evolution/', 'filename_local': 'header.jpg',
+                                        'uploaded_path_relative': 'blog/header.jpg'}},
+        'kilt-evolution_tartan': {'source_details': {'published_file_path': 'images/posts/kilt-evolution/tartan.jpg',
+                                                     'raw_file_path': 'images/posts/kilt-evolution/tartan_raw.jpg'}},
+        'quaich_cup': {'source_details': {'post_slug': 'quaich-traditions', 'published_file_path': 'images/posts/quaich/cup.webp'}},
+    }
+
+def test_indexes(tmp_path):
+    library = _library(tmp_path, _entries())
+    assert library.ids_for_slug('kilt-evolution') == ['IMG00001', 'kilt-evolution_tartan']
+    assert library.ids_for_slug('quaich-traditions') == ['quaich_cup']
+    assert library.ids_with_watermark_status('complete') == ['IMG00001']
+    assert library.ids_with_watermark_status('pending', slug='kilt-evolution') == ['kilt-evolution_tartan']
+    assert library.not_uploaded_ids() == ['kilt-evolution_tartan', 'quaich_cup']
+    assert library.find_by_path('/images/posts/kilt-evolution/header.jpg') == 'IMG00001'
+    assert library.find_by_path(tmp_path / 'images/posts/kilt-evolution/tartan_raw.jpg') == 'kilt-evolution_tartan'
+    assert library.find_by_path('images//posts/quaich/cup.webp') == 'quaich_cup'
+    assert library.local_path('IMG00001') == tmp_path / 'images/posts/kilt-evolution/header.jpg'
+
+def test_updates_reindex(tmp_path):
+    library = _library(tmp_path, _entries())
+    library.update('kilt-evolution_tartan', watermark_status='complete')
+    library.update_source_details('kilt-evolution_tartan', uploaded_path_relative='blog/tartan.jpg',
+                                  published_file_path='images/posts/kilt-evolution/tartan.webp')
+    assert library.ids_with_watermark_status('complete') == ['IMG00001', 'kilt-evolution_tartan']
+    assert library.ids_with_watermark_status('pending') == ['quaich_cup']
+    assert library.not_uploaded_ids() == ['quaich_cup']
+    assert library.find_by_path('images/posts/kilt-evolution/tartan.jpg') is None
+    assert library.find_by_path('images/posts/kilt-evolution/tartan.webp') == 'kilt-evolution_tartan'
+    library.set_entry('new_image', {'source_details': {'post_slug': 'kilt-evolution'}})
+    assert library.ids_for_slug('kilt-evolution')[-1] == 'new_image'
+
+def test_save_merges_entries_of_other_instances(tmp_path):
+    first = _library(tmp_path, _entries())
+    second = _library(tmp_path)
+    first.update('IMG00001', watermark_status='pending')
+    second.update('quaich_cup', watermark_status='complete')
+    second.set_entry('added_by_second', {'source_details': {'post_slug': 'quaich-traditions'}})
+    assert second.save() and first.save()
+
+    saved = json.loads(first.json_path.read_text())
+    assert saved['IMG00001']['watermark_status'] == 'pending'
+    assert saved['quaich_cup']['watermark_status'] == 'complete'
+    assert 'added_by_second' in saved
+    assert first.ids_for_slug('quaich-traditions') == ['quaich_cup', 'added_by_second'] # Picked up on save
+    assert not first.has_changes()
+
+def test_unsaved_changes_survive_reload(tmp_path):
+    library = _library(tmp_path, _entries())
+    library.update('IMG00001', watermark_status='pending')
+    other = _library(tmp_path)
+    other.update('quaich_cup', watermark_status='complete')
+    other.save()
+    assert library.get('quaich_cup')['watermark_status'] == 'complete' # Reloaded from disk...
+    assert library.get('IMG00001')['watermark_status'] == 'pending' # ...keeping the local change
+
+def _save_repeatedly(json_path, worker):
+    library = ImageLibrary(json_path)
+    for i in range(SAVES_PER_PROCESS):
+        library.set_entry(f"worker{worker}_{i}", {'source_details': {'post_slug': f"post-{worker}"}})
+        assert library.save()
+
+def test_concurrent_process_saves_keep_every_entry(tmp_path):
+    library = _library(tmp_path, {})
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_save_repeatedly, args=(library.json_path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(json.loads(library.json_path.read_text())) == 4 * SAVES_PER_PROCESS
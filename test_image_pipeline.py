@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image
+
+from scripts.image_pipeline import ImageOutput, decode_image, resize_to_width, run_pipeline
+
+MAX_WIDTH = 1200
+
+
+def _jpeg(tmp_path, size):
+    path = tmp_path / f"source-{size[0]}x{size[1]}.jpg"
+    Image.linear_gradient('L').resize(size).convert('RGB').save(path, "JPEG", quality=90)
+    return path
+
+@pytest.mark.parametrize('size, draft_width', [
+    ((4000, 2667), 2000), # 1/2 scale: still wider than the target
+    ((4800, 3200), 1200), # 1/4 scale lands exactly on the target
+    ((4801, 3203), 2401), # Height ratio 3203 // 801 < 4, so only 1/2 scale (rounded up)
+    ((6000, 4000), 1500), # 1/4 scale
+])
+def test_large_jpeg_output_matches_full_decode_size(tmp_path, size, draft_width):
+    path = _jpeg(tmp_path, size)
+    frame = decode_image(path, MAX_WIDTH)
+    assert frame.width == draft_width and frame.info['source_size'] == size
+
+    expected = (MAX_WIDTH, int(MAX_WIDTH * size[1] / size[0]))
+    assert resize_to_width(frame, MAX_WIDTH).size == expected
+    with Image.open(path) as full:
+        assert resize_to_width(full.convert('RGB'), MAX_WIDTH).size == expected
+
+    output = ImageOutput('web', tmp_path / "out.webp", 'WEBP', {'quality': 80})
+    run_pipeline(path, [output], max_width=MAX_WIDTH)
+    with Image.open(output.path) as written:
+        assert written.size == expected
+
+def test_reducing_gap_below_one_never_drafts_below_target(tmp_path):
+    path = _jpeg(tmp_path, (6000, 4000))
+    frame = decode_image(path, MAX_WIDTH, reducing_gap=0.25)
+    assert frame.width >= MAX_WIDTH
+    assert resize_to_width(frame, MAX_WIDTH).size == (1200, 800)
+
+def test_small_images_are_not_resized(tmp_path):
+    path = _jpeg(tmp_path, (800, 533))
+    frame = decode_image(path, MAX_WIDTH)
+    assert 'source_size' not in frame.info
+    assert resize_to_width(frame, MAX_WIDTH) is frame
@@ -0,0 +1,57 @@
+import os
+
+from PIL import Image
+
+from scripts import image_probe
+from scripts.image_probe import ImageProbeCache
+
+
+def _touch(path, delta_ns):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+def _counting_open(monkeypatch):
+    opened = []
+    image_open = image_probe.Image.open
+    monkeypatch.setattr(image_probe.Image, 'open', lambda path, *args: opened.append(os.path.basename(path)) or image_open(path, *args))
+    return opened
+
+def test_probe_is_cached_in_memory_and_on_disk(tmp_path, monkeypatch):
+    Image.new('RGB', (640, 480), 'red').save(tmp_path / "kilt.jpg")
+    opened = _counting_open(monkeypatch)
+    cache = ImageProbeCache(tmp_path / "probes.db", tmp_path)
+    probe = cache.probe(tmp_path / "kilt.jpg")
+    assert probe == {'width': 640, 'height': 480, 'format': 'JPEG', 'mode': 'RGB', 'size': os.path.getsize(tmp_path / "kilt.jpg")}
+    assert cache.probe(tmp_path / "kilt.jpg") == probe
+    assert ImageProbeCache(tmp_path / "probes.db", tmp_path).probe(tmp_path / "kilt.jpg") == probe # A new process reads SQLite
+    assert opened == ['kilt.jpg']
+
+def test_changed_file_is_probed_again(tmp_path, monkeypatch):
+    path = tmp_path / "kilt.png"
+    Image.new('RGB', (640, 480), 'red').save(path)
+    opened = _counting_open(monkeypatch)
+    cache = ImageProbeCache(tmp_path / "probes.db", tmp_path)
+    assert cache.probe(path)['width'] == 640
+
+    # New mtime, same size
+    _touch(path, 1_000_000)
+    assert cache.probe(path)['width'] == 640 and len(opened) == 2
+
+    # Same mtime, new size
+    st = os.stat(path)
+    Image.new('RGB', (320, 960), 'red').save(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    probe = cache.probe(path)
+    assert (probe['width'], probe['height'], probe['size']) == (320, 960, os.path.getsize(path))
+    assert len(opened) == 3
+    assert ImageProbeCache(tmp_path / "probes.db", tmp_path).probe(path)['height'] == 960 and len(opened) == 3
+
+def test_missing_or_unreadable_files(tmp_path):
+    path = tmp_path / "kilt.jpg"
+    Image.new('RGB', (64, 48)).save(path)
+    cache = ImageProbeCache(tmp_path / "probes.db", tmp_path)
+    assert cache.probe(path)['width'] == 64
+    path.unlink()
+    assert cache.probe(path) is None # A deleted file is not answered from the cache
+    path.write_text("not an image")
+    assert cache.probe(path) is None
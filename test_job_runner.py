@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+
+from scripts.job_context import ContextThreadPoolExecutor
+from scripts.job_runner import JobRunner, JOB_RUNNING, JOB_FAILED, FINISHED_STATUSES
+
+logger = logging.getLogger('test_job_runner')
+logger.setLevel(logging.INFO)
+
+
+def _wait_for(runner, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job['status'] in FINISHED_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+def test_concurrent_start_creates_one_set_of_workers(tmp_path):
+    runner = JobRunner(tmp_path / "jobs.db", workers=2)
+    barrier = threading.Barrier(8)
+
+    def _first_request():
+        barrier.wait()
+        runner.start()
+
+    threads = [threading.Thread(target=_first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(runner._threads) == 2
+    runner.stop()
+
+def test_running_jobs_are_failed_only_when_workers_start(tmp_path):
+    runner = JobRunner(tmp_path / "jobs.db")
+    runner.register('noop', lambda: (True, None))
+    job_id = runner.submit('noop', ['post-a'])['id']
+    runner._conn().execute("UPDATE jobs SET status = ? WHERE id = ?", (JOB_RUNNING, job_id))
+
+    other = JobRunner(tmp_path / "jobs.db") # e.g. the debug reloader's parent process
+    assert other.get(job_id)['status'] == JOB_RUNNING
+    other.start()
+    assert other.get(job_id)['status'] == JOB_FAILED
+    other.stop()
+
+def test_log_capture_includes_pool_threads(tmp_path):
+    runner = JobRunner(tmp_path / "jobs.db")
+    handler = runner.log_handler()
+    logging.getLogger().addHandler(handler)
+
+    def _fan_out(count):
+        logger.info("fanning out")
+        with ContextThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: logger.info(f"upload {i} done"), range(count)))
+        return True, count
+
+    runner.register('fan_out', _fan_out)
+    try:
+        runner.start()
+        job = _wait_for(runner, runner.submit('fan_out', ['post-a'], {'count': 6})['id'])
+        logger.info("outside any job")
+    finally:
+        runner.stop()
+        logging.getLogger().removeHandler(handler)
+
+    assert job['result'] == 6
+    assert "fanning out" in job['log']
+    assert all(f"upload {i} done" in job['log'] for i in range(6))
+    assert "outside any job" not in job['log']
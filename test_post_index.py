@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from scripts import post_index
+from scripts.post_index import PostIndex
+from scripts.workflow_store import WorkflowStore
+
+
+def _write_post(path, title, date='2024-05-01', extra=''):
+    path.write_text(f"---\ntitle: {title}\ndate: {date}\n{extra}---\nBody\n", encoding='utf-8')
+
+def _touch(path, delta_ns):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    posts_dir = tmp_path / "posts"
+    posts_dir.mkdir()
+    _write_post(posts_dir / "kilt.md", "Kilts")
+    _write_post(posts_dir / "quaich.md", "Quaichs", date='2024-06-01')
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json", debounce_seconds=0)
+    parsed = []
+    load_front_matter = post_index.load_front_matter
+    monkeypatch.setattr(post_index, 'load_front_matter', lambda path, **kwargs: parsed.append(path.name) or load_front_matter(path, **kwargs))
+    return PostIndex(posts_dir, store), store, posts_dir, parsed
+
+def test_posts_are_parsed_once(index):
+    idx, _, _, parsed = index
+    assert [p['slug'] for p in idx.posts()] == ['quaich', 'kilt'] # Newest first
+    assert idx.get('kilt')['title'] == 'Kilts'
+    idx.posts()
+    assert sorted(parsed) == ['kilt.md', 'quaich.md']
+
+def test_changed_file_is_reparsed(index):
+    idx, _, posts_dir, parsed = index
+    idx.posts()
+    assert idx.metadata('kilt')['title'] == 'Kilts'
+
+    # Same length, so only the mtime tells the change apart
+    _write_post(posts_dir / "kilt.md", "Kiltz")
+    _touch(posts_dir / "kilt.md", 1_000_000)
+    parsed.clear()
+    assert idx.get('kilt')['title'] == 'Kiltz'
+    assert idx.metadata('kilt')['title'] == 'Kiltz' # The full front matter is dropped with the record
+    assert parsed == ['kilt.md', 'kilt.md']
+
+    # Same mtime, different size
+    st = os.stat(posts_dir / "kilt.md")
+    _write_post(posts_dir / "kilt.md", "Kilts", extra="headerImageId: kilt_tartan\n")
+    os.utime(posts_dir / "kilt.md", ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert [p['headerImageId'] for p in idx.posts() if p['slug'] == 'kilt'] == ['kilt_tartan']
+    assert idx.image_ids('kilt') == ['kilt_tartan']
+
+def test_deleted_file_drops_out(index):
+    idx, _, posts_dir, _ = index
+    assert len(idx.posts()) == 2
+    (posts_dir / "quaich.md").unlink()
+    assert idx.get('quaich') is None and idx.metadata('quaich') is None
+    (posts_dir / "kilt.md").unlink()
+    assert idx.posts() == []
+
+def test_workflow_data_follows_the_store_revision(index):
+    idx, store, _, _ = index
+    assert idx.posts()[1]['clan_com_status'] == "Not Published / Pending"
+    calls = []
+    store_all = store.all
+    idx.workflow_store.all = lambda: calls.append(1) or store_all()
+    idx.posts()
+    assert calls == [] # Unchanged revision: served from the cache
+
+    store.update_stage('kilt', 'publishing_clancom', {'status': 'complete', 'post_id': 42})
+    kilt = [p for p in idx.posts() if p['slug'] == 'kilt'][0]
+    assert kilt['clan_com_status'] == "Published (ID: 42)" and calls == [1]
+    assert idx.workflow_data()['kilt']['stages']['publishing_clancom']['post_id'] == 42
+    assert calls == [1]
@@ -0,0 +1,414 @@
+import os
+import json
+import datetime
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import requests
+from bs4 import BeautifulSoup
+from PIL import Image
+
+os.environ.setdefault("CLAN_API_KEY", "test") # post_to_clan reads its config on import
+from scripts import post_to_clan
+from scripts.image_library import ImageLibrary, file_content_hash
+from scripts.workflow_store import WorkflowStore
+
+IMAGE_PATH = '/images/posts/kilt-evolution/kilt-evolution_tartan.webp'
+DERIVATIVE_PATH = 'images/posts/kilt-evolution/kilt-evolution_tartan-480w.webp'
+REPO_DIR = Path(__file__).resolve().parent
+QUAICH_POST = "---\ntitle: Quaich\ndescription: A cup\n---\n"
+QUAICH_HTML = "<article class='blog-post'><p>The quaich.</p></article>"
+KILT_POST = "---\ntitle: Kilts\nheaderImageId: kilt-evolution_tartan\nsections:\n  - heading: History\n    imageId: kilt_plaid\n---\n"
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self.data
+
+
+class FakeApiClient:
+    def __init__(self):
+        self.uploaded = [] # (file name, bytes) as sent
+        self.posts = [] # (api_function, json args, html) for createPost/editPost
+        self.failing_uploads = set() # Local file stems whose upload gets an HTTP 500
+        self.edit_error = None # Message of a failed editPost
+        self.upload_seconds = 0 # Simulated upload latency
+        self.active_uploads = 0
+        self.max_active_uploads = 0
+        self._lock = threading.Lock()
+
+    def post(self, api_function, data=None, files=None):
+        if api_function == 'uploadImage':
+            filename, file_bytes = files['image_file']
+            with self._lock:
+                self.active_uploads += 1
+                self.max_active_uploads = max(self.max_active_uploads, self.active_uploads)
+            time.sleep(self.upload_seconds)
+            with self._lock:
+                self.active_uploads -= 1
+            if filename.split('.')[0] in self.failing_uploads:
+                return FakeResponse({'message': "Upload failed"}, 500)
+            self.uploaded.append((filename, file_bytes))
+            return FakeResponse({'message': f"File uploaded successfully: https://static.clan.com/media/blog/{filename}"})
+        self.posts.append((api_function, json.loads(files['json_args'][1]), files['html_file'][1].decode('utf-8')))
+        if api_function == 'editPost' and self.edit_error:
+            return FakeResponse({'status': 'error', 'message': self.edit_error})
+        if api_function == 'createPost':
+            return FakeResponse({'status': 'success', 'message': f"Blog post created with ID {100 + len(self.posts)}"})
+        return FakeResponse({'status': 'success', 'message': "Post updated"})
+
+    def latency_summary(self):
+        return {}
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.setitem(post_to_clan.CONFIG, 'base_dir', tmp_path)
+    client = FakeApiClient()
+    monkeypatch.setattr(post_to_clan, '_api_client', client)
+    monkeypatch.setitem(post_to_clan.CONFIG, 'image_probe_db_file', tmp_path / "image_probe.db")
+    monkeypatch.setattr(post_to_clan, '_image_probe_cache', None)
+    (tmp_path / "_data").mkdir()
+    library = ImageLibrary(tmp_path / "_data/image_library.json", base_dir=tmp_path)
+    library.set_entry('kilt-evolution_tartan', {'source_details': {'published_file_path': IMAGE_PATH.lstrip('/')}})
+    image = tmp_path / IMAGE_PATH.lstrip('/')
+    image.parent.mkdir(parents=True)
+    return library, image, client
+
+def test_version_changes_with_file_bytes(site):
+    library, image, _ = site
+    image.write_bytes(b"first encode")
+    first_version = post_to_clan.image_content_version(IMAGE_PATH, library)
+    first_url = post_to_clan.public_image_url(IMAGE_PATH, library)
+    assert first_version == file_content_hash(image)[:16]
+    assert first_url.endswith(f"kilt-evolution_tartan.webp?v={first_version}")
+
+    image.write_bytes(b"second encode") # Re-processed under the same name
+    assert post_to_clan.image_content_version(IMAGE_PATH, library) != first_version
+    assert post_to_clan.public_image_url(IMAGE_PATH, library) != first_url
+
+def test_uploads_use_content_hashed_names(site):
+    library, image, client = site
+    image.write_bytes(b"first encode")
+    assert post_to_clan.upload_images(['kilt-evolution_tartan'], library)
+    first_name = f"kilt-evolution_tartan.{file_content_hash(image)[:16]}.webp"
+    first_url = post_to_clan.public_image_url(IMAGE_PATH, library)
+    assert client.uploaded == [(first_name, b"first encode")]
+    assert first_url == f"https://static.clan.com/media/blog/{first_name}" # No query string to be ignored by a cache
+
+    post_to_clan.upload_images(['kilt-evolution_tartan'], library) # Unchanged: not sent again
+    assert len(client.uploaded) == 1
+
+    image.write_bytes(b"second encode")
+    post_to_clan.upload_images(['kilt-evolution_tartan'], library)
+    second_name = f"kilt-evolution_tartan.{file_content_hash(image)[:16]}.webp"
+    assert client.uploaded[-1] == (second_name, b"second encode") and second_name != first_name
+    assert post_to_clan.public_image_url(IMAGE_PATH, library) == f"https://static.clan.com/media/blog/{second_name}"
+
+def test_uploads_under_plain_names_are_sent_again(site):
+    library, image, client = site
+    image.write_bytes(b"published before hashed names")
+    stat = image.stat()
+    library.update_source_details('kilt-evolution_tartan', public_url="https://static.clan.com/media/blog/kilt-evolution_tartan.webp",
+                                  uploaded_path_relative="/blog/kilt-evolution_tartan.webp", content_hash=file_content_hash(image),
+                                  file_size=stat.st_size, file_mtime_ns=stat.st_mtime_ns)
+    assert library.upload_is_current('kilt-evolution_tartan')
+    assert "?v=" in post_to_clan.public_image_url(IMAGE_PATH, library)
+    post_to_clan.upload_images(['kilt-evolution_tartan'], library)
+    assert [name for name, _ in client.uploaded] == [f"kilt-evolution_tartan.{file_content_hash(image)[:16]}.webp"]
+
+def _with_derivative(library, image):
+    Image.new('RGB', (1200, 800), 'red').save(image, "WEBP")
+    Image.new('RGB', (480, 320), 'red').save(image.parent / "kilt-evolution_tartan-480w.webp", "WEBP")
+    library.update_source_details('kilt-evolution_tartan', derivatives=[{'width': 480, 'format': 'WEBP', 'path': DERIVATIVE_PATH}])
+
+def test_srcset_lists_only_uploaded_derivatives(site):
+    library, image, client = site
+    _with_derivative(library, image)
+    attributes = post_to_clan.responsive_image_attributes(IMAGE_PATH, 'header-url', library)
+    assert attributes['width'] == '1200' and 'srcset' not in attributes # Not on clan.com yet
+
+    assert post_to_clan.upload_derivatives(['kilt-evolution_tartan'], library) == 0
+    derivative_url = f"https://static.clan.com/media/blog/{client.uploaded[-1][0]}"
+    attributes = post_to_clan.responsive_image_attributes(IMAGE_PATH, 'header-url', library)
+    assert attributes['srcset'] == f"{derivative_url} 480w, header-url 1200w"
+
+    Image.new('RGB', (480, 320), 'blue').save(image.parent / "kilt-evolution_tartan-480w.webp", "WEBP") # Re-encoded, not uploaded
+    assert 'srcset' not in post_to_clan.responsive_image_attributes(IMAGE_PATH, 'header-url', library)
+
+def test_unmanaged_images_do_not_use_eager_slots(site, tmp_path):
+    library, image, _ = site
+    _with_derivative(library, image)
+    built_html = tmp_path / "index.html"
+    built_html.write_text(f"""<article class="blog-post">
+        <img src="https://badges.example.com/award.png">
+        <img src="/images/site/divider.png">
+        <img src="{IMAGE_PATH}">
+        <img src="https://example.com/later.png">
+        <img src="/{DERIVATIVE_PATH}">
+    </article>""", encoding='utf-8')
+    html = post_to_clan.extract_html_content(built_html, image_library=library)
+    loading = [img.get('loading') for img in BeautifulSoup(html, 'html.parser').find_all('img')]
+    assert loading == [None, None, None, 'lazy', 'lazy'] # The header image is the eager one
+
+
+def test_run_eleventy_build_scopes_to_input_paths(site, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(post_to_clan.subprocess, 'run', lambda args, **kwargs: calls.append((args, kwargs)))
+    monkeypatch.setenv("ELEVENTY_ONLY", "posts/left-over.md")
+    assert post_to_clan.run_eleventy_build(["posts/kilt.md", Path("posts/quaich.md")])
+    assert post_to_clan.run_eleventy_build()
+    (scoped_args, scoped), (_, full) = calls
+    assert scoped_args == ['npm', 'run', 'build'] and scoped['cwd'] == tmp_path
+    assert scoped['env']["ELEVENTY_ONLY"] == "posts/kilt.md,posts/quaich.md"
+    assert "ELEVENTY_ONLY" not in full['env'] # A full build renders everything
+
+    def _fail(args, **kwargs):
+        raise subprocess.CalledProcessError(1, args, output="", stderr="boom")
+    monkeypatch.setattr(post_to_clan.subprocess, 'run', _fail)
+    assert not post_to_clan.run_eleventy_build(["posts/kilt.md"])
+
+def test_built_post_is_reused_until_its_inputs_change(site, tmp_path, monkeypatch):
+    library, _, _ = site
+    library.set_entry('kilt_plaid', {'source_details': {'local_dir': '/images/posts/kilt/', 'filename_local': 'plaid.jpg'},
+                                     'metadata': {'alt': 'A plaid'}})
+    library.set_entry('quaich_cup', {'source_details': {'post_slug': 'quaich', 'published_file_path': 'images/cup.jpg'}})
+    (tmp_path / "posts").mkdir()
+    md_path = tmp_path / "posts/kilt.md"
+    md_path.write_text(KILT_POST, encoding='utf-8')
+    builds = []
+
+    def _build(input_paths=None):
+        builds.append(list(input_paths))
+        for path in input_paths:
+            built = post_to_clan.built_html_path_for(Path(path).stem)
+            built.parent.mkdir(parents=True, exist_ok=True)
+            built.write_text("<article class='blog-post'></article>", encoding='utf-8')
+        return True
+
+    monkeypatch.setattr(post_to_clan, 'run_eleventy_build', _build)
+    monkeypatch.setattr(post_to_clan, 'publish_post', lambda path, *args: {'slug': Path(path).stem, 'success': True})
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+
+    def _publish(**kwargs):
+        builds.clear()
+        post_to_clan.publish_posts(["posts/kilt.md"], store, library, **kwargs)
+        return builds == [["posts/kilt.md"]]
+
+    assert _publish() # Never built
+    assert not _publish()
+    # Publishing records uploads in the library (and rewrites image_library.json): not rendered by the page
+    library.update_source_details('kilt_plaid', public_url="https://static.clan.com/media/blog/plaid.0123.jpg", content_hash="0123")
+    library.update('quaich_cup', watermark_status='complete') # Another post's image
+    library.save()
+    assert not _publish()
+    library.update('kilt_plaid', metadata={'alt': 'A red plaid'}) # Rendered as the section image's alt
+    assert _publish()
+    assert not _publish()
+    st = os.stat(md_path)
+    os.utime(md_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9)) # Post edited after its build
+    assert _publish()
+    assert _publish(force_build=True)
+
+@pytest.mark.skipif(not (REPO_DIR / "node_modules/@11ty/eleventy").is_dir(), reason="Eleventy is not installed (npm install)")
+def test_scoped_eleventy_build_renders_only_the_given_posts(site, tmp_path):
+    for name in (".eleventy.js", "package.json", "index.njk"):
+        shutil.copy2(REPO_DIR / name, tmp_path / name)
+    for name in ("_includes", "posts"):
+        shutil.copytree(REPO_DIR / name, tmp_path / name)
+    shutil.copytree(REPO_DIR / "_data", tmp_path / "_data", dirs_exist_ok=True)
+    (tmp_path / "node_modules").symlink_to(REPO_DIR / "node_modules")
+
+    assert post_to_clan.run_eleventy_build(["posts/kilt-evolution.md"])
+    assert post_to_clan.built_html_path_for("kilt-evolution").is_file()
+    assert not post_to_clan.built_html_path_for("quaich-traditions").exists()
+    assert not (tmp_path / "_site/images").exists() # Passthrough copies are skipped
+
+
+def _write_post(base_dir, slug, front_matter, html):
+    """A post's Markdown and its built HTML (as Eleventy would have left it)."""
+    (base_dir / "posts").mkdir(exist_ok=True)
+    (base_dir / f"posts/{slug}.md").write_text(front_matter, encoding='utf-8')
+    built = post_to_clan.built_html_path_for(slug)
+    built.parent.mkdir(parents=True, exist_ok=True)
+    built.write_text(html, encoding='utf-8')
+    return f"posts/{slug}.md"
+
+def test_unchanged_post_skips_edit_post(site, tmp_path):
+    library, _, client = site
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+    md_path = _write_post(tmp_path, 'quaich', QUAICH_POST, QUAICH_HTML)
+
+    created = post_to_clan.publish_post(md_path, store, library)
+    assert created['success'] and not created['unchanged'] and created['post_id'] == 101
+    stage = store.get_stage('quaich', 'publishing_clancom')
+    assert stage['post_id'] == 101 and stage['status'] == 'complete' and stage['published_digest']
+
+    unchanged = post_to_clan.publish_post(md_path, store, library)
+    assert unchanged['success'] and unchanged['unchanged'] and unchanged['post_id'] == 101
+    assert [api_function for api_function, _, _ in client.posts] == ['createPost'] # Nothing sent
+
+    _write_post(tmp_path, 'quaich', QUAICH_POST, QUAICH_HTML.replace("quaich", "quaich, a shallow cup"))
+    assert not post_to_clan.publish_post(md_path, store, library)['unchanged']
+    assert client.posts[-1][0] == 'editPost' and "shallow cup" in client.posts[-1][2]
+    assert post_to_clan.publish_post(md_path, store, library)['unchanged']
+
+    _write_post(tmp_path, 'quaich', QUAICH_POST.replace("A cup", "A two-handled cup"), QUAICH_HTML.replace("quaich", "quaich, a shallow cup"))
+    assert not post_to_clan.publish_post(md_path, store, library)['unchanged'] # API args changed
+    assert client.posts[-1][0] == 'editPost' and client.posts[-1][1]['short_content'] == "A two-handled cup"
+    assert len(client.posts) == 3
+
+def test_force_create_and_failed_edits_bypass_the_digest(site, tmp_path):
+    library, _, client = site
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+    md_path = _write_post(tmp_path, 'quaich', QUAICH_POST, QUAICH_HTML)
+    post_to_clan.publish_post(md_path, store, library)
+
+    forced = post_to_clan.publish_post(md_path, store, library, force_create=True)
+    assert not forced['unchanged'] and client.posts[-1][0] == 'createPost' and forced['post_id'] == 102
+
+    client.edit_error = "Service unavailable"
+    _write_post(tmp_path, 'quaich', QUAICH_POST, QUAICH_HTML.replace("quaich", "quaich cup"))
+    failed = post_to_clan.publish_post(md_path, store, library)
+    assert not failed['success'] and failed['error'] == "Service unavailable"
+    assert 'published_digest' not in store.get_stage('quaich', 'publishing_clancom')
+
+    client.edit_error = None # Remote state unknown after a failure: the same content is sent again
+    assert not post_to_clan.publish_post(md_path, store, library)['unchanged']
+    assert post_to_clan.publish_post(md_path, store, library)['unchanged']
+
+def test_concurrent_uploads_report_each_failure(site, tmp_path, monkeypatch, caplog):
+    library, _, client = site
+    monkeypatch.setitem(post_to_clan.CONFIG, 'upload_workers', 3)
+    client.upload_seconds = 0.05
+    client.failing_uploads = {'cup_2', 'cup_4'}
+    image_ids = [f"cup_{i}" for i in range(6)]
+    for image_id in image_ids:
+        Image.new('RGB', (60, 40), 'red').save(tmp_path / f"images/{image_id}.jpg")
+        library.set_entry(image_id, {'source_details': {'post_slug': 'quaich', 'published_file_path': f"images/{image_id}.jpg"}})
+
+    results = post_to_clan.upload_images(image_ids, library)
+    assert list(results) == image_ids # Input order, whatever order the uploads finished in
+    assert [image_id for image_id, path in results.items() if path is None] == ['cup_2', 'cup_4']
+    assert results['cup_0'].startswith('/blog/cup_0.') and library.upload_is_current('cup_0')
+    assert not library.upload_is_current('cup_2')
+    assert 1 < client.max_active_uploads <= 3
+
+    # publish_post names every failed image, as the sequential loop did
+    sections = "".join(f"  - imageId: {image_id}\n" for image_id in image_ids[1:])
+    md_path = _write_post(tmp_path, 'quaich', f"---\ntitle: Quaich\nheaderImageId: cup_0\nsections:\n{sections}---\n", QUAICH_HTML)
+    client.failing_uploads = {'cup_2'} # cup_4 is retried and succeeds; the others are current
+    with caplog.at_level('WARNING'):
+        assert post_to_clan.publish_post(md_path, WorkflowStore(tmp_path / "_data/workflow_status.json"), library)['success']
+    failures = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Failed to upload image ID")]
+    assert failures == ["Failed to upload image ID: cup_2. Post might have missing images/thumbnails."]
+    assert library.upload_is_current('cup_4')
+
+@pytest.fixture
+def batch(site, tmp_path, monkeypatch):
+    """Fake Eleventy build that renders QUAICH_HTML for the given posts; returns the list of builds."""
+    builds = []
+
+    def _build(input_paths=None):
+        builds.append(list(input_paths))
+        for path in input_paths:
+            built = post_to_clan.built_html_path_for(Path(path).stem)
+            built.parent.mkdir(parents=True, exist_ok=True)
+            built.write_text(QUAICH_HTML, encoding='utf-8')
+        return True
+
+    monkeypatch.setattr(post_to_clan, 'run_eleventy_build', _build)
+    monkeypatch.setitem(post_to_clan.CONFIG, 'workflow_status_file', tmp_path / "_data/workflow_status.json")
+    monkeypatch.setitem(post_to_clan.CONFIG, 'image_library_file', tmp_path / "_data/image_library.json")
+    (tmp_path / "posts").mkdir()
+    for slug, front_matter in [('quaich', QUAICH_POST), ('kilt', "---\ntitle: Kilts\n---\n"), ('untitled', "---\ndescription: No title\n---\n")]:
+        (tmp_path / f"posts/{slug}.md").write_text(front_matter, encoding='utf-8')
+    return builds
+
+def test_batch_publish_builds_once_and_reports_each_post(site, tmp_path, batch):
+    library, _, client = site
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+    paths = ["posts/quaich.md", "posts/kilt.md", "posts/untitled.md"]
+    results = post_to_clan.publish_posts(paths, store, library)
+    assert batch == [paths] # One scoped build for all of them
+    assert [(r['slug'], r['success']) for r in results] == [('quaich', True), ('kilt', True), ('untitled', False)]
+    assert results[2]['error'] == "Metadata missing 'title'"
+    assert [api_function for api_function, _, _ in client.posts] == ['createPost', 'createPost']
+    assert store.get_stage('untitled', 'publishing_clancom')['status'] == 'error'
+
+    batch.clear()
+    again = post_to_clan.publish_posts(paths, store, library)
+    assert batch == [] and [r['unchanged'] for r in again] == [True, True, False]
+
+def test_batch_build_failure_fails_every_stale_post(site, tmp_path, batch, monkeypatch):
+    library, _, client = site
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+    monkeypatch.setattr(post_to_clan, 'run_eleventy_build', lambda input_paths=None: False)
+    with pytest.raises(post_to_clan.PublishError):
+        post_to_clan.publish_posts(["posts/quaich.md", "posts/kilt.md"], store, library)
+    assert [store.get_stage(slug, 'publishing_clancom')['last_error'] for slug in ('quaich', 'kilt')] == ["Eleventy build failed."] * 2
+    assert client.posts == []
+
+def test_find_changed_posts(site, tmp_path, batch):
+    store = WorkflowStore(tmp_path / "_data/workflow_status.json")
+    (tmp_path / "posts/old.md").write_text("---\ntitle: Old\ndeleted: true\n---\n", encoding='utf-8')
+    now = time.time()
+    attempt = lambda ts: datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
+    store.update_stage('quaich', 'publishing_clancom', {'post_id': 1, 'status': 'complete', 'last_publish_attempt': attempt(now + 60)})
+    store.update_stage('kilt', 'publishing_clancom', {'post_id': 2, 'status': 'complete', 'last_publish_attempt': attempt(now - 60)})
+    store.update_stage('untitled', 'publishing_clancom', {'post_id': 3, 'status': 'error', 'last_publish_attempt': attempt(now + 60)})
+    store.update_stage('old', 'publishing_clancom', {'post_id': 4, 'status': 'error'})
+    # quaich: unchanged since its publish; kilt: edited after it; untitled: last publish failed; old: deleted
+    assert post_to_clan.find_changed_posts(store) == ["posts/kilt.md", "posts/untitled.md"]
+    store.update_stage('kilt', 'publishing_clancom', {'post_id': None})
+    assert post_to_clan.find_changed_posts(store) == ["posts/untitled.md"] # Never published: not a republish
+
+def test_main_json_report(site, tmp_path, batch, capsys):
+    post_to_clan.main(["posts/quaich.md", "posts/kilt.md"], json_report=True)
+    output = capsys.readouterr().out.splitlines()
+    report = json.loads(next(line for line in output if line.startswith("REPORT: "))[len("REPORT: "):])
+    assert [(r['slug'], r['success'], r['unchanged']) for r in report] == [('quaich', True, False), ('kilt', True, False)]
+    assert "Batch finished: 2 succeeded, 0 failed." in output
+
+    with pytest.raises(SystemExit) as exit_info:
+        post_to_clan.main(["posts/quaich.md", "posts/untitled.md"], json_report=True)
+    assert exit_info.value.code == 1
+    output = capsys.readouterr().out.splitlines()
+    report = json.loads(next(line for line in output if line.startswith("REPORT: "))[len("REPORT: "):])
+    assert [(r['slug'], r['success'], r['unchanged']) for r in report] == [('quaich', True, True), ('untitled', False, False)]
+    assert "FAILED: Post 'untitled': Metadata missing 'title'" in output
+
+def test_uploaded_derivatives_are_not_rehashed(site, monkeypatch):
+    library, image, _ = site
+    _with_derivative(library, image)
+    post_to_clan.upload_derivatives(['kilt-evolution_tartan'], library)
+    hashed = []
+    monkeypatch.setattr(post_to_clan, 'file_content_hash', lambda path: hashed.append(path) or file_content_hash(path))
+    derivative_path = image.parent / "kilt-evolution_tartan-480w.webp"
+
+    assert 'srcset' in post_to_clan.responsive_image_attributes(IMAGE_PATH, 'header-url', library)
+    assert post_to_clan.upload_derivatives(['kilt-evolution_tartan'], library) == 0
+    assert hashed == [] # Size and mtime match the upload
+
+    st = os.stat(derivative_path)
+    os.utime(derivative_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000)) # Touched, same bytes
+    assert 'srcset' in post_to_clan.responsive_image_attributes(IMAGE_PATH, 'header-url', library)
+    assert hashed == [derivative_path]
+
+    hashed.clear()
+    Image.new('RGB', (480, 320), 'green').save(derivative_path, "WEBP", quality=10) # Different size
+    assert not post_to_clan.derivative_upload_is_current(library.get('kilt-evolution_tartan')['source_details']['derivatives'][0])
+    assert hashed == []
@@ -0,0 +1,55 @@
+import hashlib
+import pytest
+from flask import Flask
+
+from scripts.static_files import StaticFiles
+
+
+@pytest.fixture
+def files(tmp_path):
+    static = StaticFiles(tmp_path)
+    app = Flask(__name__)
+    app.add_url_rule('/images/<path:filename>', 'images', static.send)
+    return tmp_path, static, app.test_client()
+
+def _write(path, data: bytes):
+    path.write_bytes(data)
+    return hashlib.sha256(data).hexdigest()
+
+def test_date_stamped_name_is_not_immutable(files):
+    root, _, client = files
+    _write(root / "header-20250418.jpg", b"first header")
+    response = client.get('/images/header-20250418.jpg')
+    assert not response.cache_control.immutable and response.cache_control.no_cache
+
+    # Replaced under the same name: a revalidation picks up the new bytes
+    _write(root / "header-20250418.jpg", b"second header!")
+    revalidated = client.get('/images/header-20250418.jpg', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 200 and revalidated.data == b"second header!"
+
+def test_content_hash_fingerprints_are_immutable(files):
+    root, _, client = files
+    data = b"body { color: black; }"
+    digest = hashlib.sha256(data).hexdigest()
+    (root / f"blog.{digest[:10]}.css").write_bytes(data)
+    (root / "blog.0123abcd.css").write_bytes(data) # Hash-shaped, but not this file's hash
+    assert client.get(f'/images/blog.{digest[:10]}.css').cache_control.immutable
+    assert not client.get('/images/blog.0123abcd.css').cache_control.immutable
+
+def test_version_param_must_match_content(files):
+    root, static, client = files
+    digest = _write(root / "photo.jpg", b"photo bytes")
+    assert static.version("photo.jpg") == digest[:16]
+    response = client.get(f'/images/photo.jpg?v={digest[:16]}')
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+    stale = client.get('/images/photo.jpg?v=0000000000000000')
+    assert not stale.cache_control.immutable and stale.cache_control.no_cache
+
+def test_conditional_and_range_requests(files):
+    root, _, client = files
+    _write(root / "photo.jpg", b"0123456789")
+    etag = client.get('/images/photo.jpg').headers['ETag']
+    assert client.get('/images/photo.jpg', headers={'If-None-Match': etag}).status_code == 304
+    partial = client.get('/images/photo.jpg', headers={'Range': 'bytes=2-5'})
+    assert partial.status_code == 206 and partial.data == b"2345"
+    assert client.get('/images/../secret.txt').status_code == 404
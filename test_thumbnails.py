@@ -0,0 +1,45 @@
+import os
+
+from PIL import Image
+
+from scripts.thumbnails import ThumbnailCache
+
+
+def _image(path, size=(1000, 750), color='red'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGB', size, color).save(path, "JPEG")
+    return path
+
+def _touch(path, delta_ns):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+def test_generated_once_and_regenerated_when_the_source_changes(tmp_path):
+    source = _image(tmp_path / "images/posts/kilt/header.jpg")
+    cache = ThumbnailCache(tmp_path / "images", tmp_path / "thumbs")
+    thumb_path, version = cache.get(320, "posts/kilt/header.jpg")
+    assert version == cache.version("posts/kilt/header.jpg") == str(os.stat(source).st_mtime_ns)
+    with Image.open(thumb_path) as thumb:
+        assert thumb.format == "WEBP" and thumb.size == (320, 240)
+    first_mtime = os.stat(thumb_path).st_mtime_ns
+    assert cache.get(320, "posts/kilt/header.jpg") == (thumb_path, version)
+    assert os.stat(thumb_path).st_mtime_ns == first_mtime # Served from disk
+
+    _image(source, size=(600, 900), color='blue')
+    _touch(source, 1_000_000)
+    new_path, new_version = cache.get(320, "posts/kilt/header.jpg")
+    assert new_version != version and new_path != thumb_path
+    assert not thumb_path.exists() # The stale version is removed
+    with Image.open(new_path) as thumb:
+        assert thumb.size == (213, 320)
+
+def test_refused_requests(tmp_path):
+    _image(tmp_path / "images/header.jpg")
+    (tmp_path / "secret.jpg").write_bytes(b"outside images/")
+    (tmp_path / "images/notes.txt").write_text("not an image")
+    cache = ThumbnailCache(tmp_path / "images", tmp_path / "thumbs")
+    assert cache.get(321, "header.jpg") is None # Not one of THUMBNAIL_SIZES
+    assert cache.get(320, "../secret.jpg") is None
+    assert cache.get(320, "notes.txt") is None
+    assert cache.get(320, "missing.jpg") is None
+    assert not (tmp_path / "thumbs").exists()
@@ -0,0 +1,56 @@
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from scripts.watermark_engine import WatermarkEngine
+
+WATERMARK_PATH = 'images/site/clan-watermark.png'
+FIXTURE_IMAGE = 'images/posts/kilt-evolution/kilt-evolution_header_raw.jpg'
+
+
+def full_frame_watermark(image, target_width, offset, add_background, background_fill):
+    """The pre-WatermarkEngine implementation: a full-size transparent layer composited over the whole image."""
+    base_image = image.convert("RGBA")
+    with Image.open(WATERMARK_PATH) as watermark_file:
+        watermark_image = watermark_file.convert("RGBA")
+    new_wm_height = max(1, int(target_width * watermark_image.height / watermark_image.width))
+    watermark_resized = watermark_image.resize((target_width, new_wm_height), Image.Resampling.LANCZOS)
+    position = (max(0, base_image.width - target_width - offset), max(0, base_image.height - new_wm_height - offset))
+    composite_layer = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
+    if add_background:
+        draw = ImageDraw.Draw(composite_layer)
+        draw.rectangle([position[0], position[1], position[0] + target_width, position[1] + new_wm_height], fill=background_fill)
+        del draw
+    composite_layer.paste(watermark_resized, position, watermark_resized)
+    return Image.alpha_composite(base_image, composite_layer).convert('RGB')
+
+def _noise(size, mode):
+    return Image.merge(mode, [Image.effect_noise(size, 64).point(lambda v: (v * 7 + i * 40) % 256) for i in range(len(mode))])
+
+def _fixtures():
+    with Image.open(FIXTURE_IMAGE) as photo:
+        photo.load()
+    return {
+        'photo': photo,
+        'rgba with transparency': _noise((640, 480), 'RGBA'),
+        'grayscale': _noise((500, 300), 'L'),
+        'smaller than the watermark': _noise((150, 40), 'RGB'),
+    }
+
+@pytest.mark.parametrize('add_background', [True, False])
+@pytest.mark.parametrize('target_width, offset', [(200, 10), (200, 15), (120, 0)])
+def test_region_composite_matches_full_frame(add_background, target_width, offset):
+    background_fill = (128, 128, 128, int(255 * 0.5))
+    engine = WatermarkEngine(WATERMARK_PATH, target_width=target_width, offset=offset, add_background=add_background,
+                             background_color=background_fill[:3], background_opacity=0.5)
+    for name, image in _fixtures().items():
+        stamped = engine.apply(image)
+        assert stamped.mode == (image.mode if image.mode in ('RGB', 'RGBA') else 'RGBA'), name
+        expected = full_frame_watermark(image, target_width, offset, add_background, background_fill)
+        assert ImageChops.difference(stamped.convert('RGB'), expected).getbbox() is None, name
+
+def test_apply_leaves_input_untouched():
+    engine = WatermarkEngine(WATERMARK_PATH)
+    image = _noise((400, 300), 'RGB')
+    before = image.copy()
+    engine.apply(image)
+    assert ImageChops.difference(image, before).getbbox() is None
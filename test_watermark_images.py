@@ -0,0 +1,49 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from scripts.image_library import ImageLibrary
+from scripts.workflow_store import WorkflowStore
+
+SCRIPT_PATH = Path(__file__).resolve().parent / "scripts" / "~watermark_images.py"
+
+
+@pytest.fixture
+def watermarker():
+    spec = importlib.util.spec_from_file_location("watermark_images", SCRIPT_PATH) # '~' is not valid in a module name
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def post(tmp_path):
+    (tmp_path / "_data").mkdir()
+    library = ImageLibrary(tmp_path / "_data/image_library.json", base_dir=tmp_path)
+    library.set_entry('tartan', {'source_details': {'local_dir': '/images/posts/kilt/', 'filename_local': 'tartan.png'}})
+    image_dir = tmp_path / "images/posts/kilt"
+    image_dir.mkdir(parents=True)
+    Image.linear_gradient('L').resize((640, 480)).convert('RGB').save(image_dir / "tartan.png")
+    return library, WorkflowStore(tmp_path / "_data/workflow_status.json"), image_dir
+
+def test_png_source_is_watermarked_once(watermarker, post):
+    library, store, image_dir = post
+    raw_bytes = (image_dir / "tartan.png").read_bytes()
+
+    first = watermarker.watermark_post_images('kilt', ['tartan'], store, library)
+    assert first['success'] and first['skipped'] == []
+    assert library.get('tartan')['source_details']['filename_local'] == 'tartan.jpg'
+    assert not (image_dir / "tartan.png").exists() and (image_dir / "tartan_raw.png").read_bytes() == raw_bytes
+    stamped_bytes = (image_dir / "tartan.jpg").read_bytes()
+
+    second = watermarker.watermark_post_images('kilt', ['tartan'], store, library)
+    assert second['skipped'] == ['tartan'] and second['results'] == {'tartan': 'complete'}
+    assert (image_dir / "tartan.jpg").read_bytes() == stamped_bytes
+
+    # --force re-stamps from the raw backup: the same output, not a watermark over a watermark
+    forced = watermarker.watermark_post_images('kilt', ['tartan'], store, library, force=True)
+    assert forced['success'] and forced['skipped'] == []
+    assert (image_dir / "tartan.jpg").read_bytes() == stamped_bytes
+    assert (image_dir / "tartan_raw.png").read_bytes() == raw_bytes
+    assert not (image_dir / "tartan_raw.jpg").exists()
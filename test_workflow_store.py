@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import pytest
+
+from scripts.workflow_store import WorkflowStore
+
+
+def _store(tmp_path, debounce_seconds=0):
+    return WorkflowStore(tmp_path / "workflow_status.json", debounce_seconds=debounce_seconds)
+
+def _write_json(path, data):
+    """Hand edit: rewrites the JSON file and makes sure its stat signature changes."""
+    path.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+def test_mutate_stage_failure_rolls_back(tmp_path):
+    store = _store(tmp_path)
+    store.update_stage('post-a', 'authoring', {'status': 'in-progress'})
+    revision = store.revision()
+
+    def _fail(current):
+        current['status'] = 'complete'
+        raise ValueError("bad update")
+
+    with pytest.raises(ValueError):
+        store.mutate_stage('post-a', 'authoring', _fail)
+    assert store.get_stage('post-a', 'authoring') == {'status': 'in-progress'}
+    assert store.revision() == revision
+
+def test_mutate_stages_skips_failing_mutations(tmp_path):
+    store = _store(tmp_path)
+    error = KeyError('missing')
+
+    def _set(status):
+        def _apply(current):
+            current['status'] = status
+            return current
+        return _apply
+
+    def _fail(current):
+        current['status'] = 'broken' # Must not leak into the stored value
+        raise error
+
+    results = store.mutate_stages([
+        ('post-a', 'authoring', _set('complete')),
+        ('post-a', 'metadata', _fail),
+        ('post-b', 'authoring', _set('in-progress')),
+        ('post-a', 'authoring', lambda current: dict(current, note='second')),
+    ], last_updated='2025-01-01T00:00:00Z')
+
+    assert results == [None, error, None, None]
+    assert store.get_stage('post-a', 'authoring') == {'status': 'complete', 'note': 'second'}
+    assert store.get_stage('post-a', 'metadata') is None # Failed mutation: the default is not materialised
+    assert store.get_stage('post-b', 'authoring') == {'status': 'in-progress'}
+    assert store.get_post('post-a')['last_updated'] == '2025-01-01T00:00:00Z'
+
+def test_update_post_with_stage_updates_is_one_revision(tmp_path):
+    store = _store(tmp_path)
+    revision = store.revision()
+    store.update_post('post-a', stage_updates={'conceptualisation': {'status': 'complete', 'concept': 'Kilts'},
+                                               'metadata': {'status': 'complete'}}, last_updated='now')
+    assert store.revision() == revision + 1
+    post = store.get_post('post-a')
+    assert post['last_updated'] == 'now'
+    assert post['stages'] == {'conceptualisation': {'status': 'complete', 'concept': 'Kilts'}, 'metadata': {'status': 'complete'}}
+
+def test_export_is_debounced(tmp_path):
+    store = _store(tmp_path, debounce_seconds=0.2)
+    json_path = store.json_path
+    for status in ('pending', 'in-progress', 'complete'):
+        store.update_stage('post-a', 'authoring', {'status': status})
+    assert not json_path.exists() # Nothing written inside the debounce window
+
+    time.sleep(0.5)
+    assert json.loads(json_path.read_text())['post-a']['stages']['authoring'] == {'status': 'complete'}
+    mtime_ns = os.stat(json_path).st_mtime_ns
+    assert store.flush() # Nothing pending: the file is not rewritten
+    assert os.stat(json_path).st_mtime_ns == mtime_ns
+
+def test_hand_edited_json_is_imported(tmp_path):
+    store = _store(tmp_path)
+    store.update_stage('post-a', 'authoring', {'status': 'complete'})
+    store.update_stage('post-b', 'authoring', {'status': 'complete'})
+    _write_json(store.json_path, {'post-a': {'stages': {'authoring': {'status': 'pending'}}},
+                                  'post-c': {'last_updated': 'x', 'stages': {}}})
+
+    reopened = _store(tmp_path)
+    assert reopened.all() == {'post-a': {'stages': {'authoring': {'status': 'pending'}}},
+                              'post-c': {'last_updated': 'x', 'stages': {}}}
+    assert _store(tmp_path).all() == reopened.all() # Unchanged file: not imported again
+
+def test_import_keeps_changes_not_yet_exported(tmp_path):
+    store = _store(tmp_path)
+    store.update_stage('post-a', 'authoring', {'status': 'complete'})
+    store.update_stage('post-b', 'metadata', {'status': 'complete'})
+    store.debounce_seconds = 60 # Next change sits in the debounce window
+    store.update_stage('post-a', 'metadata', {'status': 'in-progress'})
+
+    # Meanwhile the file is edited by hand: post-b removed, post-a's authoring changed
+    _write_json(store.json_path, {'post-a': {'stages': {'authoring': {'status': 'pending'}}}})
+
+    other = _store(tmp_path) # e.g. a script opening the store while the app's export is pending
+    assert other.get_post('post-a')['stages'] == {'authoring': {'status': 'pending'}, 'metadata': {'status': 'in-progress'}}
+    assert other.get_post('post-b') is None
+    # The kept row is not in the file yet, so it is exported again
+    assert json.loads(other.json_path.read_text())['post-a']['stages']['metadata'] == {'status': 'in-progress'}